@@ -1,25 +1,41 @@
 
-from flask import Flask, request, jsonify
-import soundfile as sf
-import numpy as np
-import asyncio
-import edge_tts
+if __name__ == "__main__":
+    # Run as a script: serve through serve.py, so spawned worker processes don't re-run this module
+    import serve
+    serve.reexec()
+
+from flask import Flask, Request, Response, request, jsonify
 import time
-from faster_whisper import WhisperModel
-from langchain_groq import ChatGroq
-from PyPDF2 import PdfReader
+import hashlib
 from dotenv import load_dotenv
 import os
-import mutagen.mp3
 from flask_cors import CORS
 import tempfile
 from auth_routes import auth_bp
-from interview_routes import interview_bp
+from interview_routes import (interview_bp, CANNED_PHRASES, REPORT_FIELDS, REPORT_SUMMARY_FIELDS,
+                              VOICE as INTERVIEW_VOICE)
 from db_config import init_db
+from transcription import (UPLOAD_SPOOL_MAX_BYTES, get_transcriber, decode_audio_stream,
+                           open_stream, get_stream, close_stream, StreamLimitError)
+from whisper_pool import QueueFullError
+import llm_gateway
+import metrics
+from pagination import encode_cursor, parse_page_args, stream_page
+from report_cache import report_cache, report_etag
+from tts_service import prewarm as prewarm_tts_cache
+from session_store import create_session_store
+from conversation_context import SUMMARY_UPDATE_FIELD, ConversationContext, digest_resume
 
 load_dotenv()
 
+class InterviewRequest(Request):
+    """Request that keeps file uploads in memory up to UPLOAD_SPOOL_MAX_BYTES (Werkzeug's default is 500 KB)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, mode="rb+")
+
 app = Flask(__name__)
+app.request_class = InterviewRequest
 # Configure CORS to allow all origins and methods, including OPTIONS
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], 
                     "allow_headers": ["Content-Type", "Authorization", "Accept"]}},
@@ -35,42 +51,32 @@ init_db(app)
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(interview_bp, url_prefix='/interview')
 
-# Load FastWhisper Model
-whisper_model = WhisperModel("small", device="cpu", compute_type="int8")
+# Sampling temperature for next-question generation
+LLM_TEMPERATURE = 0.2
 
-# Load Groq LLM
-api_key = os.getenv('GROQ_API_KEY', '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')
-llm = ChatGroq(api_key=api_key, model="llama3-70b-8192", temperature=0.2, max_retries=2)
+FIRST_QUESTION = "Hello, welcome to the interview! Can you briefly introduce yourself?"
+NEXT_QUESTION_FALLBACK = "Could you please elaborate on your previous answer?"
 
-# EdgeTTS voice selection
-VOICE = "en-US-JennyNeural"
+interview_sessions = create_session_store('legacy')
 
-interview_sessions = {}
+# Synthesize the fixed interview phrases into the TTS cache in the background
+if os.getenv('TTS_PREWARM', 'true').lower() == 'true':
+    prewarm_tts_cache(CANNED_PHRASES + [FIRST_QUESTION, NEXT_QUESTION_FALLBACK], INTERVIEW_VOICE)
 
 # Helper functions
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF file."""
-    text = ""
-    with open(pdf_path, "rb") as file:
-        pdf_reader = PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
-
-async def generate_next_question(session_id, user_answer):
+def session_context(session):
+    """Returns the session's rolling conversation context, creating it if needed."""
+    return (ConversationContext.from_session(session) or
+            ConversationContext(resume_digest=digest_resume(session.get("resume_text", ""))))
+
+def generate_next_question(session, context):
     """Generates the next interview question using Groq LLM."""
-    session = interview_sessions.get(session_id, {})
-    
-    if not session:
-        return "Error: Invalid session."
-    
-    resume_text = session.get("resume_text", "")
     role = session.get("role", "Software Engineer")
     experience = session.get("experience", "5 years")
-    memory = session.get("memory", [])
+    resume_text = context.resume_digest
     
     # Format conversation history
-    conversation_history = "\n".join([f"{speaker}: {text}" for speaker, text in memory])
+    conversation_history = context.render()
     
     prompt = f"""
     You are an interviewer for the role of {role} with {experience} of experience.
@@ -84,24 +90,10 @@ async def generate_next_question(session_id, user_answer):
     """
     
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        return llm_gateway.invoke(prompt, temperature=LLM_TEMPERATURE)
     except Exception as e:
         print(f"Error generating next question: {e}")
-        return "Could you please elaborate on your previous answer?"
-
-async def text_to_speech(text, filename="output.mp3"):
-    """Converts text to speech using EdgeTTS."""
-    communicate = edge_tts.Communicate(text, VOICE)
-    try:
-        with open(filename, "wb") as output:
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    output.write(chunk["data"])
-        return filename
-    except Exception as e:
-        print(f"Error during TTS: {e}")
-        return None
+        return NEXT_QUESTION_FALLBACK
 
 @app.route("/start_interview", methods=["POST", "OPTIONS"])
 def start_interview():
@@ -112,14 +104,15 @@ def start_interview():
     
     data = request.json
     session_id = data.get("session_id")
-    interview_sessions[session_id] = {
+    context = ConversationContext(resume_digest=digest_resume(data.get("resume_text")))
+    interview_sessions.create(session_id, {
         "name": data.get("name"),
         "role": data.get("role"),
         "experience": data.get("experience"),
         "resume_text": data.get("resume_text"),
-        "memory": []
-    }
-    return jsonify({"message": "Interview started!", "first_question": "Hello, welcome to the interview! Can you briefly introduce yourself?"})
+        "context": context.to_dict()
+    })
+    return jsonify({"message": "Interview started!", "first_question": FIRST_QUESTION})
 
 @app.route("/submit_answer", methods=["POST", "OPTIONS"])
 def submit_answer():
@@ -131,14 +124,20 @@ def submit_answer():
     data = request.json
     session_id = data.get("session_id")
     user_answer = data.get("answer")
-    session = interview_sessions.get(session_id, {})
+    session = interview_sessions.get(session_id) or {}
     
     if not session:
         return jsonify({"error": "Invalid session."}), 400
     
-    session["memory"].append(("Candidate", user_answer))
-    next_question = asyncio.run(generate_next_question(session_id, user_answer))
-    session["memory"].append(("Interviewer", next_question))
+    context = session_context(session)
+    interview_sessions.append_turn(session_id, ("Candidate", user_answer))
+    context.append(f"Candidate: {user_answer}")
+    context.compact(on_summary=lambda update: interview_sessions.update(session_id, **{SUMMARY_UPDATE_FIELD: update}))
+    
+    next_question = generate_next_question(session, context)
+    interview_sessions.append_turn(session_id, ("Interviewer", next_question))
+    context.append(f"Interviewer: {next_question}")
+    interview_sessions.update(session_id, context=context.to_dict())
     
     return jsonify({"next_question": next_question})
 
@@ -154,30 +153,96 @@ def transcribe():
     
     audio_file = request.files['audio']
     
-    # Create a temporary file to store the audio
-    with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as temp_audio:
-        audio_file.save(temp_audio.name)
-        temp_audio_path = temp_audio.name
-    
     try:
-        # Use Whisper model for transcription
-        segments, info = whisper_model.transcribe(temp_audio_path, beam_size=5)
+        # Decode straight from the upload buffer; only uploads over
+        # UPLOAD_SPOOL_MAX_BYTES were spilled to disk by the request parser
+        audio = decode_audio_stream(audio_file.stream)
+        segments, info = get_transcriber().transcribe(audio, beam_size=5)
         
         # Get the full transcript
         transcript = " ".join([segment.text for segment in segments])
         
-        # Clean up temporary file
-        os.unlink(temp_audio_path)
-        
         return jsonify({"transcript": transcript})
     
+    except QueueFullError as e:
+        return _queue_full_response(e)
+
+    except Exception as e:
+        return jsonify({"error": f"Transcription failed: {str(e)}"}), 500
+
+def _queue_full_response(error):
+    """429 response telling the client when to retry a transcription."""
+    response = jsonify({"error": str(error)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def _read_audio_chunk():
+    """Returns the audio bytes of a chunk upload, sent either as a form file or as the raw body."""
+    if 'audio' in request.files:
+        return request.files['audio'].read()
+    return request.get_data()
+
+@app.route("/transcribe/stream", methods=["POST", "OPTIONS"])
+def open_transcription_stream():
+    """Opens an incremental transcription stream for a recording in progress."""
+    if request.method == "OPTIONS":
+        # Handle OPTIONS request for CORS preflight
+        return "", 204
+
+    data = request.get_json(silent=True) or {}
+    try:
+        stream = open_stream(language=data.get("language"))
+    except StreamLimitError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"stream_id": stream.id}), 201
+
+@app.route("/transcribe/stream/<stream_id>", methods=["POST", "OPTIONS"])
+def transcribe_stream_chunk(stream_id):
+    """Appends a recorder chunk to a stream and returns the partial transcript."""
+    if request.method == "OPTIONS":
+        # Handle OPTIONS request for CORS preflight
+        return "", 204
+
+    stream = get_stream(stream_id)
+    if not stream:
+        return jsonify({"error": "Unknown or expired transcription stream"}), 404
+
+    try:
+        return jsonify(stream.add_chunk(_read_audio_chunk()))
+    except StreamLimitError as e:
+        return jsonify({"error": str(e)}), 413
+    except QueueFullError as e:
+        return _queue_full_response(e)
     except Exception as e:
-        # Clean up temporary file in case of an exception
-        if os.path.exists(temp_audio_path):
-            os.unlink(temp_audio_path)
-        
         return jsonify({"error": f"Transcription failed: {str(e)}"}), 500
 
+@app.route("/transcribe/stream/<stream_id>/finish", methods=["POST", "OPTIONS"])
+def finish_transcription_stream(stream_id):
+    """Transcribes whatever is not yet committed and closes the stream."""
+    if request.method == "OPTIONS":
+        # Handle OPTIONS request for CORS preflight
+        return "", 204
+
+    stream = get_stream(stream_id)
+    if not stream:
+        return jsonify({"error": "Unknown or expired transcription stream"}), 404
+
+    try:
+        result = stream.finish(_read_audio_chunk())
+    except StreamLimitError as e:
+        # Keep the stream open so the client can finish without the oversized chunk
+        return jsonify({"error": str(e)}), 413
+    except QueueFullError as e:
+        # Keep the stream open so the client can retry the finish
+        return _queue_full_response(e)
+    except Exception as e:
+        close_stream(stream_id)
+        return jsonify({"error": f"Transcription failed: {str(e)}"}), 500
+
+    close_stream(stream_id)
+    return jsonify(result)
+
 # Add direct endpoint for ending interview (matches the client endpoint)
 @app.route("/interview/end_interview", methods=["POST", "OPTIONS"])
 def end_interview():
@@ -198,7 +263,7 @@ def end_interview():
         
     # Generate a simple report without using MongoDB
     qa_pairs = []
-    memory = session.get("memory", [])
+    memory = interview_sessions.get_turns(session_id)
     
     for i in range(0, len(memory), 2):
         if i+1 < len(memory):
@@ -247,25 +312,39 @@ def get_all_reports():
         # Handle OPTIONS request for CORS preflight
         return "", 204
     
-    # In a real app, you would filter by authenticated user
-    reports = []
-    
-    for session_id, session in interview_sessions.items():
-        reports.append({
-            "_id": f"report-{session_id}",
-            "session_id": session_id,
-            "user_id": "user123",  # In a real app, get from auth
-            "date": time.strftime("%Y-%m-%d"),
-            "overall_score": 85,  # In a real app, calculate this
-            "role": session.get("role", "Not specified"),
-            "technical_metrics": [
-                {"name": "Domain Knowledge", "value": 80, "color": "#4CAF50"},
-                {"name": "Problem Solving", "value": 85, "color": "#2196F3"},
-                {"name": "Technical Skills", "value": 90, "color": "#9C27B0"}
-            ]
-        })
-    
-    return jsonify({"reports": reports})
+    try:
+        limit, cursor, fields = parse_page_args(request.args, REPORT_SUMMARY_FIELDS, REPORT_FIELDS, cursor_size=1)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # In a real app, you would filter by authenticated user. Keyset pagination
+    # on session id, so only one page of sessions is ever loaded.
+    session_ids = sorted(interview_sessions.session_ids())
+    if cursor:
+        session_ids = [session_id for session_id in session_ids if session_id > cursor[0]]
+    page_ids = session_ids[:limit]
+
+    def page_items():
+        for session_id in page_ids:
+            session = interview_sessions.get(session_id) or {}
+            report = {
+                "_id": f"report-{session_id}",
+                "session_id": session_id,
+                "user_id": "user123",  # In a real app, get from auth
+                "date": time.strftime("%Y-%m-%d"),
+                "overall_score": 85,  # In a real app, calculate this
+                "role": session.get("role", "Not specified"),
+                "technical_metrics": [
+                    {"name": "Domain Knowledge", "value": 80, "color": "#4CAF50"},
+                    {"name": "Problem Solving", "value": 85, "color": "#2196F3"},
+                    {"name": "Technical Skills", "value": 90, "color": "#9C27B0"}
+                ]
+            }
+            yield {field: report[field] for field in fields if field in report}
+
+    has_more = len(session_ids) > limit
+    next_cursor = encode_cursor([page_ids[-1]]) if has_more else None
+    return stream_page("reports", page_items(), lambda: {"next_cursor": next_cursor, "has_more": has_more})
 
 @app.route("/interview/reports/<report_id>", methods=["GET", "OPTIONS"])
 def get_report_by_id(report_id):
@@ -276,17 +355,38 @@ def get_report_by_id(report_id):
     
     # Extract session_id from report_id
     session_id = report_id.replace("report-", "") if report_id.startswith("report-") else report_id
-    session = interview_sessions.get(session_id, {})
+    session = interview_sessions.get(session_id) or {}
     
     if not session:
         return jsonify({"error": "Report not found"}), 404
     
-    # Create a report with metrics
+    # The report only changes when the session gains turns (or the date rolls
+    # over), so that is all the ETag and the cached body depend on
+    memory = interview_sessions.get_turns(session_id)
+    date = time.strftime("%Y-%m-%d")
+    version = f"{report_id}:{len(memory)}:{date}"
+    etag = report_etag(hashlib.sha256(version.encode("utf-8")).hexdigest()[:32])
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif (body := report_cache.memory.get(version)) is not None:
+        response = Response(body, mimetype="application/json")
+    else:
+        body = app.json.dumps({"report": build_session_report(report_id, session_id, session, memory, date)}).encode("utf-8")
+        report_cache.memory.set(version, body)
+        response = Response(body, mimetype="application/json")
+
+    response.set_etag(etag)
+    # Still changes while the interview is running: revalidate on every view
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def build_session_report(report_id, session_id, session, memory, date):
+    """Placeholder report for a live session"""
     report = {
         "_id": report_id,
         "session_id": session_id,
         "user_id": "user123",  # In a real app, get from auth
-        "date": time.strftime("%Y-%m-%d"),
+        "date": date,
         "overall_score": 85,  # In a real app, calculate this
         "role": session.get("role", "Not specified"),
         "technical_metrics": [
@@ -308,7 +408,6 @@ def get_report_by_id(report_id):
     }
     
     # Add Q&A details
-    memory = session.get("memory", [])
     for i in range(0, len(memory), 2):
         if i+1 < len(memory):
             report["qa_details"].append({
@@ -317,7 +416,11 @@ def get_report_by_id(report_id):
                 "assessment": "Good answer with clear explanation."
             })
     
-    return jsonify({"report": report})
+    return report
 
-if __name__ == "__main__":
-    app.run(debug=True)
+@app.route("/metrics", methods=["GET"])
+def export_metrics():
+    """Exposes service health gauges in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# For many concurrent interviews, serve asgi.py instead: uvicorn asgi:application
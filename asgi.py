@@ -0,0 +1,270 @@
+"""ASGI entry point: uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The long-lived, I/O-bound routes (streamed questions, spoken questions, TTS
+audio) and the Whisper-bound transcription routes are served by native async
+handlers, so an interview waiting on the LLM, edge-tts or Whisper holds a
+coroutine rather than a thread. Every other route of the Flask app (auth and
+interview blueprints included) is served unchanged through a WSGI adapter.
+
+Run one uvicorn worker, as with gunicorn: transcription streams and the
+Whisper pool live in the serving process.
+"""
+if __name__ == "__main__":
+    # Run as a script: serve through serve.py, so spawned worker processes don't re-run this module
+    import serve
+    serve.reexec('--asgi')
+
+import asyncio
+import contextlib
+import os
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+from app import app as flask_app
+from async_runtime import aiterate
+from interview_routes import (FALLBACK_QUESTION, TTS_CACHE_CONTROL, TTS_STREAM_CACHE_CONTROL, VOICE,
+                              prepare_next_turn, question_tokens, remember_question, spoken_question_events,
+                              sse_event)
+from transcription import (UPLOAD_SPOOL_MAX_BYTES, StreamLimitError, close_stream, decode_audio_stream, get_stream,
+                           get_whisper_model)
+from tts_cache import cache_key, tts_cache
+from tts_service import DEFAULT_RATE, is_valid_rate, synthesize_cached
+from whisper_pool import WHISPER_POOL_SIZE, QueueFullError, get_pool
+
+# Threads for blocking work (SQL, MongoDB, audio decoding) called from async handlers
+ASGI_THREADPOOL_SIZE = int(os.getenv('ASGI_THREADPOOL_SIZE', '64'))
+# Threads running the Flask app's routes; each request holds one for its whole duration
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))
+
+# Keep uploads in memory up to the same size as the Flask app does, then spill to disk
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_MAX_BYTES
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def in_flask(request, function, *args):
+    """Call function inside a Flask request context mirroring request (for url_for, jsonify, the DB session)."""
+    with flask_app.test_request_context(request.url.path, base_url=str(request.base_url),
+                                        method=request.method, headers=list(request.headers.items())):
+        return function(*args)
+
+def to_starlette(rv, request):
+    """Convert a Flask view return value (response or (body, status) tuple) to a Starlette response."""
+    response = in_flask(request, flask_app.make_response, rv)
+    return Response(response.get_data(), status_code=response.status_code,
+                    headers={key: value for key, value in response.headers.items() if key.lower() != 'content-length'})
+
+async def prepare_turn(request):
+    """prepare_next_turn for an ASGI request: (error response or None, prompt, session_id, prefetched)"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    response, prompt, session_id, prefetched = await run_in_threadpool(in_flask, request, prepare_next_turn, data)
+    if response is not None:
+        response = await run_in_threadpool(to_starlette, response, request)
+    return response, prompt, session_id, prefetched
+
+async def submit_answer_stream(request):
+    """Async twin of interview_routes.submit_answer_stream."""
+    response, prompt, session_id, prefetched = await prepare_turn(request)
+    if response is not None:
+        return response
+
+    async def generate():
+        parts = []
+        try:
+            async for token in question_tokens(prompt, prefetched):
+                parts.append(token)
+                yield sse_event('token', {'token': token})
+        except Exception as e:
+            print(f"LLM streaming failed: {e}")
+
+        next_question = "".join(parts).strip() or FALLBACK_QUESTION
+        await run_in_threadpool(in_flask, request, remember_question, session_id, next_question)
+        yield sse_event('done', {'next_question': next_question})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def submit_answer_speech(request):
+    """Async twin of interview_routes.submit_answer_speech."""
+    response, prompt, session_id, prefetched = await prepare_turn(request)
+    if response is not None:
+        return response
+
+    sentences = []
+
+    async def generate():
+        try:
+            # Runs on the shared loop that owns the Groq and edge-tts clients
+            async for event in aiterate(spoken_question_events(prompt, prefetched, sentences)):
+                yield event
+        except Exception as e:
+            print(f"Error streaming spoken question: {e}")
+
+        next_question = " ".join(sentences) or FALLBACK_QUESTION
+        await run_in_threadpool(in_flask, request, remember_question, session_id, next_question)
+        yield sse_event('done', {'next_question': next_question})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def text_to_speech(request):
+    """Async twin of interview_routes.text_to_speech."""
+    if request.method == 'GET':
+        data = request.query_params
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+    text = data.get('text')
+    rate = data.get('rate', DEFAULT_RATE)
+    if not text:
+        return JSONResponse({'error': 'No text provided'}, status_code=400)
+    if not is_valid_rate(rate):
+        return JSONResponse({'error': "rate must be a signed percentage such as '+10%' or '-5%'"}, status_code=400)
+
+    key = cache_key(text, VOICE, rate)
+    headers = {'ETag': f'"{key}"', 'Cache-Control': TTS_CACHE_CONTROL}
+    if parse_etags(request.headers.get('if-none-match')).contains(key):
+        return Response(status_code=304, headers=headers)
+    # A cache hit may read from disk
+    audio = await run_in_threadpool(tts_cache.get, key)
+    if audio is not None:
+        return Response(audio, media_type='audio/mpeg', headers=headers)
+
+    chunks = aiterate(synthesize_cached(text, VOICE, rate))
+    try:
+        first_chunk = await chunks.__anext__()
+    except Exception as e:
+        print(f"Error generating TTS: {e}")
+        return JSONResponse({'error': 'Failed to generate speech'}, status_code=500)
+
+    async def generate():
+        yield first_chunk
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            print(f"TTS stream interrupted: {e}")
+
+    # Not cacheable: the stream may still break off
+    return StreamingResponse(generate(), media_type='audio/mpeg',
+                             headers={'Cache-Control': TTS_STREAM_CACHE_CONTROL})
+
+def queue_full_response(error):
+    """429 response telling the client when to retry a transcription."""
+    return JSONResponse({'error': str(error)}, status_code=429, headers={'Retry-After': str(error.retry_after)})
+
+async def transcribe_audio(audio, **options):
+    """Whisper segments for decoded audio, without blocking the event loop.
+
+    With the worker pool the job's future is awaited directly; the in-process
+    model runs in the thread pool.
+    """
+    if WHISPER_POOL_SIZE > 0:
+        segments, _ = await asyncio.wrap_future(get_pool().submit(audio, **options))
+        return segments
+
+    def run():
+        segments, _ = get_whisper_model().transcribe(audio, **options)
+        return list(segments)
+    return await run_in_threadpool(run)
+
+async def read_audio_chunk(request):
+    """Audio bytes of a chunk upload, sent either as the 'audio' form file or as the raw body.
+
+    Recorder chunks are small and are appended to the stream's in-memory
+    buffer anyway, as in the Flask route.
+    """
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('audio')
+        return await upload.read() if upload else b''
+    return await request.body()
+
+async def transcribe(request):
+    """Async twin of app.transcribe; Whisper runs in its worker processes or the thread pool."""
+    form = await request.form()
+    upload = form.get('audio')
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({'error': 'No audio file provided'}, status_code=400)
+
+    try:
+        # Decode straight from the spooled upload; only uploads over
+        # UPLOAD_SPOOL_MAX_BYTES were spilled to disk by the form parser
+        audio = await run_in_threadpool(decode_audio_stream, upload.file)
+        segments = await transcribe_audio(audio, beam_size=5)
+        return JSONResponse({'transcript': " ".join(segment.text for segment in segments)})
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        return JSONResponse({'error': f"Transcription failed: {str(e)}"}, status_code=500)
+
+async def transcribe_stream_chunk(request):
+    """Async twin of app.transcribe_stream_chunk; the Whisper pass runs in the thread pool."""
+    stream = get_stream(request.path_params['stream_id'])
+    if not stream:
+        return JSONResponse({'error': 'Unknown or expired transcription stream'}, status_code=404)
+
+    try:
+        return JSONResponse(await run_in_threadpool(stream.add_chunk, await read_audio_chunk(request)))
+    except StreamLimitError as e:
+        return JSONResponse({'error': str(e)}, status_code=413)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        return JSONResponse({'error': f"Transcription failed: {str(e)}"}, status_code=500)
+
+async def finish_transcription_stream(request):
+    """Async twin of app.finish_transcription_stream."""
+    stream_id = request.path_params['stream_id']
+    stream = get_stream(stream_id)
+    if not stream:
+        return JSONResponse({'error': 'Unknown or expired transcription stream'}, status_code=404)
+
+    try:
+        result = await run_in_threadpool(stream.finish, await read_audio_chunk(request))
+    except StreamLimitError as e:
+        # Keep the stream open so the client can finish without the oversized chunk
+        return JSONResponse({'error': str(e)}, status_code=413)
+    except QueueFullError as e:
+        # Keep the stream open so the client can retry the finish
+        return queue_full_response(e)
+    except Exception as e:
+        close_stream(stream_id)
+        return JSONResponse({'error': f"Transcription failed: {str(e)}"}, status_code=500)
+
+    close_stream(stream_id)
+    return JSONResponse(result)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ASGI_THREADPOOL_SIZE
+    yield
+
+application = Starlette(
+    routes=[
+        Route('/interview/submit_answer/stream', submit_answer_stream, methods=['POST']),
+        Route('/interview/submit_answer/speech', submit_answer_speech, methods=['POST']),
+        Route('/interview/tts', text_to_speech, methods=['GET', 'POST']),
+        Route('/transcribe', transcribe, methods=['POST']),
+        Route('/transcribe/stream/{stream_id}', transcribe_stream_chunk, methods=['POST']),
+        Route('/transcribe/stream/{stream_id}/finish', finish_transcription_stream, methods=['POST']),
+        # Everything else: the Flask app, each request on one of ASGI_WSGI_THREADS threads
+        Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+    ],
+    middleware=[
+        # Same policy as the Flask app's CORS setup; also answers preflights for the async routes
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['GET', 'POST', 'OPTIONS'],
+                   allow_headers=['Content-Type', 'Authorization', 'Accept'], allow_credentials=True),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,107 @@
+import asyncio
+import queue
+import threading
+
+# A single event loop on a daemon thread, shared by everything that talks to
+# async clients (Groq, edge-tts). Keeping one long-lived loop lets those clients
+# reuse pooled connections instead of paying for a new loop per request.
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    """Returns the shared background event loop, starting it on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-runtime', daemon=True).start()
+                _loop = loop
+    return _loop
+
+def submit(coro):
+    """Schedules a coroutine on the shared loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout=None):
+    """Runs a coroutine on the shared loop and blocks the calling thread for its result."""
+    return submit(coro).result(timeout=timeout)
+
+async def run_async(coro):
+    """Awaits a coroutine on the shared loop from any other event loop."""
+    loop = get_loop()
+    try:
+        if asyncio.get_running_loop() is loop:
+            return await coro
+    except RuntimeError:
+        pass
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+_END = object()
+
+def iterate(agen, timeout=None):
+    """Drives an async generator on the shared loop and yields its items to a sync caller.
+
+    Closing the returned generator early (e.g. the client went away) cancels the
+    async side, so a streaming LLM call stops instead of running to completion.
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except Exception as e:
+            items.put((_END, e))
+        else:
+            items.put((_END, None))
+
+    future = submit(pump())
+    try:
+        while True:
+            item, error = items.get(timeout=timeout)
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+async def aiterate(agen):
+    """Iterates an async generator on the shared loop from any other event loop."""
+    loop = get_loop()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    if current is loop:
+        async for item in agen:
+            yield item
+        return
+
+    items = asyncio.Queue()
+
+    def put(item, error=None):
+        current.call_soon_threadsafe(items.put_nowait, (item, error))
+
+    async def pump():
+        try:
+            async for item in agen:
+                put(item)
+        except Exception as e:
+            put(_END, e)
+        else:
+            put(_END)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            item, error = await items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
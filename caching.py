@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count and/or total value size.
+
+    Value size is measured with sizeof (len by default), so a cache of bytes can
+    be capped in bytes. Hit and miss counts are kept for metrics.
+    """
+
+    def __init__(self, max_entries=None, max_size=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.max_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if key in self._data:
+                self.size -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.size += size
+            while ((self.max_entries is not None and len(self._data) > self.max_entries) or
+                   (self.max_size is not None and self.size > self.max_size)):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.size -= evicted_size
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, size = self._data.pop(key)
+            self.size -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
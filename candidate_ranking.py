@@ -0,0 +1,120 @@
+import math
+import numpy as np
+from report_engine import METRIC_GROUPS
+
+# Relative weight of each metric group in the composite score
+DEFAULT_GROUP_WEIGHTS = {'technical_metrics': 0.5, 'communication_metrics': 0.3, 'personality_metrics': 0.2}
+
+def _group_columns():
+    columns, start = {}, 0
+    for group, (names, _) in METRIC_GROUPS.items():
+        columns[group] = slice(start, start + len(names))
+        start += len(names)
+    return columns
+
+METRIC_NAMES = [name for names, _ in METRIC_GROUPS.values() for name in names]
+GROUP_COLUMNS = _group_columns()  # metric group -> its columns in the score matrix
+
+# Only these fields are needed to rank; qa_details stays in the database
+REPORT_PROJECTION = {'session_id': 1, 'overall_score': 1, 'date': 1,
+                     **{group: 1 for group in METRIC_GROUPS}}
+
+def parse_weights(text):
+    """Group weights from 'technical:2,communication:1,personality:1' (missing groups get 0).
+
+    Raises ValueError for unknown criteria and for weights that are not
+    finite, non-negative numbers.
+    """
+    if not text:
+        return dict(DEFAULT_GROUP_WEIGHTS)
+    weights = {group: 0.0 for group in METRIC_GROUPS}
+    for item in text.split(','):
+        name, _, value = item.partition(':')
+        group = f"{name.strip()}_metrics"
+        if group not in weights:
+            raise ValueError(f"Unknown criterion: {name.strip()}")
+        try:
+            weight = float(value)
+        except ValueError:
+            weight = math.nan
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Weight for {name.strip()} must be a non-negative number")
+        weights[group] = weight
+    if sum(weights.values()) <= 0:
+        raise ValueError("At least one criterion needs a positive weight")
+    return weights
+
+def score_matrix(reports):
+    """Candidates x metrics array of scores (NaN where a report lacks a metric)."""
+    index = {name: i for i, name in enumerate(METRIC_NAMES)}
+    matrix = np.full((len(reports), len(METRIC_NAMES)), np.nan)
+    for row, report in enumerate(reports):
+        for group in METRIC_GROUPS:
+            for metric in report.get(group) or []:
+                column = index.get(metric.get('name'))
+                value = metric.get('value')
+                if column is not None and isinstance(value, (int, float)):
+                    matrix[row, column] = value
+    return matrix
+
+def metric_weights(group_weights):
+    """Per-metric weight vector: each group's weight split evenly over its metrics, summing to 1."""
+    weights = np.zeros(len(METRIC_NAMES))
+    for group, columns in GROUP_COLUMNS.items():
+        weights[columns] = group_weights.get(group, 0.0) / (columns.stop - columns.start)
+    return weights / weights.sum()
+
+def rank_candidates(reports, group_weights=None):
+    """Rank reports on weighted, standardized metric scores in one vectorized pass.
+
+    reports are leaderboard candidate entries (leaderboard.candidate_entry).
+    Missing metrics count as the cohort mean. Each metric is z-scored across
+    candidates so metrics with a wide spread don't dominate, and the composite
+    is the weighted sum of z-scores. Returns one summary dict per report,
+    best first, with rank, percentile, composite z-score, weighted score and
+    per-group averages and z-scores.
+    """
+    if not reports:
+        return []
+    matrix = score_matrix(reports)
+    missing = np.isnan(matrix)
+    counts = (~missing).sum(axis=0)
+    column_means = np.where(missing, 0.0, matrix).sum(axis=0) / np.maximum(counts, 1)
+    matrix = np.where(missing, column_means, matrix)
+
+    std = matrix.std(axis=0)
+    z = (matrix - matrix.mean(axis=0)) / np.where(std > 0, std, 1.0)
+    weights = metric_weights(group_weights or DEFAULT_GROUP_WEIGHTS)
+    composite = z @ weights
+    weighted_score = matrix @ weights
+
+    # Stable sort: ties keep the input order
+    order = np.argsort(-composite, kind='stable')
+    ranks = np.empty(len(reports), dtype=int)
+    ranks[order] = np.arange(1, len(reports) + 1)
+    n = len(reports)
+    percentiles = 100.0 * (n - ranks) / (n - 1) if n > 1 else np.full(n, 100.0)
+
+    columns = {
+        'rank': ranks.tolist(),
+        'percentile': np.round(percentiles, 1).tolist(),
+        'composite_z': np.round(composite, 3).tolist(),
+        'weighted_score': np.round(weighted_score, 1).tolist(),
+    }
+    for group, group_columns in GROUP_COLUMNS.items():
+        prefix = group.split('_')[0]
+        columns[f'{prefix}_score'] = np.round(matrix[:, group_columns].mean(axis=1), 1).tolist()
+        columns[f'{prefix}_z'] = np.round(z[:, group_columns].mean(axis=1), 3).tolist()
+
+    candidates = []
+    for row in order.tolist():
+        report = reports[row]
+        candidate = {
+            'report_id': str(report['report_id']),
+            'session_id': report.get('session_id'),
+            'overall_score': report.get('overall_score'),
+        }
+        for name, values in columns.items():
+            candidate[name] = values[row]
+        candidates.append(candidate)
+    return candidates
@@ -0,0 +1,76 @@
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open."""
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until a background probe sees it healthy again.
+
+    After failure_threshold consecutive failures the circuit opens: check()
+    raises CircuitOpenError immediately, so callers go straight to their
+    fallback path. While open, probe() is called every probe_interval seconds
+    from a daemon thread and the circuit closes on the first success, after
+    which the callbacks registered with on_close() are run.
+    """
+
+    def __init__(self, name, probe, failure_threshold=3, probe_interval=5.0):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._close_callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def check(self):
+        if self.state == OPEN:
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def on_close(self, callback):
+        """Call callback() from the probe thread each time the circuit closes again."""
+        self._close_callbacks.append(callback)
+
+    def record_success(self):
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.opened_at = time.time()
+            self.times_opened += 1
+        print(f"{self.name} circuit opened after {self.failures} consecutive failures")
+        threading.Thread(target=self._probe_loop, name=f"{self.name}-probe", daemon=True).start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.probe()
+            except Exception:
+                continue
+            with self._lock:
+                self.state = CLOSED
+                self.failures = 0
+            print(f"{self.name} circuit closed; {self.name} is reachable again")
+            for callback in self._close_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"{self.name} circuit close callback failed: {e}")
+            return
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import re
+import llm_gateway
+from async_runtime import submit
+from llm_gateway import estimate_tokens
+
+# Token budget for the conversation history part of a prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+# Turns that always stay verbatim; older ones get folded into the summary
+CONTEXT_RECENT_TURNS = int(os.getenv('CONTEXT_RECENT_TURNS', '3'))
+SUMMARY_TOKEN_BUDGET = 250
+# Session field holding an LLM summary written in the background: {'replaces': ..., 'summary': ...}
+SUMMARY_UPDATE_FIELD = 'summary_update'
+RESUME_DIGEST_TOKENS = int(os.getenv('RESUME_DIGEST_TOKENS', '300'))
+
+def normalize_whitespace(text):
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, preferring a word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    return cut[:cut.rfind(' ')] if ' ' in cut else cut
+
+def digest_resume(resume_text, max_tokens=RESUME_DIGEST_TOKENS):
+    """Whitespace-normalized resume cut to a fixed token budget; computed once per session."""
+    return truncate_to_tokens(normalize_whitespace(resume_text), max_tokens)
+
+def format_qa(question, answer):
+    return f"Q: {question}\nA: {answer}"
+
+class ConversationContext:
+    """Rolling, token-counted interview history for prompt building.
+
+    Turns are appended as they happen, so nothing is re-joined from the full
+    transcript. Once the verbatim turns exceed the token budget, everything but
+    the last few turns is folded into a running summary, which keeps the prompt
+    at turn 10 about the size of the prompt at turn 2. The context is plain
+    data (to_dict/from_dict) so it can live in the session store; the LLM
+    summary of folded turns arrives later in a separate session field
+    (SUMMARY_UPDATE_FIELD) that from_session applies.
+    """
+
+    def __init__(self, resume_digest='', summary='', turns=None, turn_count=0):
+        self.resume_digest = resume_digest
+        self.summary = summary
+        self.turns = turns or []  # [[text, tokens], ...]
+        self.turn_count = turn_count
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data) if data else None
+
+    @classmethod
+    def from_session(cls, fields):
+        """The context in a session's fields with a finished background summary applied, or None."""
+        context = cls.from_dict(fields.get('context'))
+        if context:
+            context.apply_summary(fields.get(SUMMARY_UPDATE_FIELD))
+        return context
+
+    def to_dict(self):
+        return {
+            'resume_digest': self.resume_digest,
+            'summary': self.summary,
+            'turns': self.turns,
+            'turn_count': self.turn_count
+        }
+
+    @property
+    def history_tokens(self):
+        return estimate_tokens(self.summary) + sum(tokens for _, tokens in self.turns)
+
+    def append(self, text):
+        """Add one rendered turn (e.g. from format_qa)."""
+        self.turns.append([text, estimate_tokens(text)])
+        self.turn_count += 1
+
+    def compact(self, on_summary=None):
+        """Fold older turns into the summary if the history is over budget; returns whether it did.
+
+        The turns are folded into an extractive summary at once, so the prompt
+        being built never waits on the LLM. With on_summary, an LLM summary of
+        the same turns is written on the shared event loop and passed to
+        on_summary(update) from a worker thread; store the update under
+        SUMMARY_UPDATE_FIELD. It replaces the extractive summary unless the
+        context has been compacted again in the meantime.
+        """
+        if self.history_tokens <= CONTEXT_TOKEN_BUDGET or len(self.turns) <= CONTEXT_RECENT_TURNS:
+            return False
+
+        old = [text for text, _ in self.turns[:-CONTEXT_RECENT_TURNS]]
+        self.turns = self.turns[-CONTEXT_RECENT_TURNS:]
+        previous = self.summary
+        self.summary = _fit_summary(extractive_summary(previous, old))
+        if on_summary:
+            submit(_summarize_later(previous, old, self.summary, on_summary))
+        return True
+
+    def apply_summary(self, update):
+        """Swap in a background summary if it replaces the current one; returns whether it did."""
+        if update and update.get('replaces') == self.summary:
+            self.summary = update['summary']
+            return True
+        return False
+
+    def render(self):
+        """History block for a prompt: the running summary followed by recent turns verbatim."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation: {self.summary}")
+        parts.extend(text for text, _ in self.turns)
+        return "\n".join(parts)
+
+def _fit_summary(summary):
+    return truncate_to_tokens(normalize_whitespace(summary), SUMMARY_TOKEN_BUDGET)
+
+async def _summarize_later(previous, texts, replaces, on_summary):
+    try:
+        summary = _fit_summary(await summarize_turns(previous, texts))
+    except Exception as e:
+        print(f"Error summarizing conversation, keeping the extractive summary: {e}")
+        return
+    try:
+        # on_summary writes to the session store; keep blocking I/O off the shared loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, on_summary, {'replaces': replaces, 'summary': summary})
+    except Exception as e:
+        print(f"Could not store the conversation summary: {e}")
+
+async def summarize_turns(summary, texts):
+    """LLM summary of the previous summary plus the turns being folded in."""
+    prompt = f"""Update the running summary of a job interview.
+
+Current summary:
+{summary or "(none)"}
+
+New exchanges to fold in:
+{chr(10).join(texts)}
+
+Write the updated summary in at most {SUMMARY_TOKEN_BUDGET * 3 // 4} words. Keep the topics already covered and concrete facts the candidate stated (technologies, projects, numbers, strengths, gaps). Output only the summary.
+"""
+    return await llm_gateway.ainvoke(prompt, temperature=0.2)
+
+def extractive_summary(summary, texts):
+    """No-LLM fallback: the first sentence of each folded turn."""
+    firsts = [re.split(r'(?<=[.!?])\s', normalize_whitespace(text), maxsplit=1)[0] for text in texts]
+    return " ".join([summary] + firsts if summary else firsts)
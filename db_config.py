@@ -3,7 +3,15 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_pymongo import PyMongo
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
+from pymongo.collection import Collection
+from pymongo.command_cursor import CommandCursor
+from pymongo.cursor import Cursor
+from pymongo.database import Database
+from pymongo.errors import ConnectionFailure
+from circuit_breaker import CircuitBreaker
+from metrics import register_gauge
 import os
+import threading
 
 # Initialize extensions
 db = SQLAlchemy()  # For structured data (users, organizations, interview sessions)
@@ -11,6 +19,71 @@ mongo = PyMongo()  # For non-structured data (detailed interview reports)
 bcrypt = Bcrypt()  # For password hashing
 jwt = JWTManager()  # For JWT authentication
 
+# Keep MongoDB outages cheap: fail within a couple of seconds instead of the
+# driver's 30 s default, and stop trying at all while the circuit is open
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '2000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '2000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '5000'))
+MONGO_BREAKER_FAILURES = int(os.getenv('MONGO_BREAKER_FAILURES', '3'))
+MONGO_PROBE_INTERVAL = float(os.getenv('MONGO_PROBE_INTERVAL', '5'))
+
+def _ping_mongo():
+    mongo.cx.admin.command('ping')
+
+mongo_breaker = CircuitBreaker('MongoDB', _ping_mongo, MONGO_BREAKER_FAILURES, MONGO_PROBE_INTERVAL)
+
+register_gauge('mongo_circuit_open', 'Whether the MongoDB circuit breaker is open (1) or closed (0)',
+               lambda: mongo_breaker.is_open)
+register_gauge('mongo_circuit_consecutive_failures', 'Consecutive MongoDB connection failures',
+               lambda: mongo_breaker.failures)
+register_gauge('mongo_circuit_opened_total', 'Times the MongoDB circuit breaker has opened',
+               lambda: mongo_breaker.times_opened)
+
+class GuardedMongo:
+    """Proxy for a pymongo database, collection or cursor that goes through mongo_breaker.
+
+    Calls fail fast with CircuitOpenError while the circuit is open, and
+    connection errors count towards opening it. Callers already treat any
+    exception as "MongoDB not available", so no call site needs to change.
+    """
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if isinstance(attr, (Database, Collection)):
+            return GuardedMongo(attr)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            mongo_breaker.check()
+            try:
+                result = attr(*args, **kwargs)
+            except ConnectionFailure:
+                mongo_breaker.record_failure()
+                raise
+            if isinstance(result, (Cursor, CommandCursor)):
+                # Cursors are lazy; the round trip happens while iterating
+                return GuardedMongo(result)
+            mongo_breaker.record_success()
+            return result
+        return call
+
+    def __getitem__(self, name):
+        return GuardedMongo(self._target[name])
+
+    def __iter__(self):
+        mongo_breaker.check()
+        try:
+            for document in self._target:
+                yield document
+        except ConnectionFailure:
+            mongo_breaker.record_failure()
+            raise
+        mongo_breaker.record_success()
+
 def init_db(app):
     """Initialize all database connections and authentication tools"""
     # Configure SQLAlchemy
@@ -36,11 +109,51 @@ def init_db(app):
     
     # Initialize MongoDB but don't fail if unavailable
     try:
-        mongo.init_app(app)
+        mongo.init_app(app,
+                       serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                       connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                       socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS)
+        if mongo.db is not None:
+            mongo.db = GuardedMongo(mongo.db)
         print("MongoDB connected successfully")
     except Exception as e:
         print(f"MongoDB not available: {e}. Continuing without MongoDB...")
+    else:
+        # Build indexes in the background so an unreachable server doesn't block startup
+        threading.Thread(target=ensure_indexes_until_done, name='mongo-indexes', daemon=True).start()
     
     # Create all tables in SQLite if they don't exist
     with app.app_context():
         db.create_all()
+
+def ensure_indexes():
+    """Create the MongoDB indexes used by per-session and per-user lookups; returns whether that worked"""
+    try:
+        mongo.db.interview_details.create_index('session_id')
+        mongo.db.interview_qa.create_index([('session_id', 1), ('timestamp', 1)])
+        mongo.db.interview_reports.create_index('session_id')
+        # Serves the per-user report list, newest first (keyset pagination on date, _id)
+        mongo.db.interview_reports.create_index([('user_id', 1), ('date', -1), ('_id', -1)])
+        mongo.db.template_leaderboards.create_index('template_id', unique=True)
+        mongo.db.resume_digests.create_index('file_hash', unique=True)
+        print("MongoDB indexes ensured")
+        return True
+    except Exception as e:
+        print(f"Could not create MongoDB indexes: {e}")
+        return False
+
+_indexes_retry = threading.Event()
+mongo_breaker.on_close(_indexes_retry.set)
+
+def ensure_indexes_until_done():
+    """Retry ensure_indexes until it succeeds: right after the circuit closes, else every probe interval.
+
+    The unique indexes (template_leaderboards.template_id in particular) are
+    what stop concurrent upserts from creating duplicate documents, so a
+    MongoDB outage at startup must not leave them missing.
+    """
+    while True:
+        _indexes_retry.clear()
+        if ensure_indexes():
+            return
+        _indexes_retry.wait(MONGO_PROBE_INTERVAL)
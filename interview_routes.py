@@ -1,24 +1,100 @@
-from flask import Blueprint, request, jsonify, current_app, send_file, after_this_request
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, url_for
 from models import InterviewSession, InterviewTemplate, User
 from db_config import db, mongo
 from datetime import datetime
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
-from langchain_groq import ChatGroq
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
-import asyncio
-import edge_tts
+import base64
+import llm_gateway
+from async_runtime import iterate
+from tts_service import DEFAULT_RATE, is_valid_rate, split_sentences, speak_sentences, synthesize_cached
+from tts_cache import cache_key, tts_cache
+from session_store import create_session_store
+from conversation_context import SUMMARY_UPDATE_FIELD, ConversationContext, digest_resume, format_qa
+from persistence import get_writer
+from report_jobs import ReportJobQueue, callback_allowed
+from report_engine import evaluate_interview
+from structured_output import generate as generate_structured
+from candidate_ranking import REPORT_PROJECTION, parse_weights, rank_candidates
+from pagination import encode_cursor, parse_page_args, stream_page
+from report_cache import REPORT_CACHE_CONTROL, report_cache, report_etag
+from resume_ingest import RESUME_COLLECTION, RESUME_MAX_BYTES, ResumeError, digest_cache, file_hash, ingest_pdf
+from llm_cache import cached_invoke, call_site
+from question_bank import QUESTION_BANK_MODE, QUESTION_MODES, next_bank_question, rephrase_prompt
+from question_prefetch import PREFETCH_ENABLED, QuestionPrefetcher
+from leaderboard import (LEADERBOARD_COLLECTION, LEADERBOARD_VERSION, candidate_entry, leaderboard_update,
+                         rebuild_requests, summarize_leaderboard)
 
 load_dotenv()
 interview_bp = Blueprint('interview', __name__)
 
-# Initialize Groq LLM
-llm = ChatGroq(model="llama3-70b-8192", temperature=0.7, max_retries=2)
 VOICE = "en-US-AriaNeural"
 
-# In-memory store as a fallback for when MongoDB is not available
-in_memory_sessions = {}
+# TTS clips are content-addressed, so browsers may keep them forever
+TTS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# A clip streamed while it is synthesized may still be cut short; don't let browsers keep it
+TTS_STREAM_CACHE_CONTROL = "no-store"
+
+OPENING_FALLBACK_QUESTION = "Hello! Welcome to your interview. Please tell me about yourself."
+FALLBACK_QUESTION = "That's interesting. Can you elaborate on that?"
+
+# Fixed phrases worth having in the TTS cache before the first interview starts
+CANNED_PHRASES = [OPENING_FALLBACK_QUESTION, FALLBACK_QUESTION]
+
+# The ice-breaker only depends on these settings (not the resume), so sessions
+# with the same settings share a small pool of cached openings
+OPENING_PROMPT = """You are a friendly AI Interviewer. A candidate is starting a mock interview.
+Here are their preferences:
+Role: {role}
+Experience: {experience} years
+Difficulty: {difficulty}
+Focus Areas: {focus_areas}
+
+Generate a friendly and welcoming opening question. It should be an ice-breaker that invites the candidate to introduce themselves in the context of the role they are practicing for.
+Example: "Hello! Welcome to your mock interview for the {role} position. To get started, could you please tell me a bit about yourself and your experience?"
+"""
+OPENING_CACHE = call_site('opening_question', ttl=24 * 3600, variants=5)
+
+# Candidates described by the LLM in a comparison; the rest are only ranked
+COMPARISON_SHORTLIST = int(os.getenv('COMPARISON_SHORTLIST', '5'))
+
+COMPARISON_SCHEMA = {
+    'type': 'object',
+    'required': ['ranked_candidates', 'overall_recommendation'],
+    'properties': {
+        'ranked_candidates': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': ['report_id', 'strengths', 'weaknesses', 'recommendation'],
+                'properties': {
+                    'report_id': {'type': 'string'},
+                    'rank': {'type': 'integer', 'minimum': 1},
+                    'strengths': {'type': 'array', 'items': {'type': 'string'}},
+                    'weaknesses': {'type': 'array', 'items': {'type': 'string'}},
+                    'recommendation': {'type': 'string'},
+                },
+            },
+        },
+        'overall_recommendation': {'type': 'string'},
+    },
+}
+
+# Questions per interview; the report is generated after the last answer
+MAX_QUESTIONS = 10
+
+# Shared session state, also the fallback for when MongoDB is not available
+session_store = create_session_store('interview')
+
+prefetcher = QuestionPrefetcher(session_store)
+prefetcher.register_metrics()
 
 @interview_bp.route('/start_interview', methods=['POST'])
 def start_interview():
@@ -38,47 +114,60 @@ def start_interview():
     
     if not settings.get('role'):
         return jsonify({'error': 'Missing role'}), 400
+
+    template_id = form_data.get('template_id') or None
+    if template_id and not InterviewTemplate.query.get(template_id):
+        return jsonify({'error': 'Template not found'}), 404
+    # Templated interviews draw from the question bank unless told otherwise
+    question_mode = form_data.get('question_mode') or (QUESTION_BANK_MODE if template_id else 'llm')
+    if question_mode not in QUESTION_MODES:
+        return jsonify({'error': f"question_mode must be one of {', '.join(QUESTION_MODES)}"}), 400
+    settings['template_id'] = template_id
+    settings['question_mode'] = question_mode
+
+    # An uploaded PDF (or the id of one uploaded earlier) replaces pasted resume text
+    try:
+        resume = resume_from_request()
+    except ResumeError as e:
+        return jsonify({'error': str(e)}), 400
+    if resume:
+        settings['resume_id'] = resume['file_hash']
+        settings['resume_digest'] = resume['digest']
     
     session = InterviewSession(
         user_id=mock_user_id,
-        template_id=None,
+        template_id=template_id,
         status='active',
         start_time=datetime.utcnow(),
     )
     db.session.add(session)
     db.session.commit()
 
-    # Store in-memory for resilience
-    in_memory_sessions[session.id] = {
-        'settings': settings,
-        'qa_records': []
-    }
+    # The resume digest is computed once here and reused by every follow-up question prompt
+    # (next question, prefetch, bank rephrasing); the opening question leaves it out
+    context = ConversationContext(resume_digest=session_resume_digest(settings))
 
-    try:
-        mongo.db.interview_details.insert_one({
-            'session_id': session.id,
-            'user_id': mock_user_id,
-            'settings': settings
-        })
-    except Exception as e:
-        current_app.logger.warning(f"MongoDB not available, could not save interview details: {e}")
-    
-    prompt = f"""You are a friendly AI Interviewer. A candidate is starting a mock interview.
-Here are their preferences:
-Role: {settings.get('role')}
-Experience: {settings.get('experience')} years
-Difficulty: {settings.get('difficulty')}
-Focus Areas: {", ".join(settings.get('focusAreas', []))}
-Resume Summary: {settings.get('resume_text')[:500]}
+    # Store in the session store for resilience
+    session_store.create(session.id, {'settings': settings, 'context': context.to_dict()})
 
-Generate a friendly and welcoming opening question. It should be an ice-breaker that invites the candidate to introduce themselves in the context of the role they are practicing for.
-Example: "Hello! Welcome to your mock interview for the {settings.get('role')} position. To get started, could you please tell me a bit about yourself and your experience?"
-"""
+    get_writer().insert('interview_details', {
+        'session_id': session.id,
+        'user_id': mock_user_id,
+        'settings': settings
+    })
+    
     try:
-        first_question = llm.invoke(prompt).content.strip()
+        first_question = cached_invoke(OPENING_CACHE, OPENING_PROMPT, {
+            'role': settings.get('role'),
+            'experience': settings.get('experience'),
+            'difficulty': settings.get('difficulty'),
+            'focus_areas': settings.get('focusAreas', []),
+        })
     except Exception as e:
         current_app.logger.error(f"LLM invocation failed: {e}")
-        first_question = "Hello! Welcome to your interview. Please tell me about yourself."
+        first_question = OPENING_FALLBACK_QUESTION
+
+    remember_question(session.id, first_question)
 
     return jsonify({
         'session_id': session.id,
@@ -86,109 +175,378 @@ Example: "Hello! Welcome to your mock interview for the {settings.get('role')} p
         'message': 'Interview session started successfully'
     }), 201
 
-@interview_bp.route('/submit_answer', methods=['POST'])
-def submit_answer():
-    data = request.get_json()
-    session_id = data.get('session_id')
-    
-    if not all(k in data for k in ('session_id', 'answer')):
-        return jsonify({'error': 'Missing session_id or answer'}), 400
+
+def session_resume_digest(settings):
+    return settings.get('resume_digest') or digest_resume(settings.get('resume_text', ''))
+
+def load_resume(data):
+    """(digest document, cached) for resume PDF bytes, keyed by file hash.
+
+    Looks in memory, then in MongoDB, and only extracts the PDF when neither
+    has seen this exact file before.
+    """
+    key = file_hash(data)
+    resume = digest_cache.get(key)
+    if resume is not None:
+        return resume, True
+    try:
+        resume = mongo.db[RESUME_COLLECTION].find_one({'file_hash': key}, {'_id': 0})
+    except Exception as e:
+        current_app.logger.warning(f"MongoDB not available, could not look up resume digest: {e}")
+    if resume is not None:
+        digest_cache.set(key, resume)
+        return resume, True
+
+    resume = ingest_pdf(data)
+    resume['created_at'] = datetime.utcnow()
+    digest_cache.set(key, resume)
+    get_writer().update(RESUME_COLLECTION, {'file_hash': key}, {'$setOnInsert': dict(resume)}, upsert=True)
+    return resume, False
+
+def resume_from_request():
+    """Digest for the resume_file upload or resume_id of the current request, if any"""
+    upload = request.files.get('resume_file')
+    if upload:
+        data = upload.read(RESUME_MAX_BYTES + 1)
+        if data:
+            return load_resume(data)[0]
+    resume_id = request.form.get('resume_id')
+    if resume_id:
+        resume = digest_cache.get(resume_id)
+        if resume is None:
+            try:
+                resume = mongo.db[RESUME_COLLECTION].find_one({'file_hash': resume_id}, {'_id': 0})
+            except Exception as e:
+                current_app.logger.warning(f"MongoDB not available, could not look up resume digest: {e}")
+        if resume is None:
+            raise ResumeError("Unknown resume_id")
+        return resume
+    return None
+
+@interview_bp.route('/resume', methods=['POST'])
+def upload_resume():
+    """Ingest a resume PDF once and return its digest and resume_id for start_interview"""
+    upload = request.files.get('resume_file')
+    if not upload:
+        return jsonify({'error': 'No resume_file provided'}), 400
+    data = upload.read(RESUME_MAX_BYTES + 1)
+    if len(data) > RESUME_MAX_BYTES:
+        return jsonify({'error': f"Resume is larger than {RESUME_MAX_BYTES // (1024 * 1024)} MB"}), 413
+    try:
+        resume, cached = load_resume(data)
+    except ResumeError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'resume_id': resume['file_hash'],
+        'cached': cached,
+        'pages': resume['pages'],
+        'pages_read': resume['pages_read'],
+        'truncated': resume['truncated'],
+        'sections': resume['sections'],
+        'digest': resume['digest'],
+    }), 200 if cached else 201
+
+def remember_question(session_id, question):
+    """Persist the question the candidate is currently answering"""
+    session_store.update(session_id, current_question=question)
+
+    get_writer().set_fields('interview_details', {'session_id': session_id}, {'current_question': question})
+
+    if PREFETCH_ENABLED:
+        speculate_next_question(session_id, question)
+
+def speculate_next_question(session_id, question):
+    """Start generating candidates for the question after this one, unless this is the last one"""
+    fields = session_store.get(session_id)
+    if not fields or len(session_store.get_turns(session_id)) >= MAX_QUESTIONS - 1:
+        return
+    # Question bank sessions rarely need the LLM, so speculating would only waste tokens
+    if fields.get('settings', {}).get('question_mode', 'llm') != 'llm':
+        return
+    context = ConversationContext.from_session(fields) or ConversationContext()
+    prefetcher.schedule(session_id, question, fields.get('settings', {}), context.render(),
+                        context.resume_digest, fields.get('prefetch_tokens', 0))
+
+def restore_session(session_id):
+    """Rebuild a session's cached state from MongoDB after the session store lost it"""
+    details = None
+    qa_records = []
+    try:
+        details = mongo.db.interview_details.find_one({'session_id': session_id})
+        qa_records = list(mongo.db.interview_qa.find({'session_id': session_id}, {'_id': 0}).sort('timestamp', 1))
+    except Exception as e:
+        current_app.logger.warning(f"MongoDB not available, could not read session data: {e}")
+
+    settings = (details or {}).get('settings', {})
+    context = ConversationContext(resume_digest=session_resume_digest(settings))
+    for qa in qa_records:
+        context.append(format_qa(qa['question'], qa['answer']))
+    context.compact(on_summary=lambda update: session_store.update(session_id, **{SUMMARY_UPDATE_FIELD: update}))
+
+    fields = {'settings': settings, 'context': context.to_dict()}
+    if details and details.get('current_question'):
+        fields['current_question'] = details['current_question']
+    if details and details.get('bank_asked'):
+        fields['bank_asked'] = details['bank_asked']
+    session_store.create(session_id, fields)
+    for qa in qa_records:
+        session_store.append_turn(session_id, qa)
+    return fields
+
+def prepare_next_turn(data):
+    """Record a submitted answer and build the prompt for the next question.
+
+    Returns (response, prompt, session_id, prefetched). When response is set
+    (bad request, or the interview is over and a report was generated) it
+    should be returned as-is and no question generated. prefetched is a
+    ready next question (speculated, or from the question bank) to serve
+    instead of running prompt, or None.
+    """
+    if not data or not all(k in data for k in ('session_id', 'answer')):
+        return (jsonify({'error': 'Missing session_id or answer'}), 400), None, None, None
     
-    session = InterviewSession.query.get(session_id)
+    session = InterviewSession.query.get(data['session_id'])
     if not session or session.status != 'active':
-        return jsonify({'error': 'Interview session not found or not active'}), 404
+        return (jsonify({'error': 'Interview session not found or not active'}), 404), None, None, None
     
+    # Settings and history are served from the session store; MongoDB is only
+    # read when the store has lost the session
+    session_fields = session_store.get(session.id)
+    if session_fields is None:
+        session_fields = restore_session(session.id)
+
+    current_question = session_fields.get('current_question')
     qa_data = {
         'session_id': session.id,
-        'question': data.get('question', 'Previous question'),
+        'question': data.get('question') or current_question or 'Previous question',
         'answer': data['answer'],
         'timestamp': datetime.utcnow()
     }
     
-    # Update in-memory store
-    if session.id in in_memory_sessions:
-        if 'qa_records' not in in_memory_sessions[session.id]:
-            in_memory_sessions[session.id]['qa_records'] = []
-        in_memory_sessions[session.id]['qa_records'].append(qa_data)
+    # Update session store
+    question_count = session_store.append_turn(session.id, qa_data)
 
-    try:
-        mongo.db.interview_qa.insert_one(qa_data)
-    except Exception as e:
-        current_app.logger.warning(f"MongoDB not available, could not save Q&A record: {e}")
+    get_writer().insert('interview_qa', qa_data)
 
-    # Fetch data for prompt generation, with fallback to in-memory
-    session_details_doc = None
-    qa_records = []
-    settings = {}
+    settings = session_fields.get('settings', {})
     
-    try:
-        session_details_doc = mongo.db.interview_details.find_one({'session_id': session.id})
-        qa_records = list(mongo.db.interview_qa.find({'session_id': session.id}))
-    except Exception as e:
-        current_app.logger.warning(f"MongoDB not available, could not read session data: {e}")
-
-    if session_details_doc and session_details_doc.get('settings'):
-        settings = session_details_doc.get('settings')
-    elif session.id in in_memory_sessions and in_memory_sessions[session.id].get('settings'):
-        settings = in_memory_sessions[session.id].get('settings')
+    if question_count >= MAX_QUESTIONS:
+        prefetcher.cancel(session.id)
+        # The interview is over, as if end_interview had been called
+        session.status = 'completed'
+        session.end_time = datetime.utcnow()
+        db.session.commit()
+        return enqueue_report(session.id), None, session.id, None
 
-    if not qa_records and session.id in in_memory_sessions and in_memory_sessions[session.id].get('qa_records'):
-        qa_records = in_memory_sessions[session.id].get('qa_records')
-    
-    question_count = len(qa_records)
-    if question_count >= 10: # End after 10 questions
-        return generate_report(session.id)
+    # Extend the rolling context with this turn instead of re-joining the whole transcript
+    context = ConversationContext.from_session(session_fields)
+    context.append(format_qa(qa_data['question'], qa_data['answer']))
+    # Older turns are folded in cheaply now; their LLM summary is written in the background
+    context.compact(on_summary=lambda update: session_store.update(session.id, **{SUMMARY_UPDATE_FIELD: update}))
+    session_store.update(session.id, context=context.to_dict())
 
     # Generate next question
-    conversation_history = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in qa_records])
+    conversation_history = context.render()
 
     prompt = f"""You are an AI Interviewer in a mock interview.
 Role: {settings.get('role')}
 Difficulty: {settings.get('difficulty')}
 Focus Areas: {", ".join(settings.get('focusAreas', []))}
+Resume Summary: {context.resume_digest}
 
 Conversation so far:
 {conversation_history}
 
 Based on the history and settings, generate the next logical question. Vary question types (technical, behavioral, situational). Keep it concise.
 """
+    asked = [turn['question'] for turn in session_store.get_turns(session.id)]
+    if settings.get('question_mode', 'llm') != 'llm':
+        prompt, ready = bank_turn(session, session_fields, settings, context, asked, qa_data['answer'], prompt)
+        return None, prompt, session.id, ready
+
+    prefetched = None
+    if PREFETCH_ENABLED:
+        prefetched = prefetcher.take(session.id, qa_data['question'], qa_data['answer'], asked)
+    return None, prompt, session.id, prefetched
+
+def bank_turn(session, session_fields, settings, context, asked, answer, prompt):
+    """(prompt, ready question) for a question bank session.
+
+    A template question (or any bank question in bank mode) is asked as-is;
+    in hybrid mode a curated question becomes a short rephrasing prompt.
+    When no bank question fits, the live generation prompt is kept.
+    """
+    bank_asked = session_fields.get('bank_asked', [])
+    conversation_history = context.render()
+    template = session.template
+    entry, _ = next_bank_question(
+        f"{conversation_history}\n{answer}", asked + bank_asked,
+        focus_areas=settings.get('focusAreas', []), difficulty=settings.get('difficulty'),
+        template_id=session.template_id, template_questions=template.questions if template else None)
+    if entry is None:
+        return prompt, None
+
+    bank_asked = bank_asked + [entry['text']]
+    session_store.update(session.id, bank_asked=bank_asked)
+    get_writer().set_fields('interview_details', {'session_id': session.id}, {'bank_asked': bank_asked})
+    if settings.get('question_mode') == 'hybrid' and entry['source'] == 'curated':
+        return rephrase_prompt(entry['text'], conversation_history, settings.get('role'), context.resume_digest), None
+    return prompt, entry['text']
+
+@interview_bp.route('/submit_answer', methods=['POST'])
+def submit_answer():
+    response, prompt, session_id, next_question = prepare_next_turn(request.get_json())
+    if response is not None:
+        return response
+
     try:
-        next_question = llm.invoke(prompt).content.strip()
+        next_question = next_question or llm_gateway.invoke(prompt).strip()
     except Exception as e:
         current_app.logger.error(f"LLM invocation failed: {e}")
-        next_question = "That's interesting. Can you elaborate on that?"
+        next_question = FALLBACK_QUESTION
+
+    remember_question(session_id, next_question)
 
     return jsonify({'next_question': next_question}), 200
 
-@interview_bp.route('/tts', methods=['POST'])
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def question_tokens(prompt, prefetched=None):
+    """Text pieces of the next question: a ready question at once, or the LLM's output as it streams"""
+    if prefetched:
+        yield prefetched
+        return
+    async for token in llm_gateway.astream(prompt):
+        yield token
+
+async def spoken_question_events(prompt, prefetched, sentences):
+    """SSE 'sentence' and 'audio' events for the next question, spoken sentence by sentence.
+
+    Appends each sentence to sentences, so the caller can persist the whole
+    question once the events are exhausted.
+    """
+    async def question_sentences():
+        try:
+            async for sentence in split_sentences(question_tokens(prompt, prefetched)):
+                sentences.append(sentence)
+                yield sentence
+        except Exception as e:
+            print(f"LLM streaming failed: {e}")
+        if not sentences:
+            sentences.append(FALLBACK_QUESTION)
+            yield FALLBACK_QUESTION
+
+    async for kind, index, payload in speak_sentences(question_sentences(), VOICE):
+        if kind == 'sentence':
+            yield sse_event('sentence', {'index': index, 'text': payload})
+        else:
+            yield sse_event('audio', {'index': index, 'data': base64.b64encode(payload).decode('ascii')})
+
+@interview_bp.route('/submit_answer/stream', methods=['POST'])
+def submit_answer_stream():
+    """Like submit_answer, but streams the next question as Server-Sent Events.
+
+    Emits a 'token' event per generated piece of text and a final 'done' event
+    carrying the complete question, which is also persisted as the current question.
+    """
+    response, prompt, session_id, prefetched = prepare_next_turn(request.get_json())
+    if response is not None:
+        return response
+
+    def generate():
+        parts = []
+        try:
+            for token in iterate(question_tokens(prompt, prefetched)):
+                parts.append(token)
+                yield sse_event('token', {'token': token})
+        except Exception as e:
+            current_app.logger.error(f"LLM streaming failed: {e}")
+
+        next_question = "".join(parts).strip() or FALLBACK_QUESTION
+        remember_question(session_id, next_question)
+        yield sse_event('done', {'next_question': next_question})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@interview_bp.route('/submit_answer/speech', methods=['POST'])
+def submit_answer_speech():
+    """Like submit_answer, but streams the spoken next question as it is generated.
+
+    The LLM output is split at sentence boundaries and each sentence is sent to
+    TTS as soon as it is complete, so audio starts after the first sentence
+    instead of after the whole question. Server-Sent Events, in order:
+    'sentence' {index, text}, then 'audio' {index, data} with base64 MP3 chunks
+    for that sentence, and finally 'done' {next_question}.
+    """
+    response, prompt, session_id, prefetched = prepare_next_turn(request.get_json())
+    if response is not None:
+        return response
+
+    sentences = []
+
+    def generate():
+        try:
+            yield from iterate(spoken_question_events(prompt, prefetched, sentences))
+        except Exception as e:
+            current_app.logger.error(f"Error streaming spoken question: {e}")
+
+        next_question = " ".join(sentences) or FALLBACK_QUESTION
+        remember_question(session_id, next_question)
+        yield sse_event('done', {'next_question': next_question})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@interview_bp.route('/tts', methods=['GET', 'POST'])
 def text_to_speech():
-    data = request.get_json()
+    """Synthesize speech for text, served from the TTS cache when possible.
+
+    Cache misses are streamed to the client as edge-tts produces them, and
+    not marked cacheable: the stream may break off. GET (?text=...&rate=...)
+    lets browsers keep clips served from the cache; conditional requests
+    with a matching ETag get a 304 without touching the cache.
+    """
+    data = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
     text = data.get('text')
+    rate = data.get('rate', DEFAULT_RATE)
     if not text:
         return jsonify({'error': 'No text provided'}), 400
-
-    async def generate_speech():
-        output_file = f"temp_tts_{ObjectId()}.mp3"
-        communicate = edge_tts.Communicate(text, VOICE)
-        await communicate.save(output_file)
-        return output_file
-
-    try:
-        output_file = asyncio.run(generate_speech())
-        
-        @after_this_request
-        def cleanup(response):
+    if not is_valid_rate(rate):
+        return jsonify({'error': "rate must be a signed percentage such as '+10%' or '-5%'"}), 400
+
+    key = cache_key(text, VOICE, rate)
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+    elif (audio := tts_cache.get(key)) is not None:
+        response = Response(audio, mimetype='audio/mpeg')
+    else:
+        # Pipe edge-tts chunks straight to the client; nothing touches the disk
+        # and playback can start on the first chunk
+        chunks = iterate(synthesize_cached(text, VOICE, rate))
+        try:
+            first_chunk = next(chunks)
+        except Exception as e:
+            current_app.logger.error(f"Error generating TTS: {e}")
+            return jsonify({"error": "Failed to generate speech"}), 500
+
+        def generate():
+            yield first_chunk
             try:
-                os.remove(output_file)
+                yield from chunks
             except Exception as e:
-                current_app.logger.error(f"Error removing temporary file: {e}")
-            return response
-            
-        return send_file(output_file, mimetype='audio/mpeg')
+                current_app.logger.error(f"TTS stream interrupted: {e}")
 
-    except Exception as e:
-        current_app.logger.error(f"Error generating TTS: {e}")
-        return jsonify({"error": "Failed to generate speech"}), 500
+        response = Response(stream_with_context(generate()), mimetype='audio/mpeg')
+        response.headers['Cache-Control'] = TTS_STREAM_CACHE_CONTROL
+        return response
+
+    response.set_etag(key)
+    response.headers['Cache-Control'] = TTS_CACHE_CONTROL
+    return response
 
 @interview_bp.route('/end_interview', methods=['POST'])
 def end_interview():
@@ -203,51 +561,118 @@ def end_interview():
     if not session:
         return jsonify({'error': 'Interview session not found'}), 404
     
+    callback_url = data.get('callback_url')
+    if callback_url and not callback_allowed(callback_url):
+        return jsonify({'error': 'callback_url must be an http(s) URL on a host in REPORT_CALLBACK_HOSTS'}), 400
+
     session.status = 'completed'
     session.end_time = datetime.utcnow()
     db.session.commit()
     
-    # Generate report
-    return generate_report(session.id)
+    # Generate the report in the background
+    return enqueue_report(session.id, callback_url)
+
+# Fields returned by the report list unless fields= asks for others
+REPORT_SUMMARY_FIELDS = ['_id', 'session_id', 'date', 'overall_score', 'role']
+REPORT_FIELDS = REPORT_SUMMARY_FIELDS + ['user_id', 'job_description', 'technical_metrics',
+                                         'communication_metrics', 'personality_metrics', 'qa_details']
 
 @interview_bp.route('/reports', methods=['GET'])
 def get_reports():
+     """List the user's reports, newest first, a page at a time.
+
+     Query args: limit (default 20, max 100), cursor (next_cursor from the
+     previous page) and fields (comma-separated; summary fields by default).
+     """
      # Mock user ID since we removed authentication
      mock_user_id = "mock-user-123"
-     
-     # Get all reports for mock user
-     reports = list(mongo.db.interview_reports.find({"user_id": mock_user_id}))
-     
-     # Convert ObjectId to string for JSON serialization
-     for report in reports:
-         report["_id"] = str(report["_id"])
-     
-     return jsonify({
-         "reports": reports
-     }), 200
+
+     try:
+         limit, cursor, fields = parse_page_args(request.args, REPORT_SUMMARY_FIELDS, REPORT_FIELDS, cursor_size=2)
+         query = {"user_id": mock_user_id}
+         if cursor:
+             # Keyset pagination: everything strictly after the last (date, _id) seen
+             last_date, last_id = datetime.fromisoformat(cursor[0]), ObjectId(cursor[1])
+             query["$or"] = [{"date": {"$lt": last_date}}, {"date": last_date, "_id": {"$lt": last_id}}]
+     except (ValueError, TypeError, IndexError, KeyError, InvalidId) as e:
+         return jsonify({'error': str(e) or 'Invalid cursor'}), 400
+
+     # The sort key is always fetched so the next cursor can be built
+     projection = {field: 1 for field in fields + ['date']}
+     reports = mongo.db.interview_reports.find(query, projection) \
+         .sort([("date", -1), ("_id", -1)]).limit(limit + 1).batch_size(limit + 1)
+
+     page = {'count': 0, 'last': None, 'has_more': False}
+
+     def page_items():
+         for report in reports:
+             if page['count'] == limit:
+                 page['has_more'] = True
+                 break
+             page['count'] += 1
+             page['last'] = (report.get('date'), report['_id'])
+             report["_id"] = str(report["_id"])
+             yield {field: report[field] for field in fields if field in report}
+
+     def page_info():
+         next_cursor = None
+         if page['has_more']:
+             next_cursor = encode_cursor([page['last'][0].isoformat(), str(page['last'][1])])
+         return {'next_cursor': next_cursor, 'has_more': page['has_more']}
+
+     return stream_page('reports', page_items(), page_info)
+
+def find_report(**filters):
+    """Look up a report, including one still waiting in the write-behind queue"""
+    report = get_writer().find_pending('interview_reports', **filters)
+    if report is None:
+        report = mongo.db.interview_reports.find_one(filters)
+    return report
 
 @interview_bp.route('/reports/<report_id>', methods=['GET'])
 def get_report_detail(report_id):
-     try:
-         report = mongo.db.interview_reports.find_one({"_id": ObjectId(report_id)})
-     except:
+     """A single report, served from the report cache after the first read.
+
+     Reports are immutable, so the ETag depends only on the id and a matching
+     conditional request gets a 304 without a cache or database lookup.
+     """
+     if not ObjectId.is_valid(report_id):
          return jsonify({'error': 'Invalid report ID'}), 400
-     
-     if not report:
-         return jsonify({'error': 'Report not found'}), 404
-     
-     # Convert ObjectId to string for JSON serialization
-     report["_id"] = str(report["_id"])
-     
-     return jsonify({
-         "report": report
-     }), 200
+
+     etag = report_etag(report_id)
+     if request.if_none_match.contains(etag):
+         response = Response(status=304)
+     elif (body := report_cache.get(report_id)) is not None:
+         response = Response(body, mimetype='application/json')
+     else:
+         report = find_report(_id=ObjectId(report_id))
+         if not report:
+             return jsonify({'error': 'Report not found'}), 404
+
+         # Convert ObjectId to string for JSON serialization
+         report["_id"] = str(report["_id"])
+         body = current_app.json.dumps({"report": report}).encode('utf-8')
+         report_cache.put(report_id, body)
+         response = Response(body, mimetype='application/json')
+
+     response.set_etag(etag)
+     response.headers['Cache-Control'] = REPORT_CACHE_CONTROL
+     return response
 
 @interview_bp.route('/generate-report/<session_id>', methods=['POST'])
 def request_report_generation(session_id):
-    """Generate or fetch an existing report for a session"""
+    """Fetch a session's report, or start generating it if there is none yet"""
+    data = request.get_json(silent=True) or {}
+    callback_url = data.get('callback_url')
+    if callback_url and not callback_allowed(callback_url):
+        return jsonify({'error': 'callback_url must be an http(s) URL on a host in REPORT_CALLBACK_HOSTS'}), 400
+
     # Check if report already exists
-    existing_report = mongo.db.interview_reports.find_one({"session_id": session_id})
+    try:
+        existing_report = find_report(session_id=session_id)
+    except Exception as e:
+        current_app.logger.warning(f"MongoDB not available, could not look up report: {e}")
+        existing_report = None
     
     if existing_report:
         # Return existing report if already generated
@@ -258,166 +683,77 @@ def request_report_generation(session_id):
             "message": "Existing report retrieved"
         }), 200
     
-    # If no existing report, generate one
-    return generate_report(session_id)
+    # If no existing report, generate one (or return the job already doing so)
+    return enqueue_report(session_id, callback_url)
+
+def enqueue_report(session_id, callback_url=None):
+    """Start (or join) the session's report job and answer 202 with its status"""
+    job = report_jobs.enqueue(session_id, callback_url)
+    done = job['status'] == 'completed'
+    response = jsonify({**job, 'is_complete': True,
+                        'message': 'Existing report retrieved' if done else 'Report generation started'})
+    response.headers['Location'] = url_for('interview.report_job_status', job_id=job['job_id'])
+    return response, 200 if done else 202
+
+@interview_bp.route('/report-jobs/<job_id>', methods=['GET'])
+def report_job_status(job_id):
+    """Status of a report job; report_id is set once it has completed"""
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    return jsonify(job), 200
 
 def generate_report(session_id):
-    """Generate interview report based on Q&A history"""
+    """Generate interview report based on Q&A history.
+
+    Runs in a report job; returns the job result fields and raises LookupError
+    if the session has no answers to assess, or EvaluationError if they could
+    not be scored.
+    """
     session = InterviewSession.query.get(session_id)
     qa_records = []
     
     try:
         # Check if report already exists in MongoDB
-        existing_report = mongo.db.interview_reports.find_one({"session_id": session_id})
+        existing_report = find_report(session_id=session_id)
         if existing_report:
-            existing_report["_id"] = str(existing_report["_id"])
-            return jsonify({
-                "report_id": existing_report["_id"],
-                "overall_score": existing_report.get("overall_score"),
-                "message": "Existing report retrieved"
-            }), 200
-        
-        qa_records = list(mongo.db.interview_qa.find({'session_id': session_id}))
+            return {
+                "report_id": str(existing_report["_id"]),
+                "overall_score": existing_report.get("overall_score")
+            }
+
+        # The session store holds the full transcript while the session is live
+        qa_records = session_store.get_turns(session_id)
+        if not qa_records:
+            qa_records = list(mongo.db.interview_qa.find({'session_id': session_id}).sort('timestamp', 1))
     except Exception as e:
         current_app.logger.warning(f"MongoDB not available for report generation: {e}")
 
-    # Fallback to in-memory store
-    if not qa_records and session_id in in_memory_sessions and in_memory_sessions[session_id].get('qa_records'):
-        qa_records = in_memory_sessions[session_id].get('qa_records')
+    # Fallback to session store
+    if not qa_records:
+        qa_records = session_store.get_turns(session_id)
 
     if not qa_records:
-        return jsonify({"error": "No interview data found to generate a report."}), 404
+        raise LookupError("No interview data found to generate a report.")
         
     # If no existing report, generate one using LLM
-    qa_text = ""
-    qa_details = []
-    
-    # Format Q&A pairs for the LLM prompt and for storage
-    for qa in qa_records:
-        question = qa.get('question', 'Unknown question')
-        answer = qa.get('answer', 'No answer provided')
-        qa_text += f"Question: {question}\nAnswer: {answer}\n\n"
-        
-        qa_details.append({
-            "question": question,
-            "answer": answer,
-            "assessment": ""  # Will be filled by LLM
-        })
+    qa_pairs = [(qa.get('question', 'Unknown question'), qa.get('answer', 'No answer provided'))
+                for qa in qa_records]
     
     # Get user information (mock user since we removed auth)
     role = "Software Developer"  # Default role
     job_description = ""
     
-    # Generate metrics and analysis with LLM
-    report_prompt = f"""
-    You are an expert interview evaluator. You need to analyze the following interview transcript and generate a structured evaluation report.
-    
-    Role being applied for: {role}
-    
-    Job Description: {job_description}
-    
-    Interview transcript:
-    {qa_text}
-    
-    Generate a comprehensive interview assessment with the following components:
-    1. Technical metrics (score each from 0-100):
-       - Technical Knowledge
-       - Problem Solving
-       - Code Quality
-       
-    2. Communication metrics (score each from 0-100):
-       - Clarity of Expression
-       - Articulation
-       - Active Listening
-       
-    3. Personality metrics (score each from 0-100):
-       - Confidence
-       - Adaptability
-       - Cultural Fit
-       
-    4. For each question and answer, provide a brief assessment.
-    
-    Format your response as valid JSON with the following structure:
-    {{
-        "technical_metrics": [
-            {{"name": "Technical Knowledge", "value": 85, "color": "#3b82f6"}},
-            {{"name": "Problem Solving", "value": 78, "color": "#3b82f6"}},
-            {{"name": "Code Quality", "value": 92, "color": "#3b82f6"}}
-        ],
-        "communication_metrics": [
-            {{"name": "Clarity of Expression", "value": 88, "color": "#10b981"}},
-            {{"name": "Articulation", "value": 92, "color": "#10b981"}},
-            {{"name": "Active Listening", "value": 75, "color": "#10b981"}}
-        ],
-        "personality_metrics": [
-            {{"name": "Confidence", "value": 82, "color": "#8b5cf6"}},
-            {{"name": "Adaptability", "value": 90, "color": "#8b5cf6"}},
-            {{"name": "Cultural Fit", "value": 85, "color": "#8b5cf6"}}
-        ],
-        "qa_assessments": [
-            {{"question_idx": 0, "assessment": "Strong understanding and clear communication"}},
-            {{"question_idx": 1, "assessment": "Good technical knowledge but could improve conciseness"}}
-        ]
-    }}
-    """
-    
-    # Initialize variables with default values
-    ai_analysis = None
-    overall_score = None
-    
-    try:
-        # Use LLM to generate the report
-        llm_response = llm.invoke(report_prompt)
-        llm_content = llm_response.content
-        
-        # Extract JSON from the LLM response
-        import re
-        json_match = re.search(r'```json\n(.*?)\n```', llm_content, re.DOTALL)
-        if json_match:
-            llm_content = json_match.group(1)
-        
-        # Parse the LLM response
-        ai_analysis = json.loads(llm_content)
-        
-        # Apply AI assessments to QA details
-        for assessment in ai_analysis.get('qa_assessments', []):
-            idx = assessment.get('question_idx')
-            if idx is not None and idx < len(qa_details):
-                qa_details[idx]["assessment"] = assessment.get('assessment')
-        
-        # Calculate overall score
-        all_metrics = ai_analysis['technical_metrics'] + ai_analysis['communication_metrics'] + ai_analysis['personality_metrics']
-        overall_score = sum(metric["value"] for metric in all_metrics) / len(all_metrics)
-        
-    except Exception as e:
-        print(f"Error generating report with LLM: {str(e)}")
-        # Fallback to default metrics if LLM fails
-        technical_metrics = [
-            {"name": "Technical Knowledge", "value": 85, "color": "#3b82f6"},
-            {"name": "Problem Solving", "value": 78, "color": "#3b82f6"},
-            {"name": "Code Quality", "value": 92, "color": "#3b82f6"}
-        ]
-        
-        communication_metrics = [
-            {"name": "Clarity of Expression", "value": 88, "color": "#10b981"},
-            {"name": "Articulation", "value": 92, "color": "#10b981"},
-            {"name": "Active Listening", "value": 75, "color": "#10b981"}
-        ]
-        
-        personality_metrics = [
-            {"name": "Confidence", "value": 82, "color": "#8b5cf6"},
-            {"name": "Adaptability", "value": 90, "color": "#8b5cf6"},
-            {"name": "Cultural Fit", "value": 85, "color": "#8b5cf6"}
-        ]
-        
-        all_metrics = technical_metrics + communication_metrics + personality_metrics
-        overall_score = sum(metric["value"] for metric in all_metrics) / len(all_metrics)
-        
-        ai_analysis = {
-            "technical_metrics": technical_metrics,
-            "communication_metrics": communication_metrics,
-            "personality_metrics": personality_metrics
-        }
+    # Assess every answer concurrently, then score the metrics from the assessments.
+    # If that fails the job fails and no made-up scores are saved; it can be enqueued again.
+    assessments, ai_analysis, overall_score = evaluate_interview(qa_pairs, role, job_description)
+
+    qa_details = [{
+        "question": question,
+        "answer": answer,
+        "assessment": assessment['assessment'] if assessment else "",
+        "score": assessment['score'] if assessment else None
+    } for (question, answer), assessment in zip(qa_pairs, assessments)]
     
     # Store report in MongoDB
     report_data = {
@@ -433,30 +769,101 @@ def generate_report(session_id):
         "qa_details": qa_details
     }
     
-    try:
-        report_id_obj = mongo.db.interview_reports.insert_one(report_data).inserted_id
-        report_id = str(report_id_obj)
-        
-        # Update session with score
-        session.score = overall_score
-        db.session.commit()
+    # The report id is assigned up front; MongoDB and the session score are written in the background
+    report_id = str(get_writer().insert('interview_reports', report_data))
+    get_writer().set_session_score(session_id, overall_score)
+    if session.template_id:
+        get_writer().update(LEADERBOARD_COLLECTION,
+                            *leaderboard_update(session.template_id, report_id, report_data), upsert=True)
 
-        # Clean up in-memory store
-        if session_id in in_memory_sessions:
-            del in_memory_sessions[session_id]
+    # Clean up session store
+    session_store.delete(session_id)
 
-        return jsonify({
-            "report_id": report_id,
-            "overall_score": overall_score,
-            "message": "Interview completed and report generated"
-        }), 201
+    return {
+        "report_id": report_id,
+        "overall_score": overall_score
+    }
+
+# Reports are generated off the request path, one job per session
+report_jobs = ReportJobQueue(generate_report)
+
+def template_reports(template_id, projection=REPORT_PROJECTION):
+    """Reports of a template's completed sessions, fetched with a single $in query"""
+    session_ids = [session_id for (session_id,) in InterviewSession.query
+                   .filter_by(template_id=template_id, status='completed')
+                   .with_entities(InterviewSession.id)]
+    if not session_ids:
+        return []
+    return list(mongo.db.interview_reports.find({"session_id": {"$in": session_ids}}, projection))
+
+def leaderboard_ready(leaderboard):
+    """Whether a leaderboard document counts every report of its template"""
+    return (leaderboard is not None and leaderboard.get('backfilled')
+            and leaderboard.get('version') == LEADERBOARD_VERSION)
+
+def backfill_leaderboard(template_id):
+    """Fold reports saved before the leaderboard existed into it, leaving out the ones it already counts"""
+    leaderboards = mongo.db[LEADERBOARD_COLLECTION]
+    existing = leaderboards.find_one({'template_id': template_id}, {'version': 1})
+    if existing is not None and existing.get('version') != LEADERBOARD_VERSION:
+        # Built by an older version without per-candidate scores: start over
+        leaderboards.delete_one({'template_id': template_id, 'version': existing.get('version')})
+    counted = leaderboards.distinct('report_ids', {'template_id': template_id})
+    reports = template_reports(template_id, {**REPORT_PROJECTION, 'user_id': 1})
+    backfill = rebuild_requests(template_id, reports, counted)
+    if backfill:
+        try:
+            leaderboards.bulk_write(backfill, ordered=False)
+        except BulkWriteError as e:
+            # A report saved since the read above is already counted; its upsert hit the unique index
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+    leaderboards.update_one({'template_id': template_id},
+                            {'$set': {'backfilled': True}, '$setOnInsert': {'version': LEADERBOARD_VERSION}},
+                            upsert=True)
+
+# Backfills run off the request path, at most one per template on this worker
+_backfill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='leaderboard-backfill')
+_backfilling = set()
+_backfilling_lock = threading.Lock()
+
+def schedule_leaderboard_backfill(template_id):
+    """Start backfilling a template's leaderboard in the background unless that is already under way"""
+    with _backfilling_lock:
+        if template_id in _backfilling:
+            return
+        _backfilling.add(template_id)
+    _backfill_executor.submit(_run_backfill, current_app._get_current_object(), template_id)
+
+def _run_backfill(app, template_id):
+    try:
+        with app.app_context():
+            backfill_leaderboard(template_id)
     except Exception as e:
-        current_app.logger.error(f"Could not save report to MongoDB: {e}")
-        return jsonify({
-            "report_id": None,
-            "overall_score": overall_score,
-            "message": "Interview completed, but the report could not be saved to the database."
-        }), 201
+        print(f"Could not backfill the leaderboard of template {template_id}: {e}")
+    finally:
+        with _backfilling_lock:
+            _backfilling.discard(template_id)
+
+@interview_bp.route('/templates/<template_id>/leaderboard', methods=['GET'])
+def template_leaderboard(template_id):
+    """Score distributions, histograms and top candidates for a template.
+
+    Served from one pre-aggregated document that is updated as reports are
+    saved, so the cost doesn't grow with the number of candidates. Until
+    earlier reports have been folded in by a background backfill, answers 202.
+    """
+    projection = {'_id': 0, 'report_ids': 0, 'candidates': 0}
+    leaderboard = mongo.db[LEADERBOARD_COLLECTION].find_one({'template_id': template_id}, projection)
+    if not leaderboard_ready(leaderboard):
+        if leaderboard is None and not InterviewTemplate.query.get(template_id):
+            return jsonify({'error': 'Template not found'}), 404
+        schedule_leaderboard_backfill(template_id)
+        response = jsonify({'template_id': template_id, 'message': 'Leaderboard is being built'})
+        response.headers['Retry-After'] = '2'
+        return response, 202
+
+    return jsonify(summarize_leaderboard(leaderboard)), 200
 
 @interview_bp.route('/compare-candidates/<template_id>', methods=['GET'])
 def compare_candidates(template_id):
@@ -466,44 +873,32 @@ def compare_candidates(template_id):
     if not template:
         return jsonify({'error': 'Template not found'}), 404
     
-    # Get all reports for this template's sessions
-    sessions = InterviewSession.query.filter_by(template_id=template_id, status='completed').all()
-    session_ids = [session.id for session in sessions]
-    
-    reports = []
-    for session_id in session_ids:
-        report = mongo.db.interview_reports.find_one({"session_id": session_id})
-        if report:
-            report["_id"] = str(report["_id"])
-            reports.append(report)
+    try:
+        group_weights = parse_weights(request.args.get('weights'))
+        top_k = max(1, int(request.args.get('top_k', COMPARISON_SHORTLIST)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Every candidate's scores come with the template's leaderboard document
+    leaderboard = mongo.db[LEADERBOARD_COLLECTION].find_one(
+        {'template_id': template_id}, {'candidates': 1, 'backfilled': 1, 'version': 1})
+    if leaderboard_ready(leaderboard):
+        reports = leaderboard.get('candidates', [])
+    else:
+        # Not built yet: rank from the reports themselves this time
+        schedule_leaderboard_backfill(template_id)
+        reports = [candidate_entry(str(report['_id']), report) for report in template_reports(template_id)]
     
     # If no reports, return early
     if not reports:
         return jsonify({'message': 'No completed interviews found for this template'}), 200
     
-    # Generate comparison using LLM
     job_description = template.job_description if hasattr(template, 'job_description') else ""
     role = template.role
     
-    # Create a summary of each candidate
-    candidate_summaries = []
-    for report in reports:
-        tech_avg = sum(m["value"] for m in report["technical_metrics"]) / len(report["technical_metrics"])
-        comm_avg = sum(m["value"] for m in report["communication_metrics"]) / len(report["communication_metrics"])
-        pers_avg = sum(m["value"] for m in report["personality_metrics"]) / len(report["personality_metrics"])
-        
-        summary = {
-            "report_id": str(report["_id"]),
-            "session_id": report["session_id"],
-            "overall_score": report["overall_score"],
-            "technical_score": round(tech_avg, 1),
-            "communication_score": round(comm_avg, 1),
-            "personality_score": round(pers_avg, 1),
-            "strengths": [],
-            "weaknesses": []
-        }
-        
-        candidate_summaries.append(summary)
+    # Rank everyone numerically; only the shortlist goes to the LLM for the narrative
+    candidate_summaries = rank_candidates(reports, group_weights)
+    shortlist = candidate_summaries[:top_k]
     
     # Generate comparison prompt
     comparison_prompt = f"""
@@ -513,11 +908,12 @@ def compare_candidates(template_id):
     
     Job Description: {job_description}
     
-    Candidate Evaluations:
-    {json.dumps(candidate_summaries, indent=2)}
+    Shortlisted candidates (top {len(shortlist)} of {len(candidate_summaries)}), already ranked on weighted scores.
+    The *_z fields are standard scores relative to all {len(candidate_summaries)} candidates:
+    {json.dumps(shortlist, indent=2)}
     
     Please:
-    1. Rank the candidates from best to worst fit for this role.
+    1. Keep the given ranking.
     2. For each candidate, identify key strengths and weaknesses based on their scores.
     3. Provide a final recommendation on which candidate(s) should be considered for the role.
     
@@ -537,27 +933,18 @@ def compare_candidates(template_id):
     """
     
     try:
-        # Use LLM to generate comparison
-        llm_response = llm.invoke(comparison_prompt)
-        llm_content = llm_response.content
-        
-        # Extract JSON from the response
-        import re
-        json_match = re.search(r'```json\n(.*?)\n```', llm_content, re.DOTALL)
-        if json_match:
-            llm_content = json_match.group(1)
+        # Use LLM to generate comparison; invalid fields are repaired, not regenerated
+        comparison_result = generate_structured(comparison_prompt, COMPARISON_SCHEMA,
+                                                temperature=llm_gateway.DEFAULT_TEMPERATURE)
         
-        # Parse the LLM response
-        comparison_result = json.loads(llm_content)
-        
-        # Add candidate details to results
+        # Add candidate details to results; the computed ranking is authoritative
+        shortlisted = {candidate['report_id']: candidate for candidate in shortlist}
         for ranked_candidate in comparison_result.get('ranked_candidates', []):
-            report_id = ranked_candidate.get('report_id')
-            for report in reports:
-                if str(report.get('_id')) == report_id:
-                    ranked_candidate['overall_score'] = report.get('overall_score')
-                    # Add any other details needed
-                    break
+            candidate = shortlisted.get(ranked_candidate.get('report_id'))
+            if candidate:
+                ranked_candidate['rank'] = candidate['rank']
+                ranked_candidate['overall_score'] = candidate['overall_score']
+        comparison_result['ranked_candidates'].sort(key=lambda c: c.get('rank', len(candidate_summaries) + 1))
         
         return jsonify({
             'template': {
@@ -568,11 +955,13 @@ def compare_candidates(template_id):
             },
             'comparison': comparison_result,
             'candidates': candidate_summaries,
-            'candidate_count': len(reports)
+            'candidate_count': len(reports),
+            'weights': group_weights
         }), 200
         
     except Exception as e:
         print(f"Error generating candidate comparison: {str(e)}")
+        # The numeric ranking is still valid without the narrative
         return jsonify({
             'error': 'Failed to generate comparison',
             'template': {
@@ -580,6 +969,8 @@ def compare_candidates(template_id):
                 'name': template.name,
                 'role': template.role
             },
+            'comparison': None,
             'candidates': candidate_summaries,
-            'candidate_count': len(reports)
-        }), 500
+            'candidate_count': len(reports),
+            'weights': group_weights
+        }), 200
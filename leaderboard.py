@@ -0,0 +1,96 @@
+import math
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from report_engine import METRIC_GROUPS
+
+LEADERBOARD_COLLECTION = 'template_leaderboards'
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '50'))
+HISTOGRAM_BINS = 10  # 0-9, 10-19, ..., 90-100
+# Documents created before per-candidate scores were kept have no version and are rebuilt
+LEADERBOARD_VERSION = 2
+
+def _bin(value):
+    return str(min(HISTOGRAM_BINS - 1, max(0, int(value // (100 / HISTOGRAM_BINS)))))
+
+def _stat_increments(prefix, value):
+    return {f'{prefix}.sum': value, f'{prefix}.sumsq': value * value, f'{prefix}.n': 1,
+            f'{prefix}.histogram.{_bin(value)}': 1}
+
+def candidate_entry(report_id, report):
+    """A report reduced to what candidate ranking needs: ids, overall score and metric values."""
+    entry = {'report_id': report_id, 'session_id': report.get('session_id'),
+             'overall_score': report.get('overall_score')}
+    for group in METRIC_GROUPS:
+        entry[group] = [{'name': metric['name'], 'value': metric['value']}
+                        for metric in report.get(group) or []
+                        if isinstance(metric.get('value'), (int, float))]
+    return entry
+
+def leaderboard_update(template_id, report_id, report):
+    """(filter, update) folding one report into its template's leaderboard document.
+
+    Counts, sums and sums of squares (for mean and standard deviation) and
+    histogram bins are $inc'ed, and the report is $push'ed into the top-N list
+    kept sorted by overall score and into the per-candidate scores used for
+    comparisons, all in one atomic update. The filter skips documents that
+    already include report_id, so replaying it is a no-op.
+    """
+    score = report['overall_score']
+    inc = {'count': 1, **_stat_increments('overall', score)}
+    for group in METRIC_GROUPS:
+        for metric in report.get(group) or []:
+            if isinstance(metric.get('value'), (int, float)):
+                inc.update(_stat_increments(f"metrics.{metric['name']}", metric['value']))
+    entry = {
+        'report_id': report_id,
+        'session_id': report.get('session_id'),
+        'user_id': report.get('user_id'),
+        'overall_score': score,
+        'date': report.get('date'),
+    }
+    update = {
+        '$inc': inc,
+        '$push': {
+            'top': {'$each': [entry], '$sort': {'overall_score': -1}, '$slice': LEADERBOARD_SIZE},
+            'report_ids': report_id,
+            'candidates': candidate_entry(report_id, report),
+        },
+        '$set': {'updated_at': datetime.utcnow()},
+        '$setOnInsert': {'version': LEADERBOARD_VERSION},
+    }
+    return {'template_id': template_id, 'report_ids': {'$ne': report_id}}, update
+
+def rebuild_requests(template_id, reports, counted=()):
+    """Bulk-write requests that fold existing reports into a leaderboard (for backfilling).
+
+    Reports whose ids are in counted (the document's report_ids) are left
+    out: their upsert would not match the filter and would try to insert a
+    second document for the template.
+    """
+    counted = set(counted)
+    return [UpdateOne(*leaderboard_update(template_id, str(report['_id']), report), upsert=True)
+            for report in reports
+            if isinstance(report.get('overall_score'), (int, float)) and str(report['_id']) not in counted]
+
+def _summarize_stats(stats):
+    n = stats.get('n', 0)
+    mean = stats['sum'] / n if n else None
+    variance = max(0.0, stats['sumsq'] / n - mean * mean) if n else None
+    return {
+        'mean': round(mean, 1) if n else None,
+        'std': round(math.sqrt(variance), 1) if n else None,
+        'histogram': [stats.get('histogram', {}).get(str(i), 0) for i in range(HISTOGRAM_BINS)],
+    }
+
+def summarize_leaderboard(document):
+    """API view of a leaderboard document; reads only that document."""
+    return {
+        'template_id': document['template_id'],
+        'candidate_count': document.get('count', 0),
+        'overall': _summarize_stats(document.get('overall', {})),
+        'metrics': {name: _summarize_stats(stats) for name, stats in document.get('metrics', {}).items()},
+        'top': document.get('top', []),
+        'histogram_bin_width': 100 // HISTOGRAM_BINS,
+        'updated_at': document.get('updated_at'),
+    }
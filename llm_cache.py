@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import llm_gateway
+from caching import LRUCache
+from metrics import register_gauge
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_ENTRIES = int(os.getenv('LLM_CACHE_ENTRIES', '2048'))
+# Optional tier shared by all processes, e.g. redis://localhost:6379/2
+LLM_CACHE_URL = os.getenv('LLM_CACHE_URL', '')
+
+class CallSite:
+    """Caching policy of one LLM call site: how long completions live and how many variants to keep."""
+
+    def __init__(self, name, ttl, variants):
+        env = name.upper()
+        self.name = name
+        self.ttl = int(os.getenv(f'LLM_CACHE_{env}_TTL', str(ttl)))
+        self.variants = int(os.getenv(f'LLM_CACHE_{env}_VARIANTS', str(variants)))
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+_sites = {}
+_sites_lock = threading.Lock()
+
+def call_site(name, ttl, variants=3):
+    """Returns the CallSite for name, registering it (and its metrics) on first use."""
+    with _sites_lock:
+        if name not in _sites:
+            site = _sites[name] = CallSite(name, ttl, variants)
+            register_gauge(f'llm_cache_{name}_hits', f'LLM completions for {name} served from cache',
+                           lambda: site.hits)
+            register_gauge(f'llm_cache_{name}_misses', f'LLM completions for {name} generated live',
+                           lambda: site.misses)
+            register_gauge(f'llm_cache_{name}_hit_rate', f'Share of {name} completions served from cache',
+                           site.hit_rate)
+        return _sites[name]
+
+def normalize_param(value):
+    if isinstance(value, (list, tuple, set)):
+        return sorted(normalize_param(item) for item in value)
+    if value is None:
+        return ''
+    return re.sub(r'\s+', ' ', str(value)).strip().lower()
+
+def cache_key(site, template, params):
+    """Key for a completion: the call site, its whitespace-normalized template and normalized parameters.
+
+    Parameters that differ only in case, spacing or list order share a key,
+    and editing the template starts a fresh set of keys.
+    """
+    material = json.dumps({
+        'site': site,
+        'template': re.sub(r'\s+', ' ', template).strip(),
+        'params': {name: normalize_param(value) for name, value in sorted(params.items())},
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+class VariantPool:
+    """Per-key pools of cached completions with an expiry time and a round-robin cursor.
+
+    Pools live in a bounded in-memory LRU; with LLM_CACHE_URL set they are
+    kept in Redis instead so every process shares them. Expired pools stay in
+    memory so they can still be served when the LLM is failing.
+    """
+
+    def __init__(self, url=LLM_CACHE_URL, entries=LLM_CACHE_ENTRIES):
+        self.memory = LRUCache(max_entries=entries)
+        self._lock = threading.Lock()
+        self.shared = None
+        if url:
+            try:
+                import redis
+                self.shared = redis.Redis.from_url(url)
+            except ImportError:
+                print("LLM_CACHE_URL is set but the redis package is not installed; using memory only")
+
+    def fresh(self, key):
+        """Cached variants of key that have not expired."""
+        if self.shared is not None:
+            try:
+                return [raw.decode('utf-8') for raw in self.shared.lrange(f'llm:{key}', 0, -1)]
+            except Exception as e:
+                print(f"Shared LLM cache unavailable: {e}")
+        entry = self.memory.get(key)
+        return list(entry['variants']) if entry and entry['expires'] > time.time() else []
+
+    def stale(self, key):
+        """Cached variants of key, expired or not (memory only)."""
+        entry = self.memory.get(key)
+        return list(entry['variants']) if entry else []
+
+    def add(self, key, text, ttl, limit):
+        with self._lock:
+            entry = self.memory.get(key)
+            if not entry or entry['expires'] <= time.time():
+                entry = {'variants': [], 'expires': time.time() + ttl, 'served': 0}
+            entry['variants'] = (entry['variants'] + [text])[-limit:]
+            self.memory.set(key, entry)
+        if self.shared is not None:
+            try:
+                pipe = self.shared.pipeline()
+                pipe.rpush(f'llm:{key}', text)
+                pipe.ltrim(f'llm:{key}', -limit, -1)
+                # Variants are only added until the pool is full, so this moves the expiry by little
+                pipe.expire(f'llm:{key}', ttl)
+                pipe.expire(f'llm:{key}:served', ttl)
+                pipe.execute()
+            except Exception as e:
+                print(f"Could not write shared LLM cache entry: {e}")
+
+    def next_index(self, key, size):
+        """Round-robin position in a pool of size variants."""
+        if self.shared is not None:
+            try:
+                return (self.shared.incr(f'llm:{key}:served') - 1) % size
+            except Exception as e:
+                print(f"Shared LLM cache unavailable: {e}")
+        with self._lock:
+            entry = self.memory.get(key)
+            if not entry:
+                return 0
+            entry['served'] += 1
+            return (entry['served'] - 1) % size
+
+_pool = VariantPool()
+
+def cached_invoke(site, template, params, temperature=llm_gateway.DEFAULT_TEMPERATURE, timeout=None):
+    """template.format(**params) run through the LLM, served from the response cache when possible.
+
+    site is a CallSite from call_site(); list parameters are rendered
+    comma-separated. Until a key has site.variants completions each call
+    generates a new one, so repeated sessions don't all get the same text;
+    after that the pool is served round-robin until it expires. If the LLM
+    call fails, any cached variant (even an expired one) is served before the
+    error is raised.
+    """
+    prompt = template.format(**{name: ", ".join(map(str, value)) if isinstance(value, (list, tuple)) else value
+                                for name, value in params.items()})
+    if not LLM_CACHE_ENABLED:
+        return llm_gateway.invoke(prompt, temperature=temperature, timeout=timeout).strip()
+
+    key = cache_key(site.name, template, params)
+    variants = _pool.fresh(key)
+    if len(variants) >= site.variants:
+        site.hits += 1
+        return variants[_pool.next_index(key, len(variants))]
+
+    site.misses += 1
+    try:
+        text = llm_gateway.invoke(prompt, temperature=temperature, timeout=timeout).strip()
+    except Exception:
+        stale = variants or _pool.stale(key)
+        if not stale:
+            raise
+        site.stale += 1
+        return stale[_pool.next_index(key, len(stale))]
+    _pool.add(key, text, site.ttl, site.variants)
+    return text
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+import groq
+import httpx
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+from async_runtime import aiterate, iterate, run, run_async
+
+load_dotenv()
+
+GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama3-70b-8192')
+DEFAULT_TEMPERATURE = 0.7
+
+# Per-process limits. Rate limits default to the Groq quotas for llama3-70b-8192.
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', '8'))
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv('GROQ_REQUESTS_PER_MINUTE', '30'))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv('GROQ_TOKENS_PER_MINUTE', '6000'))
+GROQ_REQUEST_TIMEOUT = float(os.getenv('GROQ_REQUEST_TIMEOUT', '60'))
+
+# Rough completion size used to charge the token bucket up front
+EXPECTED_COMPLETION_TOKENS = 256
+
+class TokenBucket:
+    """Async token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+# Everything below is only touched from the shared runtime loop
+_request_bucket = TokenBucket(GROQ_REQUESTS_PER_MINUTE)
+_token_bucket = TokenBucket(GROQ_TOKENS_PER_MINUTE)
+_semaphore = None
+_http_client = None
+_clients = {}
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    return _semaphore
+
+def _get_client(temperature):
+    """Returns a ChatGroq for the given temperature, all sharing one pooled HTTP client."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=GROQ_REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=GROQ_MAX_CONCURRENCY,
+                                max_keepalive_connections=GROQ_MAX_CONCURRENCY),
+        )
+    if temperature not in _clients:
+        async_client = groq.AsyncGroq(
+            api_key=os.getenv('GROQ_API_KEY'),
+            max_retries=2,
+            http_client=_http_client,
+        ).chat.completions
+        _clients[temperature] = ChatGroq(model=GROQ_MODEL, temperature=temperature,
+                                         max_retries=2, async_client=async_client)
+    return _clients[temperature]
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+async def _acquire(prompt):
+    await _request_bucket.acquire(1)
+    await _token_bucket.acquire(estimate_tokens(prompt) + EXPECTED_COMPLETION_TOKENS)
+
+async def _ainvoke(prompt, temperature):
+    await _acquire(prompt)
+    async with _get_semaphore():
+        response = await _get_client(temperature).ainvoke(prompt)
+    return response.content
+
+async def ainvoke(prompt, temperature=DEFAULT_TEMPERATURE):
+    """Returns the completion text for prompt. Safe to await from any event loop."""
+    return await run_async(_ainvoke(prompt, temperature))
+
+def invoke(prompt, temperature=DEFAULT_TEMPERATURE, timeout=None):
+    """Blocking variant of ainvoke for sync request handlers."""
+    return run(_ainvoke(prompt, temperature), timeout=timeout)
+
+async def _astream(prompt, temperature):
+    await _acquire(prompt)
+    async with _get_semaphore():
+        async for chunk in _get_client(temperature).astream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+async def astream(prompt, temperature=DEFAULT_TEMPERATURE):
+    """Async iterator over completion text pieces. Safe to iterate from any event loop."""
+    async for token in aiterate(_astream(prompt, temperature)):
+        yield token
+
+def stream(prompt, temperature=DEFAULT_TEMPERATURE, timeout=GROQ_REQUEST_TIMEOUT):
+    """Yields completion text pieces as the model produces them (blocking iterator)."""
+    return iterate(_astream(prompt, temperature), timeout=timeout)
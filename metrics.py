@@ -0,0 +1,25 @@
+import threading
+
+_gauges = {}  # name -> (help, callback)
+_lock = threading.Lock()
+
+def register_gauge(name, help, callback):
+    """Export callback() as a gauge; it is evaluated each time metrics are rendered."""
+    with _lock:
+        _gauges[name] = (help, callback)
+
+def render():
+    """All registered gauges in the Prometheus text exposition format."""
+    with _lock:
+        gauges = sorted(_gauges.items())
+    lines = []
+    for name, (help, callback) in gauges:
+        try:
+            value = float(callback())
+        except Exception as e:
+            print(f"Could not read metric {name}: {e}")
+            continue
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+import base64
+import json
+from flask import Response, current_app, stream_with_context
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+_END = object()
+
+def encode_cursor(values):
+    """Opaque page token for the sort key of the last item on a page."""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, size):
+    """Inverse of encode_cursor for a sort key of size strings; raises ValueError for any other token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def parse_page_args(args, default_fields, allowed_fields, cursor_size):
+    """(limit, cursor values or None, fields) from query args; raises ValueError on bad input.
+
+    cursor_size is the number of values in the sort key the cursor encodes.
+    fields= is a comma-separated subset of allowed_fields; without it only
+    default_fields are returned.
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    limit = max(1, min(MAX_PAGE_SIZE, limit))
+
+    cursor = args.get('cursor')
+    cursor = decode_cursor(cursor, cursor_size) if cursor else None
+
+    fields = list(default_fields)
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return limit, cursor, fields
+
+def stream_page(key, items, page_info):
+    """Stream {key: [...items], **page_info()} as JSON, one item at a time.
+
+    items may be a lazy iterable (e.g. a database cursor); page_info is called
+    after it is exhausted, so it can report what was seen (next cursor, ...).
+    The first item is read before the response starts, so a query that fails
+    outright (the first batch of a cursor) still raises here and gets an
+    error status instead of a truncated 200.
+    """
+    items = iter(items)
+    first = next(items, _END)
+
+    def generate():
+        if first is _END:
+            yield f'{{"{key}":['
+        else:
+            yield f'{{"{key}":[' + current_app.json.dumps(first)
+            for item in items:
+                yield ',' + current_app.json.dumps(item)
+        info = page_info()
+        yield '],' + current_app.json.dumps(info)[1:] if info else ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
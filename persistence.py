@@ -0,0 +1,310 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from circuit_breaker import CircuitOpenError
+from db_config import db, mongo
+from metrics import register_gauge
+from models import InterviewSession
+
+PERSIST_QUEUE_SIZE = int(os.getenv('PERSIST_QUEUE_SIZE', '10000'))
+# How long a caller waits for room in a full queue before its write is spilled
+PERSIST_PUT_TIMEOUT = float(os.getenv('PERSIST_PUT_TIMEOUT', '5'))
+PERSIST_BATCH_SIZE = int(os.getenv('PERSIST_BATCH_SIZE', '200'))
+# How long the writer waits for more work to join a batch
+PERSIST_BATCH_WINDOW = int(os.getenv('PERSIST_BATCH_WINDOW_MS', '50')) / 1000
+# Failed attempts before a batch is given up on; waiting out an open circuit doesn't count
+PERSIST_MAX_ATTEMPTS = int(os.getenv('PERSIST_MAX_ATTEMPTS', '6'))
+PERSIST_MAX_BACKOFF = 30.0
+PERSIST_SHUTDOWN_TIMEOUT = float(os.getenv('PERSIST_SHUTDOWN_TIMEOUT', '10'))
+# Writes that could not be applied are appended here (JSON lines) and replayed on the next start
+PERSIST_SPILL_PATH = os.getenv('PERSIST_SPILL_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'write_behind_spill.jsonl'))
+
+DUPLICATE_KEY = 11000
+
+class WriteBehindQueue:
+    """Background writer for MongoDB documents and session scores.
+
+    Request handlers enqueue and return; one thread drains the queue in
+    batches. Inserts are grouped per collection into insert_many calls,
+    $set updates to the same document and score updates to the same session
+    are coalesced, and a failed batch is retried with exponential backoff.
+    While the MongoDB circuit is open the batch is kept and retried for as
+    long as the outage lasts. Documents get their _id at enqueue time, so
+    retrying a partially applied insert_many is safe and callers can hand the
+    id out immediately. Queued work is flushed at interpreter exit; writes
+    that still fail are spilled to PERSIST_SPILL_PATH instead of being lost.
+    """
+
+    def __init__(self, queue_size=PERSIST_QUEUE_SIZE, batch_size=PERSIST_BATCH_SIZE,
+                 batch_window=PERSIST_BATCH_WINDOW):
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}  # (collection, _id) -> document, until written
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._spill_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+        self.replay_spilled()
+        return self
+
+    def insert(self, collection, document):
+        """Queue an insert and return the document's _id."""
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            self._pending[(collection, document['_id'])] = document
+        self._put(('insert', collection, document))
+        return document['_id']
+
+    def set_fields(self, collection, filter, fields):
+        """Queue an update_one(filter, {'$set': fields})."""
+        self._put(('set', collection, filter, fields))
+
+    def update(self, collection, filter, update, upsert=False):
+        """Queue an arbitrary update_one. Not coalesced; it must be safe to retry.
+
+        With upsert, a duplicate-key error (the filter no longer matches
+        because the document exists) is retried once without upsert.
+        """
+        self._put(('update', collection, filter, update, upsert))
+
+    def set_session_score(self, session_id, score):
+        """Queue an update of InterviewSession.score in the SQL database."""
+        from flask import current_app
+        self._put(('score', current_app._get_current_object(), session_id, score))
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def find_pending(self, collection, **filters):
+        """Return a queued, not yet written document matching filters, or None."""
+        with self._lock:
+            for (name, _), document in self._pending.items():
+                if name == collection and all(document.get(k) == v for k, v in filters.items()):
+                    return dict(document)
+        return None
+
+    def _put(self, op):
+        try:
+            # Backpressure: block the caller for a while rather than write
+            # inline, which could apply this op ahead of the queued ones
+            self._queue.put(op, timeout=PERSIST_PUT_TIMEOUT)
+        except queue.Full:
+            if op[0] == 'flush':
+                op[1].set()
+                return
+            self._spill([op], 'write-behind queue is full')
+
+    def _next_batch(self):
+        op = self._queue.get()
+        if op is None:
+            return None
+        batch = [op]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            try:
+                op = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if op is None:
+                # Put the stop marker back so the loop ends after this batch
+                self._queue.put(None)
+                break
+            batch.append(op)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write_with_retry([op for op in batch if op[0] != 'flush'])
+            for op in batch:
+                if op[0] == 'flush':
+                    op[1].set()
+
+    def _write_with_retry(self, batch):
+        if not batch:
+            return
+        attempts = 0
+        delay = 0.5
+        while True:
+            try:
+                self._write_batch(batch, raise_errors=True)
+                return
+            except CircuitOpenError as e:
+                # MongoDB is known to be down: keep the batch until the probe closes the circuit
+                error = e
+            except Exception as e:
+                error = e
+                attempts += 1
+                if attempts >= PERSIST_MAX_ATTEMPTS:
+                    self._spill(batch, error)
+                    return
+            if self._stopping.is_set():
+                self._spill(batch, error)
+                return
+            print(f"Queued write failed ({error}); retrying in {delay}s")
+            self._stopping.wait(delay)
+            delay = min(PERSIST_MAX_BACKOFF, delay * 2)
+
+    def _write_batch(self, batch, raise_errors=False):
+        inserts = {}  # collection -> [document, ...]
+        sets = {}  # (collection, filter) -> fields
+        scores = {}  # session_id -> (app, score)
+        updates = []
+        for op in batch:
+            if op[0] == 'insert':
+                inserts.setdefault(op[1], []).append(op[2])
+            elif op[0] == 'set':
+                key = (op[1], tuple(sorted(op[2].items())))
+                sets.setdefault(key, {}).update(op[3])
+            elif op[0] == 'score':
+                scores[op[2]] = (op[1], op[3])
+            elif op[0] == 'update':
+                updates.append(op[1:])
+
+        try:
+            # Inserts go first: an update may target a document inserted in the same batch
+            for collection, documents in inserts.items():
+                try:
+                    mongo.db[collection].insert_many(documents, ordered=False)
+                except BulkWriteError as e:
+                    # Documents left over from an earlier, partially applied attempt
+                    if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+                        raise
+                self._forget([('insert', collection, document) for document in documents])
+            for (collection, filter), fields in sets.items():
+                mongo.db[collection].update_one(dict(filter), {'$set': fields})
+            for collection, filter, update, upsert in updates:
+                try:
+                    mongo.db[collection].update_one(filter, update, upsert=upsert)
+                except DuplicateKeyError:
+                    # The document now exists: another writer created it, or
+                    # this update was already applied and the filter skips it
+                    mongo.db[collection].update_one(filter, update)
+            for session_id, (app, score) in scores.items():
+                with app.app_context():
+                    InterviewSession.query.filter_by(id=session_id).update({'score': score})
+                    db.session.commit()
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Could not write queued data: {e}")
+
+    def _spill(self, batch, error):
+        """Append writes that could not be applied to PERSIST_SPILL_PATH."""
+        lines = []
+        for op in batch:
+            if op[0] == 'score':
+                # The app object is not serializable; replay takes it from the current app
+                lines.append(json_util.dumps({'op': 'score', 'args': [op[2], op[3]]}))
+            else:
+                lines.append(json_util.dumps({'op': op[0], 'args': list(op[1:])}))
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(PERSIST_SPILL_PATH)), exist_ok=True)
+            with self._spill_lock, open(PERSIST_SPILL_PATH, 'a') as f:
+                f.write(''.join(line + '\n' for line in lines))
+            print(f"Spilled {len(batch)} queued writes to {PERSIST_SPILL_PATH} ({error})")
+        except OSError as e:
+            print(f"Dropping {len(batch)} queued writes ({error}); could not spill them: {e}")
+        self._forget(batch)
+
+    def replay_spilled(self):
+        """Queue the writes spilled by an earlier run again; returns how many were queued.
+
+        Score updates need a Flask app, so without an app context they stay
+        in the spill file for a later replay.
+        """
+        from flask import current_app, has_app_context
+
+        with self._spill_lock:
+            try:
+                with open(PERSIST_SPILL_PATH) as f:
+                    entries = [json_util.loads(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                return 0
+            except (OSError, ValueError) as e:
+                print(f"Could not read spilled writes from {PERSIST_SPILL_PATH}: {e}")
+                return 0
+            kept = [entry for entry in entries if entry['op'] == 'score' and not has_app_context()]
+            if kept:
+                with open(PERSIST_SPILL_PATH, 'w') as f:
+                    f.write(''.join(json_util.dumps(entry) + '\n' for entry in kept))
+            else:
+                os.remove(PERSIST_SPILL_PATH)
+
+        queued = 0
+        for entry in entries:
+            args = entry['args']
+            if entry['op'] == 'insert':
+                self.insert(*args)
+            elif entry['op'] == 'score':
+                if not has_app_context():
+                    continue
+                self._put(('score', current_app._get_current_object(), *args))
+            else:
+                self._put((entry['op'], *args))
+            queued += 1
+        if queued:
+            print(f"Replaying {queued} spilled writes from {PERSIST_SPILL_PATH}")
+        return queued
+
+    def _forget(self, batch):
+        with self._lock:
+            for op in batch:
+                if op[0] == 'insert':
+                    self._pending.pop((op[1], op[2]['_id']), None)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written (or given up on)."""
+        done = threading.Event()
+        self._put(('flush', done))
+        return done.wait(timeout)
+
+    def shutdown(self):
+        if self._thread is None or self._stopping.is_set():
+            return
+        # Stop backing off first: what is left gets one more attempt and is spilled if that fails
+        self._stopping.set()
+        self._queue.put(None)
+        self._thread.join(timeout=PERSIST_SHUTDOWN_TIMEOUT)
+        if self._thread.is_alive():
+            leftover = []
+            while True:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is not None and op[0] != 'flush':
+                    leftover.append(op)
+            print(f"Write-behind queue did not drain within {PERSIST_SHUTDOWN_TIMEOUT}s")
+            if leftover:
+                self._spill(leftover, 'shutdown timeout')
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Returns the process-wide write-behind queue, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindQueue().start()
+    return _writer
+
+register_gauge('persist_queue_depth', 'Writes waiting in the write-behind queue',
+               lambda: _writer.depth if _writer else 0)
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+from caching import LRUCache
+
+# llm: every question generated (the default without a template)
+# bank: bank questions asked verbatim; the LLM only runs when none fits
+# hybrid: like bank, but curated questions are rephrased by the LLM to follow on from the answer
+QUESTION_MODES = ('llm', 'bank', 'hybrid')
+QUESTION_BANK_MODE = os.getenv('QUESTION_BANK_MODE', 'hybrid')
+# Minimum similarity between a curated question and the conversation for it to fit
+QUESTION_BANK_MIN_SCORE = float(os.getenv('QUESTION_BANK_MIN_SCORE', '0.05'))
+# Trade-off between relevance to the conversation and novelty against asked questions
+QUESTION_BANK_RELEVANCE = float(os.getenv('QUESTION_BANK_RELEVANCE', '0.7'))
+# Optional JSON file of extra curated questions: [{"text", "focus": [...], "difficulty"}]
+QUESTION_BANK_PATH = os.getenv('QUESTION_BANK_PATH', '')
+
+DIFFICULTIES = ('easy', 'medium', 'hard', 'expert')
+
+# (focus area, difficulty or None for any, question); focus areas match the interview setup options
+CURATED_QUESTIONS = [
+    ('JavaScript', None, "How does the JavaScript event loop schedule callbacks, promises and timers?"),
+    ('JavaScript', 'easy', "What is the difference between let, const and var in JavaScript?"),
+    ('JavaScript', 'hard', "How would you track down a memory leak in a long-running JavaScript application?"),
+    ('Python', None, "How do Python generators work, and when would you use one instead of a list?"),
+    ('Python', 'easy', "What is the difference between a list and a tuple in Python?"),
+    ('Python', 'hard', "How does the GIL affect multithreaded Python code, and how do you work around it?"),
+    ('React', None, "How does React decide when to re-render a component, and how do you avoid unnecessary renders?"),
+    ('React', None, "When would you reach for a state management library instead of React context and hooks?"),
+    ('Node.js', None, "How does Node.js handle many concurrent connections on a single thread?"),
+    ('Node.js', 'hard', "How would you diagnose a Node.js service whose latency spikes under load?"),
+    ('System Design', None, "How would you design a URL shortener that handles millions of requests a day?"),
+    ('System Design', None, "How do you decide between a relational database and a document store for a new service?"),
+    ('System Design', 'hard', "How would you design a rate limiter shared by many instances of an API?"),
+    ('Data Structures', None, "When would you choose a hash map over a balanced binary search tree?"),
+    ('Data Structures', 'easy', "What is the difference between a stack and a queue, and where would you use each?"),
+    ('Data Structures', 'hard', "How would you implement an LRU cache with O(1) lookups and evictions?"),
+    ('Algorithms', None, "Walk me through how you would find the shortest path between two nodes in a graph."),
+    ('Algorithms', None, "How do you recognize that a problem can be solved with dynamic programming?"),
+    ('Database Design', None, "How do you decide which indexes a table needs, and what do they cost?"),
+    ('Database Design', None, "When would you denormalize a schema, and how do you keep the data consistent?"),
+    ('API Design', None, "How do you version a public API without breaking existing clients?"),
+    ('API Design', None, "How would you design pagination for an API over a large, frequently updated collection?"),
+    ('Frontend Development', None, "How do you find and fix a slow page load in a web application?"),
+    ('Frontend Development', None, "How do you make a web application accessible to keyboard and screen reader users?"),
+    ('Backend Development', None, "How do you make a background job safe to retry?"),
+    ('Backend Development', None, "How would you handle a slow or failing downstream service your API depends on?"),
+    ('DevOps', None, "Walk me through a deployment pipeline you would set up for a web service."),
+    ('DevOps', None, "How do you decide what to monitor and alert on for a production service?"),
+    ('Machine Learning', None, "How do you detect and handle overfitting in a model?"),
+    ('Machine Learning', None, "How would you take a trained model to production and monitor it there?"),
+    ('Leadership', None, "Tell me about a time you had to align a team behind a technical decision they disagreed with."),
+    ('Leadership', None, "How do you help a struggling team member improve?"),
+    ('behavioral', None, "Tell me about a project that failed. What did you learn from it?"),
+    ('behavioral', None, "Describe a time you had to deliver under a tight deadline. How did you prioritize?"),
+    ('behavioral', None, "Tell me about a disagreement with a colleague and how you resolved it."),
+    ('behavioral', None, "What accomplishment are you most proud of, and why?"),
+]
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_STOPWORDS = frozenset("""a an and are as at be but by can could did do does for from had has have
+how i if in into is it its me my of on or our so that the their them then there these they this to
+was we were what when where which who why will with would you your about just like really very
+tell describe walk through time""".split())
+
+def tokenize(text):
+    return [word for word in _WORD.findall((text or '').lower()) if word not in _STOPWORDS]
+
+def parse_template_questions(raw):
+    """Bank entries from an InterviewTemplate.questions JSON string.
+
+    Accepts a list of strings or of objects with text (or question), and
+    optional focus/focus_areas and difficulty. Malformed JSON yields [].
+    """
+    try:
+        items = json.loads(raw) if raw else []
+    except (TypeError, ValueError):
+        print("Ignoring template questions that are not valid JSON")
+        return []
+    entries = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, str):
+            item = {'text': item}
+        if not isinstance(item, dict):
+            continue
+        text = (item.get('text') or item.get('question') or '').strip()
+        if not text:
+            continue
+        focus = item.get('focus_areas', item.get('focus', []))
+        entries.append({
+            'text': text,
+            'focus': [focus] if isinstance(focus, str) else list(focus or []),
+            'difficulty': (item.get('difficulty') or '').lower() or None,
+            'source': 'template',
+        })
+    return entries
+
+def curated_entries():
+    entries = [{'text': text, 'focus': [focus], 'difficulty': difficulty, 'source': 'curated'}
+               for focus, difficulty, text in CURATED_QUESTIONS]
+    if QUESTION_BANK_PATH:
+        try:
+            with open(QUESTION_BANK_PATH) as f:
+                extra = json.load(f)
+            entries += [{**entry, 'source': 'curated'} for entry in parse_template_questions(json.dumps(extra))]
+        except (OSError, ValueError) as e:
+            print(f"Could not load question bank file {QUESTION_BANK_PATH}: {e}")
+    return entries
+
+class QuestionIndex:
+    """TF-IDF index over bank questions, with filters by focus area and difficulty.
+
+    Question vectors are L2-normalized rows of one NumPy matrix, so scoring
+    every question against the conversation is a single matrix-vector
+    product.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        documents = [tokenize(entry['text'] + ' ' + ' '.join(entry['focus'])) for entry in entries]
+        vocabulary = sorted({word for document in documents for word in document})
+        self.vocabulary = {word: i for i, word in enumerate(vocabulary)}
+
+        counts = np.zeros((len(entries), len(vocabulary)))
+        for row, document in enumerate(documents):
+            for word in document:
+                counts[row, self.vocabulary[word]] += 1
+        document_frequency = (counts > 0).sum(axis=0)
+        self.idf = np.log((1 + len(entries)) / (1 + document_frequency)) + 1.0
+        self.matrix = self._normalize(counts * self.idf)
+        self.texts = [entry['text'].strip().lower() for entry in entries]
+        self.focus = [{area.lower() for area in entry['focus']} for entry in entries]
+        self.difficulty = [entry['difficulty'] for entry in entries]
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
+
+    def vector(self, text):
+        counts = np.zeros(len(self.vocabulary))
+        for word in tokenize(text):
+            column = self.vocabulary.get(word)
+            if column is not None:
+                counts[column] += 1
+        return self._normalize(counts * self.idf)
+
+    def allowed(self, focus_areas=(), difficulty=None, asked=()):
+        """Boolean mask of questions matching the filters and not asked yet.
+
+        A question without focus tags matches any focus, and one without a
+        difficulty matches any difficulty. Asked questions are excluded.
+        """
+        focus_areas = {area.lower() for area in focus_areas}
+        asked = {question.strip().lower() for question in asked}
+        return np.array([
+            (not focus_areas or not focus or bool(focus & focus_areas)) and
+            (not difficulty or not question_difficulty or question_difficulty == difficulty) and
+            text not in asked
+            for focus, question_difficulty, text in zip(self.focus, self.difficulty, self.texts)
+        ], dtype=bool)
+
+    def select(self, conversation, asked=(), focus_areas=(), difficulty=None, relevance=QUESTION_BANK_RELEVANCE):
+        """(entry, similarity) of the best next question, or (None, 0.0) if none is left.
+
+        Questions are ranked by maximal marginal relevance: similarity to the
+        conversation so far, minus similarity to the closest question already
+        asked, so follow-ups stay on topic without repeating themselves.
+        """
+        if not self.entries:
+            return None, 0.0
+        mask = self.allowed(focus_areas, difficulty, asked)
+        if not mask.any():
+            return None, 0.0
+        similarity = self.matrix @ self.vector(conversation)
+        redundancy = np.zeros(len(self.entries))
+        if asked:
+            asked_matrix = np.stack([self.vector(question) for question in asked])
+            redundancy = (self.matrix @ asked_matrix.T).max(axis=1)
+        score = relevance * similarity - (1 - relevance) * redundancy
+        best = int(np.argmax(np.where(mask, score, -np.inf)))
+        return self.entries[best], float(similarity[best])
+
+_curated = None
+_curated_lock = threading.Lock()
+_template_indexes = LRUCache(max_entries=256)
+
+def curated_index():
+    global _curated
+    if _curated is None:
+        with _curated_lock:
+            if _curated is None:
+                _curated = QuestionIndex(curated_entries())
+    return _curated
+
+def template_index(template_id, raw_questions):
+    """Index of a template's questions; rebuilt only when the questions change."""
+    key = (template_id, hashlib.sha1((raw_questions or '').encode('utf-8')).hexdigest())
+    index = _template_indexes.get(key)
+    if index is None:
+        index = QuestionIndex(parse_template_questions(raw_questions))
+        _template_indexes.set(key, index)
+    return index
+
+def next_bank_question(conversation, asked, focus_areas=(), difficulty=None, template_id=None, template_questions=None):
+    """(entry, similarity) for the next question from the bank, or (None, 0.0) if none fits.
+
+    The template's own questions come first and are all used before the
+    curated corpus; a curated question must be at least
+    QUESTION_BANK_MIN_SCORE similar to the conversation.
+    """
+    difficulty = difficulty if difficulty in DIFFICULTIES else None
+    if template_id and template_questions:
+        # Templates are written for one role and drive; their questions fit regardless of focus tags
+        entry, similarity = template_index(template_id, template_questions).select(conversation, asked)
+        if entry is not None:
+            return entry, similarity
+    entry, similarity = curated_index().select(conversation, asked, focus_areas, difficulty)
+    if entry is None or similarity < QUESTION_BANK_MIN_SCORE:
+        return None, 0.0
+    return entry, similarity
+
+def rephrase_prompt(question, conversation_history, role, resume_digest=''):
+    return f"""You are an AI Interviewer in a mock interview for the role of {role}.
+Resume Summary: {resume_digest}
+
+Conversation so far:
+{conversation_history}
+
+Ask this next question, reworded so it follows naturally from the candidate's last answer. Keep its meaning and keep it concise. Reply with only the question.
+Question: {question}
+"""
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import re
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from async_runtime import submit
+from llm_gateway import estimate_tokens
+from metrics import register_gauge
+from structured_output import agenerate
+
+# Opt-in: speculation is an extra LLM call per question, on top of the one that answers it
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'false').lower() == 'true'
+PREFETCH_CANDIDATES = int(os.getenv('PREFETCH_CANDIDATES', '4'))
+# Prompt and completion tokens one session may spend on speculation in total
+PREFETCH_SESSION_TOKENS = int(os.getenv('PREFETCH_SESSION_TOKENS', '6000'))
+# How long an answer waits for a speculation that is still running
+PREFETCH_WAIT_SECONDS = float(os.getenv('PREFETCH_WAIT_SECONDS', '1.5'))
+# Best candidate score needed to serve a speculated question instead of generating one
+PREFETCH_MIN_SCORE = float(os.getenv('PREFETCH_MIN_SCORE', '0.3'))
+# Score of a question that changes topic. It can't tell whether the answer was a
+# non-answer the interviewer should react to, so by default it stays below
+# PREFETCH_MIN_SCORE and topic changes are neither requested nor served
+TOPIC_SWITCH_SCORE = float(os.getenv('PREFETCH_TOPIC_SWITCH_SCORE', '0.2'))
+PREFETCH_TEMPERATURE = 0.7
+COMPLETION_TOKENS_PER_CANDIDATE = 60
+
+PREFETCH_SCHEMA = {
+    'type': 'object',
+    'required': ['candidates'],
+    'properties': {
+        'candidates': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'required': ['branch', 'question', 'keywords'],
+                'properties': {
+                    'branch': {'type': 'string'},
+                    'question': {'type': 'string'},
+                    'keywords': {'type': 'array', 'items': {'type': 'string'}},
+                },
+            },
+        },
+    },
+}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_STOPWORDS = frozenset("""a an and are as at be but by can could did do does for from had has have
+how i if in into is it its me my of on or our so that the their them then there these they this to
+was we were what when where which who why will with would you your about just like really very""".split())
+
+def keywords(text):
+    return {word.rstrip('.') for word in _WORD.findall((text or '').lower())} - _STOPWORDS
+
+def topic_branches(settings):
+    """Topics the next question could move to: each focus area, plus behavioral and coding if enabled."""
+    branches = [f"focus:{area}" for area in settings.get('focusAreas') or []]
+    if settings.get('includeBehavioral'):
+        branches.append('behavioral')
+    if settings.get('includeCodeChallenge'):
+        branches.append('code_challenge')
+    return branches
+
+def prefetch_prompt(settings, conversation_history, question, resume_digest='', count=PREFETCH_CANDIDATES):
+    if TOPIC_SWITCH_SCORE >= PREFETCH_MIN_SCORE:
+        branches = topic_branches(settings)
+        kinds = f"""- "follow_up" questions that dig into what a strong answer to the current question would likely mention,
+- and questions that move to one of these topics: {", ".join(branches) or "any relevant topic"}.
+For each, list the keywords an answer would have to mention for a follow_up to make sense (empty for topic changes)."""
+    else:
+        kinds = """"follow_up" questions that dig into what a strong answer to the current question would likely mention.
+For each, list the keywords an answer would have to mention for it to make sense."""
+    return f"""You are an AI Interviewer in a mock interview.
+Role: {settings.get('role')}
+Difficulty: {settings.get('difficulty')}
+Focus Areas: {", ".join(settings.get('focusAreas', []))}
+Resume Summary: {resume_digest}
+
+Conversation so far:
+{conversation_history}
+
+The candidate is now answering: {question}
+
+Their answer is not known yet. Write {count} different candidate next questions:
+{kinds}
+Keep each question concise.
+
+Reply with only JSON: {{"candidates": [{{"branch": "follow_up", "question": "...", "keywords": ["...", "..."]}}]}}
+"""
+
+def rerank(candidates, answer, asked=()):
+    """(best candidate, score) for an answer, or (None, 0.0).
+
+    A follow-up scores by how many of its keywords the answer actually
+    mentions; a topic change scores a flat TOPIC_SWITCH_SCORE, which is below
+    PREFETCH_MIN_SCORE unless configured otherwise. Candidates that repeat an
+    already asked question are dropped.
+    """
+    answer_words = keywords(answer)
+    asked = {question.strip().lower() for question in asked}
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        if candidate['question'].strip().lower() in asked:
+            continue
+        expected = set().union(*(keywords(word) for word in candidate['keywords'])) if candidate['keywords'] else set()
+        if candidate['branch'] == 'follow_up':
+            score = len(expected & answer_words) / len(expected) if expected else 0.0
+        else:
+            score = TOPIC_SWITCH_SCORE
+        if score > best_score:
+            best, best_score = candidate, score
+    return best, best_score
+
+class QuestionPrefetcher:
+    """Speculatively generates candidate next questions while the candidate answers.
+
+    schedule() starts one LLM call for a batch of candidates as soon as a
+    question is delivered; the result is kept in the session store, so any
+    worker can serve it. take() reranks the candidates against the real
+    answer and returns the best one if it fits well enough, otherwise None
+    and the caller generates the question live. Speculation stops once a
+    session has spent its token budget.
+    """
+
+    def __init__(self, session_store, budget=PREFETCH_SESSION_TOKENS):
+        self.session_store = session_store
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.tokens_spent = 0
+        self.tokens_wasted = 0
+        self._inflight = {}  # session_id -> Future of the running speculation
+        self._lock = threading.Lock()
+
+    def schedule(self, session_id, question, settings, conversation_history, resume_digest='', spent=0):
+        """Start speculating on the answer to question; returns False when over budget."""
+        prompt = prefetch_prompt(settings, conversation_history, question, resume_digest)
+        cost = estimate_tokens(prompt) + PREFETCH_CANDIDATES * COMPLETION_TOKENS_PER_CANDIDATE
+        if spent + cost > self.budget:
+            return False
+        self.cancel(session_id)
+        self.session_store.update(session_id, prefetch=None, prefetch_tokens=spent + cost)
+        with self._lock:
+            self.tokens_spent += cost
+            self._inflight[session_id] = submit(self._speculate(session_id, question, prompt, cost))
+        return True
+
+    async def _speculate(self, session_id, question, prompt, cost):
+        try:
+            data = await agenerate(prompt, PREFETCH_SCHEMA, temperature=PREFETCH_TEMPERATURE)
+        except Exception as e:
+            print(f"Question prefetch failed for session {session_id}: {e}")
+            return
+        prefetch = {'question': question, 'cost': cost, 'candidates': data['candidates'][:PREFETCH_CANDIDATES]}
+        await asyncio.to_thread(self.session_store.update, session_id, prefetch=prefetch)
+
+    def take(self, session_id, question, answer, asked=(), wait=PREFETCH_WAIT_SECONDS):
+        """Best speculated question for answer, or None to generate one live."""
+        with self._lock:
+            future = self._inflight.pop(session_id, None)
+        if future is not None:
+            try:
+                future.result(timeout=wait)
+            except FutureTimeout:
+                # Too late to help this turn
+                future.cancel()
+            except Exception:
+                pass
+
+        fields = self.session_store.get(session_id) or {}
+        prefetch = fields.get('prefetch')
+        if prefetch:
+            self.session_store.update(session_id, prefetch=None)
+        candidate, score = None, 0.0
+        if prefetch and prefetch.get('question') == question:
+            candidate, score = rerank(prefetch['candidates'], answer, asked)
+
+        with self._lock:
+            if candidate is None or score < PREFETCH_MIN_SCORE:
+                self.misses += 1
+                self.tokens_wasted += (prefetch or {}).get('cost', 0)
+                return None
+            self.hits += 1
+        return candidate['question'].strip()
+
+    def cancel(self, session_id):
+        with self._lock:
+            future = self._inflight.pop(session_id, None)
+        if future is not None:
+            future.cancel()
+
+    def register_metrics(self):
+        register_gauge('prefetch_hits', 'Turns answered with a speculated question', lambda: self.hits)
+        register_gauge('prefetch_misses', 'Turns that fell back to live question generation', lambda: self.misses)
+        register_gauge('prefetch_tokens_spent', 'Estimated tokens spent on speculation', lambda: self.tokens_spent)
+        register_gauge('prefetch_tokens_wasted', 'Estimated tokens spent on speculation that was not used',
+                       lambda: self.tokens_wasted)
@@ -0,0 +1,70 @@
+import os
+from caching import LRUCache
+from metrics import register_gauge
+
+# Bump when the serialized report format changes, so old ETags stop matching
+REPORT_FORMAT_VERSION = 1
+REPORT_CACHE_MEMORY_BYTES = int(os.getenv('REPORT_CACHE_MEMORY_BYTES', str(16 * 1024 * 1024)))
+# Optional tier shared by all processes, e.g. redis://localhost:6379/1
+REPORT_CACHE_URL = os.getenv('REPORT_CACHE_URL', '')
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Reports never change once generated, so browsers may keep them forever
+REPORT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def report_etag(report_id):
+    """Strong ETag for a report; derived from the id alone, since reports are immutable."""
+    return f"report-{report_id}-v{REPORT_FORMAT_VERSION}"
+
+class ReportCache:
+    """Read-through cache of serialized report responses, keyed by report id.
+
+    An in-memory LRU bounded in bytes sits in front of an optional Redis tier
+    shared between processes. Entries are never invalidated: reports are
+    immutable once generated.
+    """
+
+    def __init__(self, url=REPORT_CACHE_URL, memory_bytes=REPORT_CACHE_MEMORY_BYTES, ttl=REPORT_CACHE_TTL):
+        self.memory = LRUCache(max_size=memory_bytes)
+        self.ttl = ttl
+        self.shared = None
+        if url:
+            try:
+                import redis
+                self.shared = redis.Redis.from_url(url)
+            except ImportError:
+                print("REPORT_CACHE_URL is set but the redis package is not installed; using memory only")
+
+    def _shared_key(self, report_id):
+        return f"report:{report_id}:v{REPORT_FORMAT_VERSION}"
+
+    def get(self, report_id):
+        body = self.memory.get(report_id)
+        if body is not None or self.shared is None:
+            return body
+        try:
+            body = self.shared.get(self._shared_key(report_id))
+        except Exception as e:
+            print(f"Shared report cache unavailable: {e}")
+            return None
+        if body is not None:
+            self.memory.set(report_id, body)
+        return body
+
+    def put(self, report_id, body):
+        self.memory.set(report_id, body)
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(self._shared_key(report_id), body, ex=self.ttl)
+        except Exception as e:
+            print(f"Could not write shared report cache entry: {e}")
+
+report_cache = ReportCache()
+
+register_gauge('report_cache_hits', 'Report reads served from the in-memory cache',
+               lambda: report_cache.memory.hits)
+register_gauge('report_cache_misses', 'Report reads that missed the in-memory cache',
+               lambda: report_cache.memory.misses)
+register_gauge('report_cache_bytes', 'Size of the serialized reports held in memory',
+               lambda: report_cache.memory.size)
@@ -0,0 +1,134 @@
+import asyncio
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from async_runtime import submit
+from structured_output import agenerate
+
+# Per-question assessments running at once for one report
+REPORT_MAX_CONCURRENCY = int(os.getenv('REPORT_MAX_CONCURRENCY', '4'))
+# Attempts per piece (each question, and the aggregation); only failed pieces are retried
+REPORT_ATTEMPTS = int(os.getenv('REPORT_ATTEMPTS', '3'))
+REPORT_TIMEOUT = int(os.getenv('REPORT_TIMEOUT', '180'))
+REPORT_TEMPERATURE = 0.2
+
+METRIC_GROUPS = {
+    'technical_metrics': (['Technical Knowledge', 'Problem Solving', 'Code Quality'], '#3b82f6'),
+    'communication_metrics': (['Clarity of Expression', 'Articulation', 'Active Listening'], '#10b981'),
+    'personality_metrics': (['Confidence', 'Adaptability', 'Cultural Fit'], '#8b5cf6'),
+}
+
+METRIC_NAMES = [name for names, _ in METRIC_GROUPS.values() for name in names]
+
+class EvaluationError(RuntimeError):
+    """An interview that could not be scored; no report should be saved for it."""
+
+ASSESSMENT_SCHEMA = {
+    'type': 'object',
+    'required': ['assessment', 'score'],
+    'properties': {
+        'assessment': {'type': 'string'},
+        # Out-of-range scores are clamped rather than sent back for repair
+        'score': {'type': 'number'},
+    },
+}
+
+METRICS_SCHEMA = {
+    'type': 'object',
+    'required': METRIC_NAMES,
+    'properties': {name: {'type': 'number'} for name in METRIC_NAMES},
+}
+
+def _clamp_score(value):
+    return max(0, min(100, int(round(float(value)))))
+
+async def _with_retries(make_attempt, label):
+    """Await make_attempt() until it succeeds or REPORT_ATTEMPTS is used up (then None)."""
+    for attempt in range(1, REPORT_ATTEMPTS + 1):
+        try:
+            return await make_attempt()
+        except Exception as e:
+            print(f"{label} failed (attempt {attempt}/{REPORT_ATTEMPTS}): {e}")
+            if attempt < REPORT_ATTEMPTS:
+                await asyncio.sleep(0.5 * attempt)
+    return None
+
+async def assess_answer(question, answer, role):
+    """Map step: assess one Q&A pair. Returns {'assessment': str, 'score': 0-100}."""
+    prompt = f"""You are an expert interview evaluator for a {role} position.
+
+Question: {question}
+Answer: {answer}
+
+Assess this answer in one or two sentences and score it from 0 to 100.
+Respond with only JSON: {{"assessment": "...", "score": 75}}
+"""
+    result = await agenerate(prompt, ASSESSMENT_SCHEMA, temperature=REPORT_TEMPERATURE)
+    return {'assessment': result['assessment'].strip(), 'score': _clamp_score(result['score'])}
+
+async def aggregate_metrics(assessments, role, job_description):
+    """Reduce step: turn the per-question assessments into the nine metric scores."""
+    names = [name for names, _ in METRIC_GROUPS.values() for name in names]
+    summary = "\n".join(f"{i + 1}. ({item['score']}/100) {item['assessment']}"
+                        for i, item in enumerate(assessments) if item)
+    prompt = f"""You are an expert interview evaluator. Role: {role}
+Job Description: {job_description}
+
+Assessments of the candidate's answers, one per question:
+{summary}
+
+Score the candidate from 0 to 100 on each of: {", ".join(names)}.
+Respond with only JSON mapping each name to its score, e.g. {{"{names[0]}": 80}}
+"""
+    result = await agenerate(prompt, METRICS_SCHEMA, temperature=REPORT_TEMPERATURE)
+    return {name: _clamp_score(result[name]) for name in names}
+
+def build_metrics(values):
+    """Report metric lists ({'name', 'value', 'color'}) from a name -> score mapping."""
+    return {
+        group: [{'name': name, 'value': values[name], 'color': color} for name in names]
+        for group, (names, color) in METRIC_GROUPS.items()
+    }
+
+async def _evaluate(qa_pairs, role, job_description):
+    semaphore = asyncio.Semaphore(REPORT_MAX_CONCURRENCY)
+
+    async def assess(index, question, answer):
+        async with semaphore:
+            return await _with_retries(lambda: assess_answer(question, answer, role),
+                                       f"Assessment of question {index + 1}")
+
+    assessments = await asyncio.gather(*(assess(i, q, a) for i, (q, a) in enumerate(qa_pairs)))
+    if not any(assessments):
+        raise EvaluationError("No answer could be assessed")
+
+    values = await _with_retries(lambda: aggregate_metrics(assessments, role, job_description),
+                                 "Metric aggregation")
+    if values is None:
+        # Fall back to the mean per-question score for every metric
+        scores = [item['score'] for item in assessments if item]
+        mean = _clamp_score(sum(scores) / len(scores))
+        values = {name: mean for name in METRIC_NAMES}
+    return assessments, values
+
+def evaluate_interview(qa_pairs, role, job_description=""):
+    """Map-reduce evaluation of an interview transcript.
+
+    Each (question, answer) pair is assessed by its own small prompt, at most
+    REPORT_MAX_CONCURRENCY at a time, so wall-clock time follows the slowest
+    question rather than the transcript length. One short aggregation call
+    then scores the metrics from those assessments. Returns
+    (assessments, metrics, overall_score); an assessment is None if every
+    attempt for that question failed. Raises EvaluationError if no answer
+    could be assessed or the evaluation takes longer than REPORT_TIMEOUT.
+    """
+    future = submit(_evaluate(qa_pairs, role, job_description))
+    try:
+        assessments, values = future.result(timeout=REPORT_TIMEOUT)
+    except FutureTimeout:
+        # Stop the LLM calls still in flight rather than let them run on unseen
+        future.cancel()
+        raise EvaluationError(f"Evaluation took longer than {REPORT_TIMEOUT}s")
+    metrics = build_metrics(values)
+    all_metrics = [metric for group in metrics.values() for metric in group]
+    overall_score = sum(metric['value'] for metric in all_metrics) / len(all_metrics)
+    return assessments, metrics, overall_score
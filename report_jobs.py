@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from flask import current_app
+from metrics import register_gauge
+from session_store import SESSION_STORE_URL, create_session_store
+
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+# Finished jobs stay queryable for this long (seconds)
+REPORT_JOB_TTL = int(os.getenv('REPORT_JOB_TTL', '3600'))
+# A queued or running job whose worker hasn't renewed it for this long (seconds) is taken to be dead
+REPORT_JOB_LEASE = int(os.getenv('REPORT_JOB_LEASE', '60'))
+REPORT_CALLBACK_TIMEOUT = 5
+# Comma-separated hosts report callbacks may be sent to; empty disables callbacks
+REPORT_CALLBACK_HOSTS = {host.strip().lower() for host in os.getenv('REPORT_CALLBACK_HOSTS', '').split(',')
+                         if host.strip()}
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+def callback_allowed(url):
+    """Whether report job results may be POSTed to url: http(s) to a host in REPORT_CALLBACK_HOSTS."""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ('http', 'https') and (parts.hostname or '') in REPORT_CALLBACK_HOSTS
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Callbacks are not followed to another host behind the allowlist's back."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+class ReportJobQueue:
+    """Runs report generation in a local worker pool, at most one job per session.
+
+    build(session_id) does the actual work inside an app context and returns a
+    dict that is merged into the job (report_id, overall_score, ...). Job
+    records live in the session store (SESSION_STORE_URL), so any worker can
+    report a job's status and a session's job is shared by all workers; the
+    job runs on the worker that created it. Enqueuing a session that already
+    has a queued, running or completed job returns that job; a failed job is
+    replaced. The worker renews its queued and running jobs every third of
+    REPORT_JOB_LEASE; a job whose lease has run out (its worker died) counts
+    as failed, so the next enqueue takes the session over. When a job finishes it is optionally POSTed as JSON to its
+    callback URL, which must pass callback_allowed().
+    """
+
+    def __init__(self, build, workers=REPORT_WORKERS, url=SESSION_STORE_URL):
+        self.build = build
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        self._jobs = create_session_store('report_jobs', url, REPORT_JOB_TTL)  # job_id -> job
+        # session_id -> {'job_id'}; claimed with add() so only one worker starts a session's job
+        self._by_session = create_session_store('report_job_sessions', url, REPORT_JOB_TTL)
+        self._local = {}  # job_id -> status, for jobs on this worker's pool
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        register_gauge('report_jobs_queued', 'Report jobs waiting for a worker', lambda: self.count(QUEUED))
+        register_gauge('report_jobs_running', 'Report jobs being generated', lambda: self.count(RUNNING))
+
+    def enqueue(self, session_id, callback_url=None):
+        """Return the session's job, creating and scheduling one if needed."""
+        app = current_app._get_current_object()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'session_id': session_id,
+            'status': QUEUED,
+            'report_id': None,
+            'overall_score': None,
+            'error': None,
+            'created_at': time.time(),
+            'heartbeat_at': time.time(),
+            'finished_at': None,
+        }
+        # The record exists before the claim, so no worker ever sees a claim without its job
+        self._jobs.create(job['job_id'], job)
+        for _ in range(3):
+            if self._by_session.add(session_id, {'job_id': job['job_id']}):
+                break
+            claim = self._by_session.get(session_id) or {}
+            existing = self.get(claim['job_id']) if claim.get('job_id') else None
+            if existing and existing['status'] != FAILED:
+                self._jobs.delete(job['job_id'])
+                return existing
+            # The claimed job failed or has expired: release the claim (unless
+            # another worker has just replaced it) and take it over
+            if (self._by_session.get(session_id) or {}).get('job_id') == claim.get('job_id'):
+                self._by_session.delete(session_id)
+        else:
+            self._jobs.delete(job['job_id'])
+            raise RuntimeError(f"Could not claim the report job for session {session_id}")
+
+        with self._lock:
+            self._local[job['job_id']] = QUEUED
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_leases, name='report-heartbeat', daemon=True)
+                self._heartbeat.start()
+        self._executor.submit(self._run, job['job_id'], app, callback_url)
+        return job
+
+    def get(self, job_id):
+        """The job, marked failed if its lease has run out."""
+        job = self._jobs.get(job_id)
+        if (job and job['status'] in (QUEUED, RUNNING)
+                and job.get('heartbeat_at', job['created_at']) < time.time() - REPORT_JOB_LEASE):
+            job = self._update(job_id, status=FAILED, error='The report worker stopped responding',
+                               finished_at=time.time()) or job
+        return job
+
+    def for_session(self, session_id):
+        claim = self._by_session.get(session_id)
+        return self.get(claim['job_id']) if claim else None
+
+    def count(self, status):
+        """Jobs with status on this worker's pool."""
+        with self._lock:
+            return sum(1 for job_status in self._local.values() if job_status == status)
+
+    def _update(self, job_id, **fields):
+        self._jobs.update(job_id, **fields)
+        with self._lock:
+            if fields.get('status') in (COMPLETED, FAILED):
+                self._local.pop(job_id, None)
+            elif 'status' in fields:
+                self._local[job_id] = fields['status']
+        return self._jobs.get(job_id)
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(REPORT_JOB_LEASE / 3)
+            with self._lock:
+                job_ids = list(self._local)
+            for job_id in job_ids:
+                try:
+                    self._jobs.update(job_id, heartbeat_at=time.time())
+                except Exception as e:
+                    print(f"Could not renew the lease of report job {job_id}: {e}")
+
+    def _run(self, job_id, app, callback_url):
+        job = self._update(job_id, status=RUNNING)
+        with app.app_context():
+            try:
+                result = self.build(job['session_id'])
+                job = self._update(job_id, status=COMPLETED, finished_at=time.time(), **result)
+            except Exception as e:
+                app.logger.error(f"Report generation failed for session {job['session_id']}: {e}")
+                job = self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        if callback_url:
+            self._notify(callback_url, job)
+
+    def _notify(self, callback_url, job):
+        if not callback_allowed(callback_url):
+            print(f"Not sending report job callback to {callback_url}: host is not in REPORT_CALLBACK_HOSTS")
+            return
+        request = urllib.request.Request(callback_url, data=json.dumps(job).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with _callback_opener.open(request, timeout=REPORT_CALLBACK_TIMEOUT):
+                pass
+        except Exception as e:
+            print(f"Report job callback to {callback_url} failed: {e}")
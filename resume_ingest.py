@@ -0,0 +1,155 @@
+import atexit
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from caching import LRUCache
+from conversation_context import RESUME_DIGEST_TOKENS, normalize_whitespace, truncate_to_tokens
+
+RESUME_MAX_BYTES = int(os.getenv('RESUME_MAX_BYTES', str(5 * 1024 * 1024)))
+# Pages past this are ignored; a CV longer than this is rare and mostly boilerplate
+RESUME_MAX_PAGES = int(os.getenv('RESUME_MAX_PAGES', '10'))
+RESUME_EXTRACT_WORKERS = int(os.getenv('RESUME_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+RESUME_EXTRACT_TIMEOUT = int(os.getenv('RESUME_EXTRACT_TIMEOUT', '30'))
+# PDFs this short are extracted in-process: shipping them to a worker costs more than it saves
+RESUME_INLINE_PAGES = int(os.getenv('RESUME_INLINE_PAGES', '2'))
+RESUME_DIGEST_CACHE_SIZE = int(os.getenv('RESUME_DIGEST_CACHE_SIZE', '512'))
+RESUME_COLLECTION = 'resume_digests'
+
+# Section headings, in the order their content is most useful to the interviewer
+SECTION_HEADINGS = {
+    'summary': ('summary', 'profile', 'objective', 'about me', 'professional summary'),
+    'skills': ('skills', 'technical skills', 'core competencies', 'technologies', 'tools'),
+    'experience': ('experience', 'work experience', 'professional experience', 'employment', 'work history'),
+    'projects': ('projects', 'personal projects', 'key projects'),
+    'education': ('education', 'academic background', 'qualifications'),
+    'certifications': ('certifications', 'certificates', 'awards', 'achievements'),
+}
+_HEADING_NAMES = {alias: name for name, aliases in SECTION_HEADINGS.items() for alias in aliases}
+_HEADING = re.compile(r'^\s*([A-Za-z &]{3,40}?)\s*:?\s*$')
+
+class ResumeError(ValueError):
+    """An uploaded resume that cannot be ingested."""
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _extract_range(data, start, stop):
+    """Worker: text of pages [start, stop) of a PDF given as bytes."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_extract_pool():
+    """Returns the process pool for page extraction, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned workers re-import the parent's main module; serve.py keeps that import cheap
+                _pool = ProcessPoolExecutor(max_workers=RESUME_EXTRACT_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+                atexit.register(_pool.shutdown, wait=False)
+    return _pool
+
+def extract_pages(data, max_pages=RESUME_MAX_PAGES):
+    """(page texts, total page count) for a PDF, reading at most max_pages pages.
+
+    Pages are split into one contiguous range per worker and extracted in the
+    process pool, so a long CV uses several cores instead of one. Raises
+    ResumeError if the file is not a readable PDF.
+    """
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        if reader.is_encrypted:
+            raise ResumeError("Encrypted PDFs are not supported")
+        total = len(reader.pages)
+    except ResumeError:
+        raise
+    except Exception as e:
+        raise ResumeError(f"Could not read PDF: {e}")
+
+    count = min(total, max_pages)
+    if count <= RESUME_INLINE_PAGES or RESUME_EXTRACT_WORKERS <= 1:
+        return [reader.pages[i].extract_text() or '' for i in range(count)], total
+
+    step = math.ceil(count / RESUME_EXTRACT_WORKERS)
+    ranges = [(start, min(start + step, count)) for start in range(0, count, step)]
+    try:
+        futures = [get_extract_pool().submit(_extract_range, data, start, stop) for start, stop in ranges]
+        return [text for future in futures for text in future.result(timeout=RESUME_EXTRACT_TIMEOUT)], total
+    except Exception as e:
+        print(f"Parallel PDF extraction failed, extracting in-process: {e}")
+        return [reader.pages[i].extract_text() or '' for i in range(count)], total
+
+def split_sections(text):
+    """Map of section name -> whitespace-normalized text, keyed by recognized headings.
+
+    Text before the first heading (usually name and contact details) goes
+    under 'header'; unrecognized headings stay in the section they appear in.
+    """
+    sections = {}
+    current = 'header'
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        name = _HEADING_NAMES.get(match.group(1).strip().lower()) if match else None
+        if name:
+            current = name
+            continue
+        line = normalize_whitespace(line)
+        if line:
+            sections.setdefault(current, []).append(line)
+    return {name: ' '.join(lines) for name, lines in sections.items()}
+
+def build_digest(sections, max_tokens=RESUME_DIGEST_TOKENS):
+    """Prompt-ready digest of the resume sections within max_tokens.
+
+    The budget is shared between sections, and whatever a short section
+    doesn't use goes to the longer ones. The contact header is only used when
+    no headings were recognized.
+    """
+    names = [name for name in SECTION_HEADINGS if sections.get(name)] or ['header']
+    labels = len(names) * 3  # "Skills: " and the separator
+    remaining = max(0, max_tokens - labels)
+    budgets = {}
+    by_length = sorted(names, key=lambda name: len(sections.get(name, '')))
+    for i, name in enumerate(by_length):
+        share = remaining // (len(by_length) - i)
+        budgets[name] = min(share, len(sections.get(name, '')) // 4 + 1)
+        remaining -= budgets[name]
+    parts = [f"{name.capitalize()}: {truncate_to_tokens(sections.get(name, ''), budgets[name])}"
+             for name in names if sections.get(name)]
+    return ' | '.join(parts)
+
+def ingest_pdf(data):
+    """Structured digest document for a resume PDF; raises ResumeError for bad input."""
+    if len(data) > RESUME_MAX_BYTES:
+        raise ResumeError(f"Resume is larger than {RESUME_MAX_BYTES // (1024 * 1024)} MB")
+    if not data.startswith(b'%PDF'):
+        raise ResumeError("Resume must be a PDF")
+    pages, total = extract_pages(data)
+    # Join once; pages are separate lines so headings at the top of a page are still found
+    text = '\n'.join(pages)
+    sections = split_sections(text)
+    return {
+        'file_hash': file_hash(data),
+        'pages': total,
+        'pages_read': len(pages),
+        'truncated': total > len(pages),
+        'chars': len(text),
+        'sections': {name: truncate_to_tokens(body, RESUME_DIGEST_TOKENS) for name, body in sections.items()},
+        'digest': build_digest(sections),
+    }
+
+# file hash -> digest document, in front of the resume_digests collection
+digest_cache = LRUCache(max_entries=RESUME_DIGEST_CACHE_SIZE)
@@ -0,0 +1,23 @@
+"""Development entry point: python serve.py (Flask) or python serve.py --asgi (uvicorn)
+
+Worker processes for Whisper and PDF extraction are spawned, and a spawned
+process starts by re-importing its parent's main module. Serving from this
+module, which imports the app only under its __main__ guard, keeps them from
+re-running the app's startup (database setup, session stores, report job
+executor, TTS prewarm). app.py and asgi.py hand over to it when run as
+scripts; gunicorn and uvicorn import the app by name and need nothing special.
+"""
+import os
+import sys
+
+def reexec(*args):
+    """Replace the current process with `python serve.py *args`."""
+    os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), *args])
+
+if __name__ == "__main__":
+    if '--asgi' in sys.argv[1:]:
+        import uvicorn
+        uvicorn.run("asgi:application", host="0.0.0.0", port=int(os.getenv('PORT', '5000')))
+    else:
+        from app import app
+        app.run(debug=True)
@@ -0,0 +1,373 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# memory:// (single process), sqlite:///path/to/sessions.db (all processes on one
+# host) or redis://host:port/db (any number of hosts; needs the redis package)
+SESSION_STORE_URL = os.getenv('SESSION_STORE_URL', 'memory://')
+SESSION_TTL = int(os.getenv('SESSION_TTL', str(6 * 3600)))  # seconds
+
+def _encode(value):
+    """Compact JSON; datetimes are stored as ISO-8601 strings."""
+    return json.dumps(value, separators=(',', ':'),
+                      default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o))
+
+def _decode(raw):
+    return json.loads(raw)
+
+class SessionStore(abc.ABC):
+    """Interview session state shared between request handlers.
+
+    A session is a dict of fields (settings, current question, ...) plus an
+    append-only list of turns. Every write refreshes the session's TTL, and
+    expired sessions read as missing. Sessions live under a namespace so
+    several stores can share one backend.
+    """
+
+    def __init__(self, namespace, ttl=SESSION_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, session_id):
+        return f"{self.namespace}:{session_id}"
+
+    @abc.abstractmethod
+    def create(self, session_id, fields):
+        """Create (or reset) a session with the given fields and no turns."""
+
+    @abc.abstractmethod
+    def add(self, session_id, fields):
+        """Atomically create the session only if no live one exists. Returns True if it was created."""
+
+    @abc.abstractmethod
+    def get(self, session_id):
+        """Return the session's fields, or None if it doesn't exist or has expired."""
+
+    @abc.abstractmethod
+    def update(self, session_id, **fields):
+        """Merge fields into an existing session. Returns False if the session is missing."""
+
+    @abc.abstractmethod
+    def append_turn(self, session_id, turn):
+        """Atomically append a turn and return the new number of turns (0 if the session is missing)."""
+
+    @abc.abstractmethod
+    def get_turns(self, session_id):
+        """Return the session's turns in order."""
+
+    @abc.abstractmethod
+    def delete(self, session_id):
+        """Remove the session and its turns."""
+
+    @abc.abstractmethod
+    def session_ids(self):
+        """Return the ids of all live sessions in this namespace."""
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+class MemorySessionStore(SessionStore):
+    """Process-local store. Values are kept serialized so callers never share mutable state."""
+
+    def __init__(self, namespace, ttl=SESSION_TTL):
+        super().__init__(namespace, ttl)
+        self._sessions = {}  # session_id -> [fields_json, [turn_json, ...], expires_at]
+        self._lock = threading.Lock()
+
+    def _live(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry and entry[2] < time.time():
+            del self._sessions[session_id]
+            return None
+        return entry
+
+    def create(self, session_id, fields):
+        with self._lock:
+            self._sessions[session_id] = [_encode(fields), [], time.time() + self.ttl]
+
+    def add(self, session_id, fields):
+        with self._lock:
+            if self._live(session_id):
+                return False
+            self._sessions[session_id] = [_encode(fields), [], time.time() + self.ttl]
+            return True
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._live(session_id)
+            return _decode(entry[0]) if entry else None
+
+    def update(self, session_id, **fields):
+        with self._lock:
+            entry = self._live(session_id)
+            if not entry:
+                return False
+            current = _decode(entry[0])
+            current.update(fields)
+            entry[0] = _encode(current)
+            entry[2] = time.time() + self.ttl
+            return True
+
+    def append_turn(self, session_id, turn):
+        with self._lock:
+            entry = self._live(session_id)
+            if not entry:
+                return 0
+            entry[1].append(_encode(turn))
+            entry[2] = time.time() + self.ttl
+            return len(entry[1])
+
+    def get_turns(self, session_id):
+        with self._lock:
+            entry = self._live(session_id)
+            return [_decode(turn) for turn in entry[1]] if entry else []
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def session_ids(self):
+        with self._lock:
+            return [sid for sid in list(self._sessions) if self._live(sid)]
+
+class SQLiteSessionStore(SessionStore):
+    """Store in a WAL-mode SQLite file, shared by all worker processes on a host."""
+
+    def __init__(self, path, namespace, ttl=SESSION_TTL):
+        super().__init__(namespace, ttl)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    key TEXT PRIMARY KEY,
+                    fields TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS turns (
+                    key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    turn TEXT NOT NULL,
+                    PRIMARY KEY (key, seq)
+                );
+            """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        """Run (sql, params) pairs in one write transaction and return the last cursor."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = None
+            for sql, params in statements:
+                cursor = conn.execute(sql, params)
+            conn.execute('COMMIT')
+            return cursor
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def create(self, session_id, fields):
+        key = self._key(session_id)
+        self._write([
+            ('DELETE FROM turns WHERE key = ?', (key,)),
+            ('INSERT OR REPLACE INTO sessions (key, fields, expires_at) VALUES (?, ?, ?)',
+             (key, _encode(fields), time.time() + self.ttl)),
+            # Opportunistic cleanup of expired sessions
+            ('DELETE FROM turns WHERE key IN (SELECT key FROM sessions WHERE expires_at < ?)', (time.time(),)),
+            ('DELETE FROM sessions WHERE expires_at < ?', (time.time(),)),
+        ])
+
+    def add(self, session_id, fields):
+        key = self._key(session_id)
+        now = time.time()
+        cursor = self._write([
+            ('DELETE FROM turns WHERE key IN (SELECT key FROM sessions WHERE key = ? AND expires_at < ?)', (key, now)),
+            ('DELETE FROM sessions WHERE key = ? AND expires_at < ?', (key, now)),
+            ('INSERT OR IGNORE INTO sessions (key, fields, expires_at) VALUES (?, ?, ?)',
+             (key, _encode(fields), now + self.ttl)),
+        ])
+        return cursor.rowcount == 1
+
+    def get(self, session_id):
+        row = self._connection().execute(
+            'SELECT fields FROM sessions WHERE key = ? AND expires_at >= ?',
+            (self._key(session_id), time.time())
+        ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def update(self, session_id, **fields):
+        key = self._key(session_id)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT fields FROM sessions WHERE key = ? AND expires_at >= ?',
+                               (key, time.time())).fetchone()
+            if row:
+                current = _decode(row[0])
+                current.update(fields)
+                conn.execute('UPDATE sessions SET fields = ?, expires_at = ? WHERE key = ?',
+                             (_encode(current), time.time() + self.ttl, key))
+            conn.execute('COMMIT')
+            return row is not None
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def append_turn(self, session_id, turn):
+        key = self._key(session_id)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Refreshing the TTL doubles as the liveness check: an expired session is not revived
+            count = 0
+            if conn.execute('UPDATE sessions SET expires_at = ? WHERE key = ? AND expires_at >= ?',
+                            (now + self.ttl, key, now)).rowcount:
+                count = conn.execute('SELECT COUNT(*) FROM turns WHERE key = ?', (key,)).fetchone()[0]
+                conn.execute('INSERT INTO turns (key, seq, turn) VALUES (?, ?, ?)', (key, count, _encode(turn)))
+                count += 1
+            conn.execute('COMMIT')
+            return count
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_turns(self, session_id):
+        key = self._key(session_id)
+        if self.get(session_id) is None:
+            return []
+        rows = self._connection().execute('SELECT turn FROM turns WHERE key = ? ORDER BY seq', (key,)).fetchall()
+        return [_decode(row[0]) for row in rows]
+
+    def delete(self, session_id):
+        key = self._key(session_id)
+        self._write([
+            ('DELETE FROM turns WHERE key = ?', (key,)),
+            ('DELETE FROM sessions WHERE key = ?', (key,)),
+        ])
+
+    def session_ids(self):
+        prefix = f"{self.namespace}:"
+        rows = self._connection().execute(
+            'SELECT key FROM sessions WHERE key LIKE ? AND expires_at >= ?', (prefix + '%', time.time())
+        ).fetchall()
+        return [row[0][len(prefix):] for row in rows]
+
+# KEYS: session hash, turns list. ARGV: ttl, then field/value pairs (at least the marker)
+_REDIS_ADD = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+# KEYS: session hash, turns list. ARGV: ttl, then field/value pairs (possibly none)
+_REDIS_UPDATE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+if #ARGV > 1 then redis.call('HSET', KEYS[1], unpack(ARGV, 2)) end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+# KEYS: session hash, turns list. ARGV: ttl, encoded turn
+_REDIS_APPEND_TURN = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local count = redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return count
+"""
+
+class RedisSessionStore(SessionStore):
+    """Store in Redis (or any Redis-protocol server): one hash of fields and one list of turns per session.
+
+    Writes that depend on the session existing run as one Lua script, so a
+    session can't expire between the check and the write, and a key is never
+    left without its expiry.
+    """
+
+    def __init__(self, url, namespace, ttl=SESSION_TTL):
+        super().__init__(namespace, ttl)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("SESSION_STORE_URL points at Redis; install it with `pip install redis`.")
+        self.redis = redis.Redis.from_url(url)
+        self._add = self.redis.register_script(_REDIS_ADD)
+        self._update = self.redis.register_script(_REDIS_UPDATE)
+        self._append_turn = self.redis.register_script(_REDIS_APPEND_TURN)
+
+    @staticmethod
+    def _pairs(fields):
+        return [item for name, value in fields.items() for item in (name, _encode(value))]
+
+    def _turns_key(self, session_id):
+        return f"{self._key(session_id)}:turns"
+
+    def create(self, session_id, fields):
+        key = self._key(session_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(key, self._turns_key(session_id))
+        # A marker field keeps sessions with no other fields visible
+        pipe.hset(key, mapping={'__created': _encode(time.time()),
+                                **{name: _encode(value) for name, value in fields.items()}})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def add(self, session_id, fields):
+        pairs = self._pairs({'__created': time.time(), **fields})
+        return bool(self._add(keys=[self._key(session_id), self._turns_key(session_id)], args=[self.ttl] + pairs))
+
+    def get(self, session_id):
+        raw = self.redis.hgetall(self._key(session_id))
+        if not raw:
+            return None
+        fields = {name.decode(): _decode(value) for name, value in raw.items()}
+        fields.pop('__created', None)
+        return fields
+
+    def update(self, session_id, **fields):
+        keys = [self._key(session_id), self._turns_key(session_id)]
+        return bool(self._update(keys=keys, args=[self.ttl] + self._pairs(fields)))
+
+    def append_turn(self, session_id, turn):
+        keys = [self._key(session_id), self._turns_key(session_id)]
+        return self._append_turn(keys=keys, args=[self.ttl, _encode(turn)])
+
+    def get_turns(self, session_id):
+        return [_decode(turn) for turn in self.redis.lrange(self._turns_key(session_id), 0, -1)]
+
+    def delete(self, session_id):
+        self.redis.delete(self._key(session_id), self._turns_key(session_id))
+
+    def session_ids(self):
+        prefix = f"{self.namespace}:"
+        ids = []
+        for key in self.redis.scan_iter(match=f"{prefix}*"):
+            key = key.decode()[len(prefix):]
+            if not key.endswith(':turns'):
+                ids.append(key)
+        return ids
+
+def create_session_store(namespace, url=SESSION_STORE_URL, ttl=SESSION_TTL):
+    """Build the session store configured by url (see SESSION_STORE_URL)."""
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisSessionStore(url, namespace, ttl)
+    if url.startswith('sqlite:///'):
+        return SQLiteSessionStore(url[len('sqlite:///'):], namespace, ttl)
+    if url.startswith('memory://'):
+        return MemorySessionStore(namespace, ttl)
+    raise ValueError(f"Unsupported SESSION_STORE_URL: {url}")
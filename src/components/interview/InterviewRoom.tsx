@@ -33,6 +33,9 @@ const InterviewRoom: React.FC<InterviewRoomProps> = ({
   const navigate = useNavigate();
   const { toast } = useToast();
   const conversationRef = useRef<HTMLDivElement>(null);
+  // Streaming transcription state: chunks are uploaded strictly in order
+  const transcriptionStreamRef = useRef<string | null>(null);
+  const chunkUploadsRef = useRef<Promise<void>>(Promise.resolve());
 
   useEffect(() => {
     const timer = setInterval(() => setInterviewTime(prev => prev + 1), 1000);
@@ -77,7 +80,28 @@ const InterviewRoom: React.FC<InterviewRoomProps> = ({
     try {
       setIsListening(true);
       setCurrentTranscript('');
-      await audioRecordingService.startRecording();
+      transcriptionStreamRef.current = null;
+      chunkUploadsRef.current = Promise.resolve();
+      try {
+        const { stream_id } = await interviewService.openTranscriptionStream();
+        transcriptionStreamRef.current = stream_id;
+      } catch (error) {
+        console.warn('Streaming transcription unavailable, falling back to upload:', error);
+      }
+      await audioRecordingService.startRecording((chunk) => {
+        const streamId = transcriptionStreamRef.current;
+        if (!streamId) return;
+        chunkUploadsRef.current = chunkUploadsRef.current
+          .then(async () => {
+            if (transcriptionStreamRef.current !== streamId) return;
+            const partial = await interviewService.sendTranscriptionChunk(streamId, chunk);
+            setCurrentTranscript(partial.transcript);
+          })
+          .catch((error) => {
+            console.warn('Streaming transcription failed, falling back to upload:', error);
+            transcriptionStreamRef.current = null;
+          });
+      });
     } catch (error) {
       console.error('Error starting recording:', error);
       setIsListening(false);
@@ -98,7 +122,13 @@ const InterviewRoom: React.FC<InterviewRoomProps> = ({
         return;
       }
       
-      const { transcript } = await interviewService.transcribeAudio(audioBlob);
+      await chunkUploadsRef.current;
+      const streamId = transcriptionStreamRef.current;
+      transcriptionStreamRef.current = null;
+      const { transcript } = streamId
+        ? await interviewService.finishTranscriptionStream(streamId)
+            .catch(() => interviewService.transcribeAudio(audioBlob))
+        : await interviewService.transcribeAudio(audioBlob);
       setCurrentTranscript(transcript);
       if (!transcript.trim()) {
         setIsProcessing(false);
@@ -108,22 +138,54 @@ const InterviewRoom: React.FC<InterviewRoomProps> = ({
       
       setConversation(prev => [...prev, { type: 'user', text: transcript }]);
       
-      const response = await interviewService.submitAnswer({
-        session_id: sessionId,
-        answer: transcript,
-        question: currentQuestion,
-      });
+      // Play the spoken question sentence by sentence while it is still being generated
+      let streamedQuestion = '';
+      let sentenceAudio: Uint8Array[] = [];
+      const speech = speechService.startQueue();
+      const flushSentence = () => {
+        if (sentenceAudio.length) {
+          speech.enqueue(new Blob(sentenceAudio, { type: 'audio/mpeg' }));
+          sentenceAudio = [];
+        }
+      };
+      const response = await interviewService.submitAnswerSpeech(
+        {
+          session_id: sessionId,
+          answer: transcript,
+          question: currentQuestion,
+        },
+        {
+          onSentence: (_index, text) => {
+            flushSentence();
+            streamedQuestion = streamedQuestion ? `${streamedQuestion} ${text}` : text;
+            setCurrentQuestion(streamedQuestion);
+            setIsAISpeaking(true);
+          },
+          onAudio: (_index, chunk) => {
+            sentenceAudio.push(chunk);
+          },
+        },
+      );
+      flushSentence();
 
       setCurrentTranscript('');
 
-      if (response.report_id) {
-        handleEndInterview(response.report_id);
+      if (response.is_complete || response.report_id) {
+        handleEndInterview();
         return;
       }
 
       if (response.next_question) {
         setCurrentQuestion(response.next_question);
-        await speakAndSetQuestion(response.next_question);
+        setConversation(prev => [...prev, { type: 'ai', text: response.next_question! }]);
+        setIsAISpeaking(true);
+        try {
+          await speech.finish();
+        } finally {
+          setIsAISpeaking(false);
+        }
+      } else {
+        speechService.stop();
       }
       
     } catch (error) {
@@ -141,18 +203,19 @@ const InterviewRoom: React.FC<InterviewRoomProps> = ({
     setIsMicOn(!isMicOn);
   };
 
-  const handleEndInterview = async (reportId?: string) => {
+  const handleEndInterview = async () => {
     speechService.stop();
     if (audioRecordingService.isRecording()) {
       await audioRecordingService.stopRecording();
     }
     
-    if (!reportId) {
-      try {
-        await interviewService.endInterview(sessionId);
-      } catch (error) {
-        console.error('Error ending interview:', error);
-      }
+    // Joins the report job already started by the question cutoff, if any
+    try {
+      const job = await interviewService.endInterview(sessionId);
+      toast({ title: "Interview Complete", description: "Generating your report..." });
+      await interviewService.waitForReport(job.job_id);
+    } catch (error) {
+      console.error('Error ending interview:', error);
     }
 
     onInterviewEnd();
@@ -4,7 +4,7 @@ export class AudioRecordingService {
   private audioChunks: Blob[] = [];
   private stream: MediaStream | null = null;
 
-  async startRecording(): Promise<void> {
+  async startRecording(onChunk?: (chunk: Blob) => void): Promise<void> {
     try {
       this.stream = await navigator.mediaDevices.getUserMedia({ audio: true });
       this.mediaRecorder = new MediaRecorder(this.stream);
@@ -13,6 +13,7 @@ export class AudioRecordingService {
       this.mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
           this.audioChunks.push(event.data);
+          onChunk?.(event.data);
         }
       };
 
@@ -24,6 +24,58 @@ export interface InterviewResponse {
   is_complete?: boolean;
   report_id?: string;
   overall_score?: number;
+  job_id?: string;
+}
+
+export interface ReportJob {
+  job_id: string;
+  session_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  report_id: string | null;
+  overall_score: number | null;
+  error: string | null;
+}
+
+export interface TranscriptionStreamResult {
+  stream_id: string;
+  transcript: string;
+  committed: string;
+  tentative: string;
+  is_final: boolean;
+}
+
+export interface SpeechStreamHandlers {
+  onSentence: (index: number, text: string) => void;
+  onAudio: (index: number, chunk: Uint8Array) => void;
+}
+
+/** Reads a Server-Sent Events body, calling `onEvent` with each parsed JSON payload. */
+async function readEventStream(
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: string, payload: any) => void,
+): Promise<void> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      const event = message.match(/^event: (.*)$/m)?.[1];
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (event && data) {
+        onEvent(event, JSON.parse(data));
+      }
+    }
+  }
 }
 
 export const interviewService = {
@@ -69,6 +121,78 @@ export const interviewService = {
     return response.json();
   },
 
+  /**
+   * Streams the next question as it is generated. `onToken` receives each piece
+   * of text; the promise resolves with the complete response. When the interview
+   * is over the server answers with plain JSON (the report) instead of a stream.
+   */
+  async submitAnswerStream(
+    params: SubmitAnswerParams,
+    onToken: (token: string) => void,
+  ): Promise<InterviewResponse> {
+    const response = await fetch(`${API_URL}/interview/submit_answer/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to submit answer: ${response.statusText}`);
+    }
+
+    if (!response.headers.get('Content-Type')?.includes('text/event-stream') || !response.body) {
+      return response.json();
+    }
+
+    let result: InterviewResponse = {};
+    await readEventStream(response.body, (event, payload) => {
+      if (event === 'token') {
+        onToken(payload.token);
+      } else if (event === 'done') {
+        result = payload;
+      }
+    });
+
+    return result;
+  },
+
+  /**
+   * Streams the next question as speech: sentences arrive with their MP3 audio
+   * in order, so playback can start before the whole question is generated.
+   */
+  async submitAnswerSpeech(
+    params: SubmitAnswerParams,
+    handlers: SpeechStreamHandlers,
+  ): Promise<InterviewResponse> {
+    const response = await fetch(`${API_URL}/interview/submit_answer/speech`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to submit answer: ${response.statusText}`);
+    }
+
+    if (!response.headers.get('Content-Type')?.includes('text/event-stream') || !response.body) {
+      return response.json();
+    }
+
+    let result: InterviewResponse = {};
+    await readEventStream(response.body, (event, payload) => {
+      if (event === 'sentence') {
+        handlers.onSentence(payload.index, payload.text);
+      } else if (event === 'audio') {
+        const bytes = Uint8Array.from(atob(payload.data), (c) => c.charCodeAt(0));
+        handlers.onAudio(payload.index, bytes);
+      } else if (event === 'done') {
+        result = payload;
+      }
+    });
+
+    return result;
+  },
+
   async transcribeAudio(audioBlob: Blob): Promise<{ transcript: string }> {
     const formData = new FormData();
     formData.append('audio', audioBlob, 'audio.webm');
@@ -85,7 +209,48 @@ export const interviewService = {
     return response.json();
   },
 
-  async endInterview(sessionId: string): Promise<{ report_id: string; overall_score: number }> {
+  async openTranscriptionStream(): Promise<{ stream_id: string }> {
+    const response = await fetch(`${API_URL}/transcribe/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({}),
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to open transcription stream: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+
+  async sendTranscriptionChunk(streamId: string, chunk: Blob): Promise<TranscriptionStreamResult> {
+    const response = await fetch(`${API_URL}/transcribe/stream/${streamId}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/octet-stream' },
+      body: chunk,
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to transcribe audio chunk: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+
+  async finishTranscriptionStream(streamId: string): Promise<TranscriptionStreamResult> {
+    const response = await fetch(`${API_URL}/transcribe/stream/${streamId}/finish`, {
+      method: 'POST',
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to finish transcription: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+
+  /** Ends the interview; the report is generated in the background by the returned job. */
+  async endInterview(sessionId: string): Promise<ReportJob> {
     const response = await fetch(`${API_URL}/interview/end_interview`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
@@ -98,5 +263,31 @@ export const interviewService = {
     }
 
     return response.json();
+  },
+
+  async getReportJob(jobId: string): Promise<ReportJob> {
+    const response = await fetch(`${API_URL}/interview/report-jobs/${jobId}`);
+
+    if (!response.ok) {
+      throw new Error(`Failed to get report status: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+
+  /** Polls a report job until it completes; resolves with the report id. */
+  async waitForReport(jobId: string, intervalMs = 2000, timeoutMs = 120000): Promise<string> {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const job = await this.getReportJob(jobId);
+      if (job.status === 'completed' && job.report_id) {
+        return job.report_id;
+      }
+      if (job.status === 'failed') {
+        throw new Error(`Report generation failed: ${job.error}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Timed out waiting for the report');
   }
 };
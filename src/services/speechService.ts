@@ -1,19 +1,90 @@
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
+export interface SpeechQueue {
+  enqueue: (audio: Blob) => void;
+  finish: () => Promise<void>;
+}
+
 export class SpeechService {
   private currentAudio: HTMLAudioElement | null = null;
   private isSpeakingFlag = false;
+  private cancelQueue: (() => void) | null = null;
+
+  /**
+   * Plays audio clips back to back as they are enqueued. `finish()` resolves
+   * once every enqueued clip has played (or playback was stopped).
+   */
+  startQueue(): SpeechQueue {
+    this.stop();
+
+    const pending: Blob[] = [];
+    let finished = false;
+    let wake: (() => void) | null = null;
+    const notify = () => {
+      wake?.();
+      wake = null;
+    };
+
+    const playClip = (clip: Blob) => new Promise<void>((resolve) => {
+      const audioUrl = URL.createObjectURL(clip);
+      const done = () => {
+        URL.revokeObjectURL(audioUrl);
+        resolve();
+      };
+      this.currentAudio = new Audio(audioUrl);
+      this.isSpeakingFlag = true;
+      this.currentAudio.onended = done;
+      this.currentAudio.onerror = done;
+      this.currentAudio.play().catch(done);
+      this.cancelQueue = () => {
+        pending.length = 0;
+        finished = true;
+        done();
+        notify();
+      };
+    });
+
+    const playback = (async () => {
+      while (true) {
+        const clip = pending.shift();
+        if (clip) {
+          await playClip(clip);
+        } else if (finished) {
+          break;
+        } else {
+          await new Promise<void>((resolve) => { wake = resolve; });
+        }
+      }
+      this.cancelQueue = null;
+      this.cleanup();
+    })();
+
+    this.cancelQueue = () => {
+      finished = true;
+      notify();
+    };
+
+    return {
+      enqueue: (audio: Blob) => {
+        if (finished) return;
+        pending.push(audio);
+        notify();
+      },
+      finish: () => {
+        finished = true;
+        notify();
+        return playback;
+      },
+    };
+  }
 
   async speak(text: string): Promise<void> {
     this.stop();
 
     try {
-      const response = await fetch(`${API_URL}/tts`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text }),
-      });
+      // GET so the browser can reuse the content-addressed clip from its HTTP cache
+      const response = await fetch(`${API_URL}/interview/tts?${new URLSearchParams({ text })}`);
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({ error: 'Failed to fetch TTS audio' }));
@@ -54,6 +125,8 @@ export class SpeechService {
   }
 
   stop(): void {
+    this.cancelQueue?.();
+    this.cancelQueue = null;
     if (this.currentAudio) {
       this.currentAudio.pause();
       this.cleanup();
@@ -0,0 +1,238 @@
+import copy
+import json
+import os
+import re
+import llm_gateway
+from async_runtime import run
+
+# Targeted repair rounds before giving up on a reply
+STRUCTURED_REPAIR_ATTEMPTS = int(os.getenv('STRUCTURED_REPAIR_ATTEMPTS', '2'))
+
+_FENCE = re.compile(r'```[a-zA-Z]*')
+_PATH_PART = re.compile(r'([^.\[\]]+)|\[(\d+)\]')
+_SCHEMA_TYPES = {'object': dict, 'array': list}
+
+class StructuredOutputError(ValueError):
+    """An LLM reply that could not be turned into data matching its schema."""
+
+    def __init__(self, message, errors=None, data=None):
+        super().__init__(message)
+        self.errors = errors or []
+        self.data = data
+
+def _scan(text, start):
+    """Walk a JSON value from text[start], returning (end, open_brackets, in_string).
+
+    Stops right after the bracket that closes the value; if the text ends first,
+    end is len(text) and open_brackets lists what still needs closing.
+    """
+    stack = []
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append(ch)
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, [], False
+    return len(text), stack, in_string
+
+def _strip_trailing_commas(text):
+    out = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == ',':
+            rest = text[i + 1:].lstrip()
+            if not rest or rest[0] in '}]':
+                continue
+        out.append(ch)
+    return ''.join(out)
+
+def _parse_from(text, start):
+    """Parse the JSON value starting at text[start], repairing a cut-off ending; returns (value, end)."""
+    end, open_brackets, in_string = _scan(text, start)
+    candidate = text[start:end]
+    if open_brackets:
+        # Truncated reply: finish the open string, drop a dangling separator, close the rest
+        if in_string:
+            candidate += '"'
+        candidate = re.sub(r'[,:]\s*$', '', candidate.rstrip())
+        candidate += ''.join('}' if bracket == '{' else ']' for bracket in reversed(open_brackets))
+    return json.loads(_strip_trailing_commas(candidate)), end
+
+def extract_json(text, schema=None):
+    """Pull the first JSON object or array out of an LLM reply.
+
+    Tolerates code fences, prose before and after the value, trailing commas
+    and replies cut off mid-value (open strings and brackets are closed).
+    Brackets in the prose ("Scores [see below]: {...}") are skipped: each
+    { or [ is tried in turn until one parses. With a schema, scanning goes on
+    past values that don't fit it ("Note [1]: {...}" when an object is
+    expected): the first value that validates wins, else the first of the
+    schema's type, else the first value found. Raises StructuredOutputError
+    if nothing parseable is found.
+    """
+    text = _FENCE.sub('', text or '')
+    expected = _SCHEMA_TYPES.get((schema or {}).get('type'))
+    first_error = None
+    found = []
+    end = 0
+    for match in re.finditer(r'[{\[]', text):
+        if match.start() < end:
+            continue  # inside the value just parsed
+        try:
+            value, end = _parse_from(text, match.start())
+        except json.JSONDecodeError as e:
+            first_error = first_error or e
+            continue
+        if schema is None:
+            return value
+        if not validate(copy.deepcopy(value), schema)[1]:
+            return value
+        found.append(value)
+    for value in found:
+        if expected and isinstance(value, expected):
+            return value
+    if found:
+        return found[0]
+    if first_error is None:
+        raise StructuredOutputError("No JSON value in LLM response")
+    raise StructuredOutputError(f"Malformed JSON in LLM response: {first_error}")
+
+def format_path(path):
+    return ''.join(f"[{part}]" if isinstance(part, int) else (f".{part}" if i else part)
+                   for i, part in enumerate(path)) or '$'
+
+def parse_path(text):
+    return [int(index) if index else key for key, index in _PATH_PART.findall(text)]
+
+def validate(value, schema, path=()):
+    """Check value against a small JSON-Schema subset; returns (value, errors).
+
+    Supports type (object, array, string, number, integer), properties,
+    required, items, minItems, minimum/maximum and enum. Numeric strings are
+    coerced to numbers. errors is a list of (path, message) pairs.
+    """
+    errors = []
+    kind = schema.get('type')
+    if kind in ('number', 'integer'):
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().rstrip('%'))
+            except ValueError:
+                pass
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value, [(path, f"expected a {kind}")]
+        if kind == 'integer':
+            value = int(round(value))
+        if 'minimum' in schema and value < schema['minimum']:
+            errors.append((path, f"must be at least {schema['minimum']}"))
+        if 'maximum' in schema and value > schema['maximum']:
+            errors.append((path, f"must be at most {schema['maximum']}"))
+    elif kind == 'string':
+        if not isinstance(value, str):
+            return value, [(path, "expected a string")]
+    elif kind == 'array':
+        if not isinstance(value, list):
+            return value, [(path, "expected an array")]
+        if len(value) < schema.get('minItems', 0):
+            errors.append((path, f"expected at least {schema['minItems']} items"))
+        if 'items' in schema:
+            for i, item in enumerate(value):
+                value[i], item_errors = validate(item, schema['items'], path + (i,))
+                errors.extend(item_errors)
+    elif kind == 'object':
+        if not isinstance(value, dict):
+            return value, [(path, "expected an object")]
+        for key in schema.get('required', []):
+            if key not in value:
+                errors.append((path + (key,), "missing"))
+        for key, subschema in schema.get('properties', {}).items():
+            if key in value:
+                value[key], key_errors = validate(value[key], subschema, path + (key,))
+                errors.extend(key_errors)
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append((path, f"must be one of {schema['enum']}"))
+    return value, errors
+
+def apply_patch(data, patch):
+    """Set each 'a.b[0].c' path in patch to its value, creating missing object keys."""
+    for text, value in patch.items():
+        path = parse_path(text)
+        if not path:
+            continue
+        target = data
+        try:
+            for part, following in zip(path, path[1:]):
+                if isinstance(target, dict) and part not in target:
+                    target[part] = [] if isinstance(following, int) else {}
+                target = target[part]
+            if isinstance(target, list) and path[-1] == len(target):
+                target.append(value)
+            else:
+                target[path[-1]] = value
+        except (KeyError, IndexError, TypeError):
+            print(f"Ignoring repair for unknown path {text}")
+    return data
+
+def repair_prompt(prompt, data, errors):
+    """Ask only for corrected values of the invalid fields."""
+    problems = "\n".join(f"- {format_path(path)}: {message}" for path, message in errors)
+    return f"""{prompt}
+
+Your previous reply was parsed as:
+{json.dumps(data, indent=2)}
+
+These fields are invalid:
+{problems}
+
+Reply with only a JSON object that maps each listed path to its corrected value, e.g. {{"{format_path(errors[0][0])}": ...}}. Do not repeat the other fields.
+"""
+
+async def agenerate(prompt, schema, temperature=0.2, repair_attempts=STRUCTURED_REPAIR_ATTEMPTS):
+    """Run prompt and return its reply as data matching schema.
+
+    Invalid fields are fixed with short repair prompts instead of regenerating
+    the whole reply. Raises StructuredOutputError if the reply can't be parsed
+    or is still invalid after repair_attempts rounds.
+    """
+    reply = await llm_gateway.ainvoke(prompt, temperature=temperature)
+    data, errors = validate(extract_json(reply, schema), schema)
+    for _ in range(repair_attempts):
+        # A reply of the wrong shape altogether has no fields to repair
+        if not errors or any(not path for path, _ in errors):
+            break
+        reply = await llm_gateway.ainvoke(repair_prompt(prompt, data, errors), temperature=temperature)
+        patch = extract_json(reply, {'type': 'object'})
+        if isinstance(patch, dict):
+            data = apply_patch(data, patch)
+        data, errors = validate(data, schema)
+    if errors:
+        raise StructuredOutputError(
+            "LLM response does not match schema: " +
+            "; ".join(f"{format_path(path)} {message}" for path, message in errors), errors, data)
+    return data
+
+def generate(prompt, schema, temperature=0.2, repair_attempts=STRUCTURED_REPAIR_ATTEMPTS, timeout=None):
+    """Blocking variant of agenerate."""
+    return run(agenerate(prompt, schema, temperature, repair_attempts), timeout=timeout)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend modules live at the repository root and read their settings at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+os.environ.setdefault('TTS_PREWARM', 'false')
+os.environ.setdefault('WHISPER_POOL_SIZE', '0')
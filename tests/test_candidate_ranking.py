@@ -0,0 +1,49 @@
+import pytest
+from candidate_ranking import DEFAULT_GROUP_WEIGHTS, parse_weights, rank_candidates
+from leaderboard import candidate_entry
+from report_engine import METRIC_GROUPS
+
+def entry(report_id, technical, communication=None, personality=None):
+    report = {'session_id': f's-{report_id}', 'overall_score': technical}
+    for group, value in zip(METRIC_GROUPS, [technical, communication, personality]):
+        if value is not None:
+            report[group] = [{'name': name, 'value': value} for name in METRIC_GROUPS[group][0]]
+    return candidate_entry(report_id, report)
+
+def test_parse_weights():
+    assert parse_weights(None) == DEFAULT_GROUP_WEIGHTS
+    assert parse_weights('technical:2, communication:1') == {
+        'technical_metrics': 2.0, 'communication_metrics': 1.0, 'personality_metrics': 0.0}
+
+@pytest.mark.parametrize('text', ['technical:nan', 'technical:inf', 'technical:-1,communication:2',
+                                  'technical:', 'technical:abc', 'charisma:1', 'technical:0'])
+def test_parse_weights_rejects(text):
+    with pytest.raises(ValueError):
+        parse_weights(text)
+
+def test_rank_candidates_orders_and_scores():
+    ranked = rank_candidates([entry('a', 60, 70, 70), entry('b', 90, 80, 80), entry('c', 70, 70, 70)])
+    assert [c['report_id'] for c in ranked] == ['b', 'c', 'a']
+    assert [c['rank'] for c in ranked] == [1, 2, 3]
+    assert [c['percentile'] for c in ranked] == [100.0, 50.0, 0.0]
+    assert ranked[0]['technical_score'] == 90.0
+    assert ranked[0]['session_id'] == 's-b'
+
+def test_rank_candidates_follows_weights():
+    candidates = [entry('tech', 90, 50), entry('talk', 50, 90)]
+    by_technical = rank_candidates(candidates, parse_weights('technical:1'))
+    by_communication = rank_candidates(candidates, parse_weights('communication:1'))
+    assert by_technical[0]['report_id'] == 'tech'
+    assert by_communication[0]['report_id'] == 'talk'
+
+def test_rank_candidates_fills_missing_metrics_with_the_mean():
+    ranked = rank_candidates([entry('a', 80, 60), entry('b', 80)], parse_weights('communication:1'))
+    # b has no communication scores: it gets the cohort mean and ties with a, keeping input order
+    assert [c['report_id'] for c in ranked] == ['a', 'b']
+    assert ranked[1]['communication_score'] == 60.0
+    assert ranked[1]['composite_z'] == 0.0
+
+def test_rank_candidates_edge_cases():
+    assert rank_candidates([]) == []
+    (only,) = rank_candidates([entry('a', 50)])
+    assert only['rank'] == 1 and only['percentile'] == 100.0
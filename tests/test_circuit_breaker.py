@@ -0,0 +1,66 @@
+import threading
+import pytest
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+
+class Probe:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('still down')
+
+def breaker(probe=None, threshold=3):
+    return CircuitBreaker('test', probe or Probe(), failure_threshold=threshold, probe_interval=0.01)
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_opens_after_threshold():
+    b = breaker(Probe(failures=1000))
+    b.record_failure()
+    b.record_failure()
+    assert b.state == CLOSED
+    b.check()
+    b.record_failure()
+    assert b.state == OPEN
+    assert b.times_opened == 1
+    with pytest.raises(CircuitOpenError):
+        b.check()
+
+def test_success_resets_the_failure_count():
+    b = breaker(Probe(failures=1000))
+    b.record_failure()
+    b.record_failure()
+    b.record_success()
+    assert b.failures == 0
+    b.record_failure()
+    b.record_failure()
+    assert b.state == CLOSED
+
+def test_probe_closes_the_circuit_and_runs_callbacks():
+    probe = Probe(failures=2)
+    b = breaker(probe)
+    closed = threading.Event()
+    b.on_close(lambda: 1 / 0)  # a failing callback doesn't stop the others
+    b.on_close(closed.set)
+    trip(b)
+    assert closed.wait(5)
+    assert b.state == CLOSED
+    assert probe.calls == 3
+    assert b.failures == 0
+    b.check()
+
+def test_reopens_after_closing():
+    b = breaker()
+    closed = threading.Event()
+    b.on_close(closed.set)
+    trip(b)
+    assert closed.wait(5)
+    assert b.state == CLOSED
+    trip(b)
+    assert b.state == OPEN
+    assert b.times_opened == 2
@@ -0,0 +1,81 @@
+import queue
+import pytest
+import conversation_context
+import llm_gateway
+from conversation_context import SUMMARY_UPDATE_FIELD, ConversationContext, format_qa
+
+@pytest.fixture(autouse=True)
+def small_budget(monkeypatch):
+    monkeypatch.setattr(conversation_context, 'CONTEXT_TOKEN_BUDGET', 50)
+    monkeypatch.setattr(conversation_context, 'CONTEXT_RECENT_TURNS', 2)
+
+def llm(monkeypatch, reply):
+    prompts = []
+
+    async def ainvoke(prompt, **kwargs):
+        prompts.append(prompt)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    monkeypatch.setattr(llm_gateway, 'ainvoke', ainvoke)
+    return prompts
+
+def long_context(turns=5):
+    context = ConversationContext(resume_digest='resume')
+    for i in range(turns):
+        context.append(format_qa(f'Question {i}?', f'Answer {i}. ' + 'More detail. ' * 10))
+    return context
+
+def test_compact_folds_old_turns_without_waiting_for_the_llm(monkeypatch):
+    prompts = llm(monkeypatch, 'unused')
+    context = long_context()
+    assert context.compact()
+    assert len(context.turns) == 2
+    assert context.summary == 'Q: Question 0? Q: Question 1? Q: Question 2?'
+    assert 'Summary of earlier conversation' in context.render()
+    assert prompts == []
+
+def test_compact_under_budget_does_nothing():
+    context = ConversationContext()
+    context.append(format_qa('Q?', 'A.'))
+    assert not context.compact()
+    assert context.summary == ''
+
+def test_background_summary_is_applied_on_next_load(monkeypatch):
+    prompts = llm(monkeypatch, '  The candidate   covered three topics. ')
+    updates = queue.Queue()
+    context = long_context()
+    context.compact(on_summary=updates.put)
+    extractive = context.summary
+    update = updates.get(timeout=5)
+    assert update == {'replaces': extractive, 'summary': 'The candidate covered three topics.'}
+    assert 'Question 0?' in prompts[0]
+
+    fields = {'context': context.to_dict(), SUMMARY_UPDATE_FIELD: update}
+    assert ConversationContext.from_session(fields).summary == 'The candidate covered three topics.'
+
+def test_stale_background_summary_is_ignored(monkeypatch):
+    llm(monkeypatch, 'LLM summary')
+    updates = queue.Queue()
+    context = long_context()
+    context.compact(on_summary=updates.put)
+    update = updates.get(timeout=5)
+    # Compacted again before the first summary was stored
+    for i in range(3):
+        context.append(format_qa(f'Later {i}?', 'Answer. ' * 20))
+    context.compact()
+    assert not context.apply_summary(update)
+    assert context.summary != 'LLM summary'
+
+def test_failed_background_summary_keeps_the_extractive_one(monkeypatch):
+    llm(monkeypatch, RuntimeError('LLM down'))
+    called = []
+    context = long_context()
+    context.compact(on_summary=called.append)
+    extractive = context.summary
+    conversation_context.submit(_noop()).result(timeout=5)  # let the background call finish
+    assert called == []
+    assert ConversationContext.from_session({'context': context.to_dict()}).summary == extractive
+
+async def _noop():
+    pass
@@ -0,0 +1,49 @@
+import json
+import pytest
+from flask import Flask
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_page_args, stream_page
+
+FIELDS = ['_id', 'date']
+ALLOWED = FIELDS + ['role']
+
+def test_cursor_round_trip():
+    token = encode_cursor(['2024-01-02T03:04:05', '65a1b2c3d4e5f60718293a4b'])
+    assert '=' not in token
+    assert decode_cursor(token, 2) == ['2024-01-02T03:04:05', '65a1b2c3d4e5f60718293a4b']
+
+@pytest.mark.parametrize('values', [5, {'a': 1}, 'text', [], ['only-one'], ['a', 'b', 'c'], ['a', 1], None])
+def test_cursor_of_the_wrong_shape_is_rejected(values):
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(values), 2)
+
+@pytest.mark.parametrize('token', ['!!!', 'not base64', encode_cursor('x')[:-1] + '~'])
+def test_garbled_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, 1)
+
+def test_parse_page_args_defaults_and_limits():
+    assert parse_page_args({}, FIELDS, ALLOWED, 1) == (20, None, FIELDS)
+    assert parse_page_args({'limit': '0'}, FIELDS, ALLOWED, 1)[0] == 1
+    assert parse_page_args({'limit': '1000'}, FIELDS, ALLOWED, 1)[0] == MAX_PAGE_SIZE
+    assert parse_page_args({'fields': 'role, _id'}, FIELDS, ALLOWED, 1)[2] == ['role', '_id']
+    assert parse_page_args({'cursor': encode_cursor(['s1'])}, FIELDS, ALLOWED, 1)[1] == ['s1']
+
+@pytest.mark.parametrize('args', [{'limit': 'ten'}, {'fields': 'password'}, {'cursor': encode_cursor(['a', 'b'])}])
+def test_parse_page_args_rejects(args):
+    with pytest.raises(ValueError):
+        parse_page_args(args, FIELDS, ALLOWED, 1)
+
+@pytest.mark.parametrize('items', [[], [{'a': 1}], [{'a': 1}, {'a': 2}]])
+def test_stream_page(items):
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = stream_page('reports', iter(items), lambda: {'next_cursor': None, 'has_more': False})
+        body = response.get_data()
+    assert json.loads(body) == {'reports': items, 'next_cursor': None, 'has_more': False}
+
+def test_stream_page_raises_before_the_response_starts():
+    def failing():
+        raise RuntimeError('query failed')
+        yield
+    with pytest.raises(RuntimeError):
+        stream_page('reports', failing(), dict)
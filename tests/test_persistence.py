@@ -0,0 +1,120 @@
+import pytest
+import persistence
+from circuit_breaker import CircuitOpenError
+from persistence import WriteBehindQueue
+
+class FakeCollection:
+    def __init__(self, failures=0, error=RuntimeError):
+        self.calls = []
+        self.failures = failures
+        self.error = error
+
+    def _call(self, *args):
+        if self.failures:
+            self.failures -= 1
+            raise self.error('write failed')
+        self.calls.append(args)
+
+    def insert_many(self, documents, ordered=True):
+        self._call('insert_many', [doc['_id'] for doc in documents])
+
+    def update_one(self, filter, update, upsert=False):
+        self._call('update_one', filter, update, upsert)
+
+class FakeMongo:
+    def __init__(self, **kwargs):
+        self.collection = FakeCollection(**kwargs)
+
+    @property
+    def db(self):
+        return self
+
+    def __getitem__(self, name):
+        return self.collection
+
+@pytest.fixture
+def spill_path(tmp_path, monkeypatch):
+    path = tmp_path / 'instance' / 'spill.jsonl'
+    monkeypatch.setattr(persistence, 'PERSIST_SPILL_PATH', str(path))
+    return path
+
+@pytest.fixture
+def writer():
+    writer = WriteBehindQueue(queue_size=10)
+    # Retry backoff is waited out on _stopping; don't sleep in tests
+    writer._stopping.wait = lambda timeout=None: False
+    return writer
+
+def use_mongo(monkeypatch, **kwargs):
+    mongo = FakeMongo(**kwargs)
+    monkeypatch.setattr(persistence, 'mongo', mongo)
+    return mongo.collection
+
+def drain(writer):
+    ops = []
+    while not writer._queue.empty():
+        ops.append(writer._queue.get_nowait())
+    return ops
+
+def test_batch_groups_inserts_and_coalesces_sets(writer, monkeypatch):
+    collection = use_mongo(monkeypatch)
+    first = writer.insert('reports', {'a': 1})
+    second = writer.insert('reports', {'a': 2})
+    writer.set_fields('reports', {'_id': first}, {'x': 1})
+    writer.set_fields('reports', {'_id': first}, {'y': 2})
+    writer.update('leaderboards', {'t': 1}, {'$inc': {'n': 1}}, upsert=True)
+    writer._write_batch(drain(writer), raise_errors=True)
+
+    assert collection.calls == [
+        ('insert_many', [first, second]),
+        ('update_one', {'_id': first}, {'$set': {'x': 1, 'y': 2}}, False),
+        ('update_one', {'t': 1}, {'$inc': {'n': 1}}, True),
+    ]
+
+def test_pending_insert_is_visible_until_written(writer, monkeypatch):
+    use_mongo(monkeypatch)
+    writer.insert('reports', {'session_id': 's1'})
+    assert writer.find_pending('reports', session_id='s1')['session_id'] == 's1'
+    writer._write_batch(drain(writer), raise_errors=True)
+    assert writer.find_pending('reports', session_id='s1') is None
+
+def test_failed_batch_is_retried(writer, monkeypatch, spill_path):
+    collection = use_mongo(monkeypatch, failures=2)
+    writer.set_fields('reports', {'_id': 1}, {'x': 1})
+    writer._write_with_retry(drain(writer))
+    assert collection.calls == [('update_one', {'_id': 1}, {'$set': {'x': 1}}, False)]
+    assert not spill_path.exists()
+
+def test_open_circuit_does_not_use_up_attempts(writer, monkeypatch, spill_path):
+    monkeypatch.setattr(persistence, 'PERSIST_MAX_ATTEMPTS', 2)
+    collection = use_mongo(monkeypatch, failures=5, error=CircuitOpenError)
+    writer.set_fields('reports', {'_id': 1}, {'x': 1})
+    writer._write_with_retry(drain(writer))
+    assert len(collection.calls) == 1
+    assert not spill_path.exists()
+
+def test_exhausted_retries_spill_and_replay(writer, monkeypatch, spill_path):
+    monkeypatch.setattr(persistence, 'PERSIST_MAX_ATTEMPTS', 2)
+    use_mongo(monkeypatch, failures=5)
+    doc_id = writer.insert('reports', {'a': 1})
+    writer.set_fields('reports', {'_id': doc_id}, {'x': 1})
+    writer._write_with_retry(drain(writer))
+    assert spill_path.exists()
+    assert writer.find_pending('reports', a=1) is None
+
+    assert writer.replay_spilled() == 2
+    assert not spill_path.exists()
+    ops = drain(writer)
+    assert [op[0] for op in ops] == ['insert', 'set']
+    assert ops[0][2]['_id'] == doc_id
+    assert ops[1][2] == {'_id': doc_id}
+
+def test_full_queue_spills_instead_of_writing_inline(monkeypatch, spill_path):
+    monkeypatch.setattr(persistence, 'PERSIST_PUT_TIMEOUT', 0.01)
+    collection = use_mongo(monkeypatch)
+    writer = WriteBehindQueue(queue_size=1)
+    writer.set_fields('reports', {'_id': 1}, {'x': 1})
+    writer.set_fields('reports', {'_id': 1}, {'x': 2})
+    assert collection.calls == []
+    assert writer.depth == 1
+    assert len(spill_path.read_text().splitlines()) == 1
@@ -0,0 +1,136 @@
+import threading
+import time
+import pytest
+from flask import Flask
+import report_jobs
+from report_jobs import COMPLETED, FAILED, QUEUED, REPORT_JOB_LEASE, RUNNING, ReportJobQueue, callback_allowed
+
+_sleep = time.sleep
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # The lease renewal thread: park it, the tests renew leases themselves
+        _sleep(3600)
+
+class Builder:
+    def __init__(self):
+        self.release = threading.Event()
+        self.sessions = []
+
+    def __call__(self, session_id):
+        self.sessions.append(session_id)
+        if not self.release.wait(5):
+            raise RuntimeError('not released')
+        return {'report_id': f'report-{session_id}', 'overall_score': 80}
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(report_jobs, 'time', clock)
+    return clock
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def builder():
+    builder = Builder()
+    yield builder
+    builder.release.set()
+
+@pytest.fixture
+def jobs(clock, app, builder):
+    return ReportJobQueue(builder, workers=1, url='memory://')
+
+def wait_for(jobs, job_id, status):
+    for _ in range(200):
+        job = jobs._jobs.get(job_id)
+        if job['status'] == status:
+            return job
+        _sleep(0.01)
+    raise AssertionError(f"job is {job['status']}, not {status}")
+
+def test_one_job_per_session(jobs, builder):
+    job = jobs.enqueue('s1')
+    assert job['status'] == QUEUED
+    wait_for(jobs, job['job_id'], RUNNING)
+    assert jobs.enqueue('s1')['job_id'] == job['job_id']
+    builder.release.set()
+    done = wait_for(jobs, job['job_id'], COMPLETED)
+    assert done['report_id'] == 'report-s1'
+    assert jobs.enqueue('s1')['job_id'] == job['job_id']
+    assert jobs.for_session('s1')['status'] == COMPLETED
+    assert builder.sessions == ['s1']
+
+def test_failed_job_is_replaced(jobs, builder):
+    builder.release.set()
+    builder.sessions.clear()
+    failing = ReportJobQueue(lambda session_id: 1 / 0, workers=1, url='memory://')
+    failing._jobs, failing._by_session = jobs._jobs, jobs._by_session
+    first = failing.enqueue('s1')
+    assert wait_for(jobs, first['job_id'], FAILED)['error'] == 'division by zero'
+    second = jobs.enqueue('s1')
+    assert second['job_id'] != first['job_id']
+    wait_for(jobs, second['job_id'], COMPLETED)
+
+def dead_workers_job(jobs, clock, session_id, status=RUNNING, heartbeat_at=None):
+    """A claimed job as another worker leaves it behind."""
+    job = {'job_id': 'dead', 'session_id': session_id, 'status': status, 'report_id': None,
+           'overall_score': None, 'error': None, 'created_at': clock.now,
+           'heartbeat_at': clock.now if heartbeat_at is None else heartbeat_at, 'finished_at': None}
+    jobs._jobs.create(job['job_id'], job)
+    assert jobs._by_session.add(session_id, {'job_id': job['job_id']})
+    return job
+
+@pytest.mark.parametrize('status', [QUEUED, RUNNING])
+def test_live_claim_of_another_worker_is_joined(jobs, clock, status):
+    dead_workers_job(jobs, clock, 's1', status)
+    clock.now += REPORT_JOB_LEASE - 1
+    assert jobs.enqueue('s1')['job_id'] == 'dead'
+
+@pytest.mark.parametrize('status', [QUEUED, RUNNING])
+def test_expired_lease_is_taken_over(jobs, clock, builder, status):
+    dead_workers_job(jobs, clock, 's1', status)
+    clock.now += REPORT_JOB_LEASE + 1
+    assert jobs.get('dead')['status'] == FAILED
+
+    job = jobs.enqueue('s1')
+    assert job['job_id'] != 'dead'
+    assert jobs.for_session('s1')['job_id'] == job['job_id']
+    builder.release.set()
+    wait_for(jobs, job['job_id'], COMPLETED)
+
+def test_leases_are_renewed(jobs, clock, monkeypatch):
+    job = jobs.enqueue('s1')
+    clock.now += REPORT_JOB_LEASE
+
+    def sleep(seconds):
+        if clock.now > 2000:
+            raise StopIteration
+        clock.now = 3000
+    monkeypatch.setattr(clock, 'sleep', sleep)
+    with pytest.raises(StopIteration):
+        jobs._renew_leases()
+    assert jobs._jobs.get(job['job_id'])['heartbeat_at'] == 3000
+    assert jobs.get(job['job_id'])['status'] != FAILED
+
+@pytest.mark.parametrize('url, allowed', [
+    ('https://hooks.example.com/report', True),
+    ('http://hooks.example.com:8080/x', True),
+    ('ftp://hooks.example.com/x', False),
+    ('https://evil.example.com/x', False),
+    ('https://hooks.example.com.evil.com/x', False),
+    ('not a url', False),
+])
+def test_callback_allowed(monkeypatch, url, allowed):
+    monkeypatch.setattr(report_jobs, 'REPORT_CALLBACK_HOSTS', {'hooks.example.com'})
+    assert callback_allowed(url) is allowed
@@ -0,0 +1,55 @@
+import pytest
+from bson import ObjectId
+from flask import Flask
+import interview_routes
+from interview_routes import interview_bp
+from report_cache import REPORT_CACHE_CONTROL, ReportCache, report_etag
+
+REPORT_ID = str(ObjectId())
+
+@pytest.fixture
+def lookups(monkeypatch):
+    lookups = []
+
+    def find_report(**filters):
+        lookups.append(filters)
+        if str(filters['_id']) == REPORT_ID:
+            return {'_id': filters['_id'], 'overall_score': 80}
+        return None
+    monkeypatch.setattr(interview_routes, 'find_report', find_report)
+    monkeypatch.setattr(interview_routes, 'report_cache', ReportCache(url=''))
+    return lookups
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(interview_bp, url_prefix='/interview')
+    return app.test_client()
+
+def test_report_is_read_once_then_cached(client, lookups):
+    first = client.get(f'/interview/reports/{REPORT_ID}')
+    second = client.get(f'/interview/reports/{REPORT_ID}')
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == {'report': {'_id': REPORT_ID, 'overall_score': 80}}
+    assert second.data == first.data
+    assert first.get_etag() == (report_etag(REPORT_ID), False)
+    assert first.headers['Cache-Control'] == REPORT_CACHE_CONTROL
+    assert len(lookups) == 1
+
+def test_matching_etag_gets_304_without_a_lookup(client, lookups):
+    response = client.get(f'/interview/reports/{REPORT_ID}',
+                          headers={'If-None-Match': f'"{report_etag(REPORT_ID)}"'})
+    assert response.status_code == 304
+    assert response.get_etag() == (report_etag(REPORT_ID), False)
+    assert lookups == []
+
+def test_etag_of_an_older_format_is_ignored(client, lookups, monkeypatch):
+    old = report_etag(REPORT_ID)
+    monkeypatch.setattr('report_cache.REPORT_FORMAT_VERSION', 2)
+    response = client.get(f'/interview/reports/{REPORT_ID}', headers={'If-None-Match': f'"{old}"'})
+    assert response.status_code == 200
+    assert response.get_etag() == (report_etag(REPORT_ID), False)
+
+@pytest.mark.parametrize('report_id, status', [('not-an-id', 400), (str(ObjectId()), 404)])
+def test_bad_or_unknown_report(client, lookups, report_id, status):
+    assert client.get(f'/interview/reports/{report_id}').status_code == status
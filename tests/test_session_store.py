@@ -0,0 +1,122 @@
+import pytest
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore, SessionStore
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, 'time', clock)
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemorySessionStore('test', ttl=60)
+    return SQLiteSessionStore(str(tmp_path / 'sessions.db'), 'test', ttl=60)
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore('test')
+
+def test_create_get_update(store):
+    store.create('s1', {'role': 'SWE'})
+    assert store.update('s1', question='Q1')
+    assert store.get('s1') == {'role': 'SWE', 'question': 'Q1'}
+    assert 's1' in store
+    assert not store.update('missing', question='Q1')
+    assert store.get('missing') is None
+
+def test_append_turn_counts_and_orders(store):
+    store.create('s1', {})
+    assert [store.append_turn('s1', {'n': n}) for n in range(3)] == [1, 2, 3]
+    assert store.get_turns('s1') == [{'n': 0}, {'n': 1}, {'n': 2}]
+    assert store.append_turn('missing', {'n': 0}) == 0
+
+def test_create_resets_turns(store):
+    store.create('s1', {})
+    store.append_turn('s1', {'n': 0})
+    store.create('s1', {'fresh': True})
+    assert store.get_turns('s1') == []
+
+def test_expired_session_reads_as_missing(store, clock):
+    store.create('s1', {'role': 'SWE'})
+    store.append_turn('s1', {'n': 0})
+    clock.now += 61
+    assert store.get('s1') is None
+    assert store.get_turns('s1') == []
+    assert store.session_ids() == []
+
+def test_append_turn_does_not_revive_expired_session(store, clock):
+    store.create('s1', {'role': 'SWE'})
+    store.append_turn('s1', {'n': 0})
+    clock.now += 61
+    assert store.append_turn('s1', {'n': 1}) == 0
+    assert not store.update('s1', role='PM')
+    assert store.get('s1') is None
+
+def test_writes_refresh_ttl(store, clock):
+    store.create('s1', {})
+    clock.now += 50
+    store.append_turn('s1', {'n': 0})
+    clock.now += 50
+    assert store.get('s1') == {}
+
+def test_add_only_creates_once(store, clock):
+    assert store.add('s1', {'job_id': 'a'})
+    assert not store.add('s1', {'job_id': 'b'})
+    assert store.get('s1') == {'job_id': 'a'}
+    clock.now += 61
+    assert store.add('s1', {'job_id': 'c'})
+    assert store.get('s1') == {'job_id': 'c'}
+
+def test_namespaces_are_separate(tmp_path, clock):
+    path = str(tmp_path / 'sessions.db')
+    first, second = SQLiteSessionStore(path, 'one'), SQLiteSessionStore(path, 'two')
+    first.create('s1', {'store': 1})
+    assert second.get('s1') is None
+    assert first.session_ids() == ['s1']
+
+def test_datetimes_are_stored_as_iso_strings(store):
+    from datetime import datetime
+    store.create('s1', {'at': datetime(2024, 1, 2, 3, 4, 5)})
+    assert store.get('s1') == {'at': '2024-01-02T03:04:05'}
+
+def test_create_session_store_rejects_unknown_urls():
+    with pytest.raises(ValueError):
+        session_store.create_session_store('test', 'mysql://localhost/db')
+
+class TestRedisSessionStore:
+    @pytest.fixture
+    def store(self, monkeypatch):
+        fakeredis = pytest.importorskip('fakeredis')
+        pytest.importorskip('lupa')
+        import redis
+        server = fakeredis.FakeRedis()
+        monkeypatch.setattr(redis.Redis, 'from_url', staticmethod(lambda url: server))
+        return session_store.RedisSessionStore('redis://localhost', 'test', ttl=60)
+
+    def test_round_trip(self, store):
+        store.create('s1', {'role': 'SWE'})
+        assert store.update('s1', question='Q1')
+        assert store.append_turn('s1', {'n': 0}) == 1
+        assert store.get('s1') == {'role': 'SWE', 'question': 'Q1'}
+        assert store.get_turns('s1') == [{'n': 0}]
+        assert store.session_ids() == ['s1']
+
+    def test_missing_session_is_not_created_by_writes(self, store):
+        assert not store.update('s1', role='SWE')
+        assert store.append_turn('s1', {'n': 0}) == 0
+        assert not store.redis.exists(store._key('s1'), store._turns_key('s1'))
+
+    def test_add_sets_expiry_atomically(self, store):
+        assert store.add('s1', {'job_id': 'a'})
+        assert not store.add('s1', {'job_id': 'b'})
+        assert store.get('s1') == {'job_id': 'a'}
+        assert 0 < store.redis.ttl(store._key('s1')) <= 60
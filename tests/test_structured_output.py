@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+import llm_gateway
+from structured_output import (StructuredOutputError, agenerate, apply_patch, extract_json, format_path,
+                               parse_path, validate)
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['score', 'tags'],
+    'properties': {
+        'score': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+    },
+}
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"a": 1}', {'a': 1}),
+    ('```json\n{"a": 1}\n```', {'a': 1}),
+    ('Here you go: {"a": [1, 2,],} Hope that helps.', {'a': [1, 2]}),
+    ('{"a": "cut off', {'a': 'cut off'}),
+    ('{"a": [1, {"b": 2', {'a': [1, {'b': 2}]}),
+    ('Scores [see below]: {"a": 1}', {'a': 1}),
+    ('[1, 2]', [1, 2]),
+])
+def test_extract_json(text, expected):
+    assert extract_json(text) == expected
+
+def test_extract_json_without_schema_takes_first_value():
+    assert extract_json('Note [1]: {"a": 2}') == [1]
+
+def test_extract_json_skips_values_of_the_wrong_type():
+    assert extract_json('Note [1]: {"a": 2}', {'type': 'object'}) == {'a': 2}
+
+def test_extract_json_prefers_a_value_that_validates():
+    text = 'For example {"score": "high"}. Answer: {"score": 80, "tags": ["x"]}'
+    assert extract_json(text, SCHEMA) == {'score': 80, 'tags': ['x']}
+    assert extract_json('{"score": "high"} and {"other": 1}', SCHEMA) == {'score': 'high'}
+
+def test_extract_json_does_not_pick_nested_values():
+    assert extract_json('{"outer": {"score": 1, "tags": []}}', SCHEMA) == {'outer': {'score': 1, 'tags': []}}
+
+@pytest.mark.parametrize('text', ['', 'no json here', '{"a": }'])
+def test_extract_json_errors(text):
+    with pytest.raises(StructuredOutputError):
+        extract_json(text)
+
+def test_validate_coerces_and_reports_paths():
+    value, errors = validate({'score': '105', 'tags': ['a', 3]}, SCHEMA)
+    assert value['score'] == 105
+    assert [(format_path(path), message) for path, message in errors] == [
+        ('score', 'must be at most 100'), ('tags[1]', 'expected a string')]
+    assert validate({}, SCHEMA)[1] == [(('score',), 'missing'), (('tags',), 'missing')]
+
+def test_apply_patch_round_trips_paths():
+    assert parse_path('tags[1]') == ['tags', 1]
+    data = apply_patch({'score': 105, 'tags': ['a', 3]}, {'score': 90, 'tags[1]': 'b', 'extra.note': 'x'})
+    assert data == {'score': 90, 'tags': ['a', 'b'], 'extra': {'note': 'x'}}
+
+def fake_replies(monkeypatch, *replies):
+    prompts = []
+    replies = list(replies)
+
+    async def ainvoke(prompt, **kwargs):
+        prompts.append(prompt)
+        return replies.pop(0)
+    monkeypatch.setattr(llm_gateway, 'ainvoke', ainvoke)
+    return prompts
+
+def test_generate_repairs_only_invalid_fields(monkeypatch):
+    prompts = fake_replies(monkeypatch, '{"score": 150, "tags": ["a"]}', 'Fixed [1]: {"score": 95}')
+    assert asyncio.run(agenerate('rate it', SCHEMA)) == {'score': 95, 'tags': ['a']}
+    assert len(prompts) == 2
+    assert '- score: must be at most 100' in prompts[1]
+
+def test_generate_gives_up_after_repair_attempts(monkeypatch):
+    fake_replies(monkeypatch, '{"score": 150, "tags": []}', '{"score": 150}')
+    with pytest.raises(StructuredOutputError) as info:
+        asyncio.run(agenerate('rate it', SCHEMA, repair_attempts=1))
+    assert info.value.errors == [(('score',), 'must be at most 100')]
+
+def test_generate_does_not_repair_the_wrong_shape(monkeypatch):
+    prompts = fake_replies(monkeypatch, '[1, 2]')
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(agenerate('rate it', SCHEMA))
+    assert len(prompts) == 1
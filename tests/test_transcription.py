@@ -0,0 +1,64 @@
+import io
+import av
+import numpy as np
+import pytest
+import transcription
+from transcription import (SAMPLE_RATE, StreamLimitError, TranscriptionStream, decode_audio_bytes,
+                           decode_audio_tail)
+
+def webm(seconds, rate=48000):
+    """An Opus/webm recording of a frequency sweep, like MediaRecorder produces."""
+    buffer = io.BytesIO()
+    container = av.open(buffer, 'w', format='webm')
+    stream = container.add_stream('libopus', rate=rate)
+    stream.layout = 'mono'
+    t = np.arange(seconds * rate) / rate
+    signal = (0.3 * np.sin(2 * np.pi * (220 + 40 * t) * t)).astype(np.float32)
+    for i in range(0, len(signal), 960):
+        frame = av.AudioFrame.from_ndarray(signal[None, i:i + 960], format='flt', layout='mono')
+        frame.sample_rate = rate
+        frame.pts = i
+        for packet in stream.encode(frame):
+            container.mux(packet)
+    for packet in stream.encode(None):
+        container.mux(packet)
+    container.close()
+    return buffer.getvalue()
+
+@pytest.fixture(scope='module')
+def recording():
+    return webm(6)
+
+@pytest.mark.parametrize('start', [0.0, 0.3, 1.0, 3.7, 5.9, 7.0])
+def test_decode_audio_tail_matches_full_decode(recording, start):
+    full = decode_audio_bytes(recording)[int(start * SAMPLE_RATE):]
+    tail = decode_audio_tail(recording, start)
+    assert len(tail) == len(full)
+    # The decoder settles within the pre-roll; compare after a few milliseconds
+    np.testing.assert_allclose(tail[320:], full[320:], atol=1e-3)
+
+class FakeModel:
+    def __init__(self):
+        self.passes = []
+
+    def transcribe(self, audio, **kwargs):
+        self.passes.append(len(audio))
+        return iter([]), type('Info', (), {'language': 'en'})()
+
+def test_stream_buffer_is_capped(monkeypatch, recording):
+    monkeypatch.setattr(transcription, 'STREAM_MAX_BYTES', len(recording))
+    stream = TranscriptionStream(FakeModel())
+    stream.add_chunk(recording)
+    with pytest.raises(StreamLimitError):
+        stream.add_chunk(b'x')
+    assert stream.finish()['is_final']
+
+def test_open_streams_are_capped(monkeypatch):
+    monkeypatch.setattr(transcription, 'STREAM_MAX_OPEN', 1)
+    monkeypatch.setattr(transcription, 'get_transcriber', FakeModel)
+    monkeypatch.setattr(transcription, '_streams', {})
+    stream = transcription.open_stream()
+    with pytest.raises(StreamLimitError):
+        transcription.open_stream()
+    transcription.close_stream(stream.id)
+    transcription.open_stream()
@@ -0,0 +1,75 @@
+import pytest
+from flask import Flask
+import interview_routes
+from interview_routes import TTS_CACHE_CONTROL, VOICE, interview_bp
+from tts_cache import cache_key
+from tts_service import DEFAULT_RATE, is_valid_rate
+
+class FakeCache:
+    def __init__(self):
+        self.clips = {}
+
+    def get(self, key):
+        return self.clips.get(key)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache()
+    monkeypatch.setattr(interview_routes, 'tts_cache', cache)
+    return cache
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(interview_bp, url_prefix='/interview')
+    return app.test_client()
+
+def synthesizer(monkeypatch, chunks, fail_after=None):
+    async def synthesize_cached(text, voice, rate):
+        for i, chunk in enumerate(chunks):
+            if i == fail_after:
+                raise ConnectionError('edge-tts went away')
+            yield chunk
+    monkeypatch.setattr(interview_routes, 'synthesize_cached', synthesize_cached)
+
+@pytest.mark.parametrize('rate, valid', [
+    ('+0%', True), ('-5%', True), ('+100%', True),
+    ('10%', False), ('+10', False), ('fast', False), ('+10%; x', False), ('+1000%', False), (10, False),
+])
+def test_is_valid_rate(rate, valid):
+    assert is_valid_rate(rate) is valid
+
+def test_cache_hit_is_immutable(client, cache):
+    key = cache_key('Hello', VOICE, DEFAULT_RATE)
+    cache.clips[key] = b'mp3'
+    response = client.get('/interview/tts', query_string={'text': 'Hello'})
+    assert response.status_code == 200
+    assert response.data == b'mp3'
+    assert response.get_etag() == (key, False)
+    assert response.headers['Cache-Control'] == TTS_CACHE_CONTROL
+
+def test_matching_etag_gets_304(client, cache):
+    key = cache_key('Hello', VOICE, '+10%')
+    response = client.get('/interview/tts', query_string={'text': 'Hello', 'rate': '+10%'},
+                          headers={'If-None-Match': f'"{key}"'})
+    assert response.status_code == 304
+    assert response.get_etag() == (key, False)
+
+def test_stale_etag_is_ignored(client, cache, monkeypatch):
+    synthesizer(monkeypatch, [b'a', b'b'])
+    response = client.get('/interview/tts', query_string={'text': 'Hello'},
+                          headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+
+def test_streamed_miss_is_not_cacheable(client, cache, monkeypatch):
+    synthesizer(monkeypatch, [b'a', b'b', b'c'], fail_after=2)
+    response = client.get('/interview/tts', query_string={'text': 'Hello'})
+    assert response.status_code == 200
+    assert response.data == b'ab'
+    assert response.get_etag() == (None, None)
+    assert 'immutable' not in response.headers['Cache-Control']
+
+@pytest.mark.parametrize('rate', ['fast', '+10', '+10%"; x'])
+def test_invalid_rate_is_rejected(client, cache, rate):
+    response = client.post('/interview/tts', json={'text': 'Hello', 'rate': rate})
+    assert response.status_code == 400
@@ -0,0 +1,238 @@
+import io
+import os
+import threading
+import time
+import uuid
+import av
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+from whisper_pool import WHISPER_MODEL_SIZE, WHISPER_POOL_SIZE, get_pool
+
+# Whisper works on 16 kHz mono float32 audio
+SAMPLE_RATE = 16000
+
+# Uploads up to this size are decoded straight from memory; larger ones spill to disk
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv('TRANSCRIBE_SPOOL_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Streaming tuning
+STREAM_IDLE_TIMEOUT = int(os.getenv('TRANSCRIBE_STREAM_IDLE_TIMEOUT', '120'))  # seconds
+STREAM_COMMIT_MARGIN = 1.0  # segments ending closer than this to the live edge may still change
+STREAM_MIN_PASS_AUDIO = 0.5  # don't run a partial pass on less uncommitted audio than this
+STREAM_PROMPT_CHARS = 200  # committed text handed back to Whisper as context
+STREAM_DECODE_PREROLL = 0.5  # seconds decoded before the committed point, so the decoder settles
+# A stream's buffered recording may not grow past this (about half an hour of Opus at 32 kbit/s)
+STREAM_MAX_BYTES = int(os.getenv('TRANSCRIBE_STREAM_MAX_BYTES', str(8 * 1024 * 1024)))
+STREAM_MAX_OPEN = int(os.getenv('TRANSCRIBE_MAX_STREAMS', '32'))  # open streams per process
+
+class StreamLimitError(RuntimeError):
+    """A stream would exceed STREAM_MAX_BYTES, or STREAM_MAX_OPEN streams are already open."""
+
+_whisper_model = None
+_whisper_model_lock = threading.Lock()
+
+def get_whisper_model():
+    """Returns the process-wide Whisper model, loading it on first use."""
+    global _whisper_model
+    if _whisper_model is None:
+        with _whisper_model_lock:
+            if _whisper_model is None:
+                _whisper_model = WhisperModel(WHISPER_MODEL_SIZE, device="cpu", compute_type="int8")
+    return _whisper_model
+
+def get_transcriber():
+    """Returns the object to run Whisper through: the worker pool, or an in-process model when WHISPER_POOL_SIZE=0."""
+    if WHISPER_POOL_SIZE > 0:
+        return get_pool()
+    return get_whisper_model()
+
+def decode_audio_bytes(data):
+    """Decodes an in-memory audio container (webm, wav, ...) to 16 kHz mono float32."""
+    return decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+
+def decode_audio_stream(stream):
+    """Decodes a seekable upload stream to 16 kHz mono float32 without copying it to a file."""
+    stream.seek(0)
+    return decode_audio(stream, sampling_rate=SAMPLE_RATE)
+
+def decode_audio_tail(data, start):
+    """Decodes an in-memory recording from start seconds on, to 16 kHz mono float32.
+
+    Packets before the start (less STREAM_DECODE_PREROLL) are demuxed but not
+    decoded, so the cost of a pass depends on the tail rather than on the
+    whole recording. Sample 0 of the result is at start on the same timeline
+    as decode_audio_bytes(data).
+    """
+    if start <= STREAM_DECODE_PREROLL:
+        return decode_audio_bytes(data)[int(start * SAMPLE_RATE):]
+
+    resampler = av.audio.resampler.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+    chunks = []
+    # The first frame's timestamp is rounded (Opus pre-skip in millisecond
+    # webm timecodes), so the timeline starts the first frame's length before
+    # the second frame; offset is where the decoded audio starts on it
+    first_length = origin = offset = None
+    with av.open(io.BytesIO(data), mode='r', metadata_errors='ignore') as container:
+        for packet in container.demux(audio=0):
+            if packet.pts is None:
+                continue
+            skip = (packet.pts + (packet.duration or 0)) * packet.time_base < start - STREAM_DECODE_PREROLL
+            if skip and origin is not None:
+                continue
+            try:
+                frames = packet.decode()
+            except av.error.InvalidDataError:
+                continue
+            for frame in frames:
+                if frame.time is None:
+                    return decode_audio_bytes(data)[int(start * SAMPLE_RATE):]
+                if first_length is None:
+                    first_length = frame.samples / frame.sample_rate
+                    frame_offset = 0.0
+                else:
+                    if origin is None:
+                        origin = frame.time - first_length
+                    frame_offset = frame.time - origin
+                if skip:
+                    continue
+                if offset is None:
+                    offset = frame_offset
+                frame.pts = None
+                chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(frame))
+        chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(None))
+    if offset is None:
+        return np.zeros(0, dtype=np.float32)
+    audio = np.concatenate(chunks).astype(np.float32) / 32768.0
+    return audio[max(0, int(round((start - offset) * SAMPLE_RATE))):]
+
+class TranscriptionStream:
+    """Incremental transcription of a recording that arrives in MediaRecorder chunks.
+
+    Chunks are only decodable together (only the first one carries the webm
+    header), so every pass demuxes the whole buffer in memory, but only the
+    audio after the last committed segment is decoded and run through
+    Whisper. The buffer is capped at STREAM_MAX_BYTES. A segment is
+    committed once VAD has seen it end at least STREAM_COMMIT_MARGIN seconds
+    before the live edge; everything after it is reported as tentative.
+    """
+
+    def __init__(self, model, language=None):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.language = language
+        self.last_activity = time.monotonic()
+        self._buffer = bytearray()
+        self._committed = []
+        self._committed_until = 0.0
+        self._tentative = []
+        self._lock = threading.Lock()
+
+    def add_chunk(self, data):
+        """Appends a chunk and returns the updated partial transcript."""
+        with self._lock:
+            self.last_activity = time.monotonic()
+            self._append(data)
+            return self._transcribe(final=False)
+
+    def finish(self, data=None):
+        """Appends an optional last chunk and returns the final transcript."""
+        with self._lock:
+            self.last_activity = time.monotonic()
+            self._append(data)
+            return self._transcribe(final=True)
+
+    def _append(self, data):
+        if not data:
+            return
+        if len(self._buffer) + len(data) > STREAM_MAX_BYTES:
+            raise StreamLimitError(f"Recording exceeds {STREAM_MAX_BYTES} bytes; finish the stream and start another")
+        self._buffer.extend(data)
+
+    def _transcribe(self, final):
+        if not self._buffer:
+            return self._result(final)
+
+        tail = decode_audio_tail(bytes(self._buffer), self._committed_until)
+        tail_duration = len(tail) / SAMPLE_RATE
+
+        if tail_duration < STREAM_MIN_PASS_AUDIO:
+            if final:
+                self._committed.extend(self._tentative)
+                self._tentative = []
+            return self._result(final)
+
+        prompt = " ".join(self._committed)[-STREAM_PROMPT_CHARS:] or None
+        segments, info = self.model.transcribe(
+            tail,
+            # Partial passes get replaced within a second, so favour speed
+            beam_size=5 if final else 1,
+            language=self.language,
+            initial_prompt=prompt,
+            condition_on_previous_text=False,
+            vad_filter=True,
+        )
+        segments = list(segments)
+        if self.language is None:
+            # Pin the detected language so later passes skip detection
+            self.language = info.language
+
+        self._tentative = []
+        commit_until = self._committed_until
+        for segment in segments:
+            text = segment.text.strip()
+            if not text:
+                continue
+            if not self._tentative and (final or segment.end <= tail_duration - STREAM_COMMIT_MARGIN):
+                self._committed.append(text)
+                commit_until = self._committed_until + segment.end
+            else:
+                self._tentative.append(text)
+        self._committed_until = commit_until
+
+        return self._result(final)
+
+    def _result(self, final):
+        committed = " ".join(self._committed)
+        tentative = " ".join(self._tentative)
+        return {
+            "stream_id": self.id,
+            "transcript": " ".join(part for part in (committed, tentative) if part),
+            "committed": committed,
+            "tentative": tentative,
+            "is_final": final
+        }
+
+# Open streams, keyed by stream id. They hold buffered audio and live in this
+# process only: every chunk of a stream must reach the process that opened it.
+# Run a single web process (see the WHISPER_POOL_SIZE note in whisper_pool.py),
+# or have the load balancer route /transcribe/stream/<stream_id> requests
+# stickily; a chunk that reaches another process gets a 404 as if the stream
+# had expired.
+_streams = {}
+_streams_lock = threading.Lock()
+
+def _purge_idle_streams():
+    cutoff = time.monotonic() - STREAM_IDLE_TIMEOUT
+    for stream_id in [sid for sid, stream in _streams.items() if stream.last_activity < cutoff]:
+        del _streams[stream_id]
+
+def open_stream(language=None):
+    """Opens a new transcription stream; raises StreamLimitError if STREAM_MAX_OPEN are already open."""
+    stream = TranscriptionStream(get_transcriber(), language=language)
+    with _streams_lock:
+        _purge_idle_streams()
+        if len(_streams) >= STREAM_MAX_OPEN:
+            raise StreamLimitError("Too many open transcription streams; try again later")
+        _streams[stream.id] = stream
+    return stream
+
+def get_stream(stream_id):
+    """Returns an open stream, or None if it is unknown or expired."""
+    with _streams_lock:
+        _purge_idle_streams()
+        return _streams.get(stream_id)
+
+def close_stream(stream_id):
+    """Forgets a stream."""
+    with _streams_lock:
+        _streams.pop(stream_id, None)
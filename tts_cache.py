@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+import threading
+from caching import LRUCache
+
+# Set TTS_CACHE_DIR to an empty string to keep the cache purely in memory
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'interview_tts_cache'))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv('TTS_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv('TTS_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+
+def cache_key(text, voice, rate):
+    """Content address of a synthesized clip."""
+    return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode('utf-8')).hexdigest()
+
+class TTSCache:
+    """Two-tier MP3 cache: an in-memory LRU in front of a size-capped directory.
+
+    Disk entries are evicted oldest-access-first once the directory exceeds
+    its cap. Access times are tracked through file mtimes, so the disk tier
+    survives restarts and can be shared by processes on the same host.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_bytes=TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes=TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.memory = LRUCache(max_size=memory_bytes)
+        self._disk_lock = threading.Lock()
+        self._disk_size = None
+        if not directory:
+            self.directory = None
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"TTS disk cache disabled: {e}")
+            self.directory = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key):
+        audio = self.memory.get(key)
+        if audio is not None or not self.directory:
+            return audio
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            return None
+        self.memory.set(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        self.memory.set(key, audio)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            if os.path.exists(path):
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write TTS cache entry: {e}")
+            return
+        with self._disk_lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(audio)
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.mp3'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _scan_disk_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict_disk(self):
+        # Trim to 90% of the cap so we don't rescan on every write
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+        self._disk_size = total
+
+tts_cache = TTSCache()
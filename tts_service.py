@@ -0,0 +1,125 @@
+import asyncio
+import os
+import re
+import edge_tts
+from async_runtime import submit
+from tts_cache import cache_key, tts_cache
+
+DEFAULT_VOICE = "en-US-AriaNeural"
+DEFAULT_RATE = "+0%"
+
+# Sentences synthesized ahead of the one currently being streamed
+TTS_MAX_CONCURRENCY = int(os.getenv('TTS_MAX_CONCURRENCY', '3'))
+# Shorter fragments are merged with the next one to avoid tiny TTS requests
+MIN_SENTENCE_CHARS = 20
+
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+')
+_RATE = re.compile(r'[+-]\d{1,3}%')
+
+def is_valid_rate(rate):
+    """Whether rate is a speaking rate edge-tts accepts, e.g. '+10%' or '-5%'."""
+    return isinstance(rate, str) and _RATE.fullmatch(rate) is not None
+
+async def synthesize(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    """Yields MP3 audio chunks for text as edge-tts produces them."""
+    communicate = edge_tts.Communicate(text, voice, rate=rate)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+async def synthesize_cached(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    """Like synthesize, but served from / written to the TTS cache."""
+    loop = asyncio.get_running_loop()
+    key = cache_key(text, voice, rate)
+    audio = await loop.run_in_executor(None, tts_cache.get, key)
+    if audio is not None:
+        yield audio
+        return
+
+    chunks = []
+    async for chunk in synthesize(text, voice, rate):
+        chunks.append(chunk)
+        yield chunk
+    # Only complete clips are cached; an abandoned stream never gets here
+    await loop.run_in_executor(None, tts_cache.put, key, b"".join(chunks))
+
+def prewarm(phrases, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    """Synthesizes phrases into the cache in the background."""
+    async def warm():
+        for phrase in phrases:
+            try:
+                async for _ in synthesize_cached(phrase, voice, rate):
+                    pass
+            except Exception as e:
+                print(f"Could not pre-warm TTS cache for {phrase!r}: {e}")
+
+    return submit(warm())
+
+async def split_sentences(tokens):
+    """Regroups a stream of text tokens into whole sentences."""
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        start = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            if match.end() - start >= MIN_SENTENCE_CHARS:
+                sentence = buffer[start:match.end()].strip()
+                if sentence:
+                    yield sentence
+                start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+async def speak_sentences(sentences, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    """Synthesizes sentences concurrently and yields their audio strictly in order.
+
+    Yields ('sentence', index, text) when a sentence's audio is about to start,
+    then ('audio', index, chunk) for each of its MP3 chunks. Up to
+    TTS_MAX_CONCURRENCY later sentences are synthesized while earlier ones are
+    still streaming out.
+    """
+    semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+    ordered = asyncio.Queue()
+    tasks = []
+
+    async def synthesize_into(text, out):
+        try:
+            async with semaphore:
+                async for chunk in synthesize_cached(text, voice, rate):
+                    await out.put(chunk)
+        except Exception as e:
+            print(f"Error during TTS for sentence: {e}")
+        finally:
+            await out.put(None)
+
+    async def produce():
+        try:
+            async for text in sentences:
+                out = asyncio.Queue()
+                tasks.append(asyncio.create_task(synthesize_into(text, out)))
+                await ordered.put((text, out))
+        finally:
+            await ordered.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        index = 0
+        while True:
+            item = await ordered.get()
+            if item is None:
+                break
+            text, out = item
+            yield ('sentence', index, text)
+            while True:
+                chunk = await out.get()
+                if chunk is None:
+                    break
+                yield ('audio', index, chunk)
+            index += 1
+        # Surface errors from the sentence source
+        await producer
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
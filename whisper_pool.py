@@ -0,0 +1,220 @@
+import atexit
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Lightweight, picklable stand-ins for faster-whisper's result types
+Segment = namedtuple('Segment', ['start', 'end', 'text'])
+TranscriptionInfo = namedtuple('TranscriptionInfo', ['language', 'duration'])
+
+WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'small')
+WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', '4'))
+WHISPER_NUM_WORKERS = int(os.getenv('WHISPER_NUM_WORKERS', '2'))
+# One process per core group. The pool lives in the web process that first uses it,
+# so run gunicorn with one worker and threads (gunicorn -w 1 --threads 16 app:app)
+# to keep one model per core group rather than one per gunicorn worker. One web
+# process is also what streaming transcription needs: open streams are held in
+# that process's memory (transcription._streams), so with more workers the
+# /transcribe/stream routes need sticky routing to the worker that opened them.
+WHISPER_POOL_SIZE = int(os.getenv('WHISPER_POOL_SIZE', str(max(1, (os.cpu_count() or 1) // WHISPER_CPU_THREADS))))
+WHISPER_QUEUE_SIZE = int(os.getenv('WHISPER_QUEUE_SIZE', '64'))
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', str(WHISPER_NUM_WORKERS)))
+WHISPER_BATCH_WINDOW = int(os.getenv('WHISPER_BATCH_WINDOW_MS', '20')) / 1000
+
+class QueueFullError(Exception):
+    """Raised when the transcription queue cannot take more work."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Transcription queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+def _worker_main(worker_idx, jobs, results, model_size, cpu_threads, num_workers):
+    """Worker process: loads one model and transcribes batches until told to stop."""
+    from faster_whisper import WhisperModel
+
+    model = WhisperModel(model_size, device="cpu", compute_type="int8",
+                         cpu_threads=cpu_threads, num_workers=num_workers)
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+
+    def run(job):
+        job_id, audio, options = job
+        try:
+            segments, info = model.transcribe(audio, **options)
+            segments = [Segment(s.start, s.end, s.text) for s in segments]
+            results.put((worker_idx, job_id, (segments, TranscriptionInfo(info.language, info.duration)), None))
+        except Exception as e:
+            results.put((worker_idx, job_id, None, f"{type(e).__name__}: {e}"))
+
+    while True:
+        batch = jobs.get()
+        if batch is None:
+            break
+        list(executor.map(run, batch))
+        results.put((worker_idx, None, None, None))  # batch done, worker is idle again
+
+    executor.shutdown()
+
+class WhisperWorkerPool:
+    """Fixed pool of Whisper worker processes fed from a bounded queue.
+
+    A dispatcher hands each idle worker a micro-batch of pending jobs, which the
+    worker fans out over its model's num_workers replicas. When the queue is
+    full, submit() raises QueueFullError so routes can answer 429.
+    """
+
+    def __init__(self, size=WHISPER_POOL_SIZE, model_size=WHISPER_MODEL_SIZE,
+                 cpu_threads=WHISPER_CPU_THREADS, num_workers=WHISPER_NUM_WORKERS,
+                 queue_size=WHISPER_QUEUE_SIZE, batch_size=WHISPER_BATCH_SIZE,
+                 batch_window=WHISPER_BATCH_WINDOW):
+        self.size = size
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+
+        # Spawned workers re-import the parent's main module; serve.py keeps that import cheap
+        self._ctx = multiprocessing.get_context('spawn')
+        self._results = self._ctx.Queue()
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._idle = queue.Queue()
+        self._workers = [None] * size
+        self._in_flight = {}  # worker idx -> {job_id: (future, submitted_at)}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._avg_job_seconds = 2.0
+        self._stopping = False
+
+    def start(self):
+        for idx in range(self.size):
+            self._spawn(idx)
+        threading.Thread(target=self._dispatch_loop, name='whisper-dispatch', daemon=True).start()
+        threading.Thread(target=self._collect_loop, name='whisper-collect', daemon=True).start()
+        atexit.register(self.shutdown)
+        return self
+
+    def _spawn(self, idx, idle=True):
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(idx, jobs, self._results, self.model_size, self.cpu_threads, self.num_workers),
+            name=f'whisper-worker-{idx}',
+            daemon=True,
+        )
+        process.start()
+        with self._lock:
+            self._workers[idx] = (process, jobs)
+            self._in_flight[idx] = {}
+        if idle:
+            self._idle.put(idx)
+
+    def submit(self, audio, **options):
+        """Queues a transcription job and returns a Future of (segments, info)."""
+        future = Future()
+        try:
+            self._pending.put_nowait((next(self._ids), audio, options, future))
+        except queue.Full:
+            raise QueueFullError(self.retry_after())
+        return future
+
+    def transcribe(self, audio, timeout=None, **options):
+        """Blocking transcription with the same return shape as WhisperModel.transcribe."""
+        return self.submit(audio, **options).result(timeout=timeout)
+
+    def retry_after(self):
+        """Estimated seconds until the queue has drained enough to accept new work."""
+        backlog = self._pending.qsize()
+        return max(1, math.ceil(self._avg_job_seconds * backlog / max(1, self.size * self.num_workers)))
+
+    def _dispatch_loop(self):
+        while not self._stopping:
+            idx = self._idle.get()
+            first = self._pending.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    break
+                batch.append(job)
+
+            now = time.monotonic()
+            with self._lock:
+                _, jobs = self._workers[idx]
+                for job_id, _, _, future in batch:
+                    self._in_flight[idx][job_id] = (future, now)
+            jobs.put([(job_id, audio, options) for job_id, audio, options, _ in batch])
+
+    def _collect_loop(self):
+        last_reap = time.monotonic()
+        while not self._stopping:
+            if time.monotonic() - last_reap >= 1:
+                self._reap_dead_workers()
+                last_reap = time.monotonic()
+            try:
+                idx, job_id, result, error = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if job_id is None:
+                self._idle.put(idx)
+                continue
+
+            with self._lock:
+                future, submitted_at = self._in_flight[idx].pop(job_id, (None, None))
+            if future is None:
+                continue
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - submitted_at)
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
+
+    def _reap_dead_workers(self):
+        """Fails the jobs of crashed workers and replaces them."""
+        for idx in range(self.size):
+            with self._lock:
+                process, _ = self._workers[idx]
+                if process.is_alive() or self._stopping:
+                    continue
+                orphaned = self._in_flight[idx]
+            for future, _ in orphaned.values():
+                future.set_exception(RuntimeError("Whisper worker exited unexpectedly"))
+            # An idle worker's index is already waiting in the idle queue
+            self._spawn(idx, idle=bool(orphaned))
+
+    def shutdown(self):
+        if self._stopping:
+            return
+        self._stopping = True
+        self._pending.put(None)
+        for process, jobs in self._workers:
+            jobs.put(None)
+        for process, _ in self._workers:
+            process.join(timeout=5)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide worker pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WhisperWorkerPool().start()
+    return _pool